@@ -12,11 +12,15 @@ from sqlalchemy.sql.functions import current_user
 # from uuid import UUID
 
 from app.core.database import get_db
+from app.core.db_threadpool import run_in_db_pool
 from app.models import models
 from app.models.bucket_config import BucketConfig
 from app.schemas.bucket_summary import BucketSummaryRequest, BucketSummaryResponse, BucketConfigItem, \
     BucketConfigCreate, BucketConfigUpdate
 from app.services.bucket_summary_service import get_multiple_bucket_summaries,get_configs
+from app.services.summary_cache import invalidate_config
+from app.services.config_cache import bump_config_version
+from app.services.summary_metrics import parse_metrics
 from app.core.auth.dependencies import get_current_user
 from app.services.record_fields_service import get_table_columns, extract_jsonb_columns, merge_columns, is_json_col
 
@@ -49,7 +53,8 @@ async def bucket_summary_endpoint(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    summaries = await get_multiple_bucket_summaries(
+    summaries = await run_in_db_pool(
+        get_multiple_bucket_summaries,
         db=db,
         config_ids=payload.config_ids,
         config_types=payload.config_types,
@@ -75,6 +80,8 @@ def create_bucket_config(
         is_json = payload.target_field_is_json
         dataset_id = None
 
+    metrics = validated_metrics(payload.metrics)
+
     cfg = BucketConfig(
         id=uuid4(),
         dataset_id=dataset_id,
@@ -87,10 +94,12 @@ def create_bucket_config(
         target_field_is_json = is_json,
         bucket_config=payload.bucket_config,
         is_default=payload.is_default,
+        metrics=metrics,
     )
     db.add(cfg)
     db.commit()
     db.refresh(cfg)
+    bump_config_version()
     return cfg
 
 # @router.post("/default-bucket-configs", response_model=BucketConfigItem)
@@ -155,9 +164,15 @@ def update_bucket_config(
     if payload.is_default is not None:
         cfg.is_default = payload.is_default
 
+    if payload.metrics is not None:
+        # empty list drops config's own metrics
+        cfg.metrics = validated_metrics(payload.metrics)
+
     cfg.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(cfg)
+    bump_config_version()
+    invalidate_config(config_id)
     return cfg
 
 @router.delete("/bucket-configs/{config_id}")
@@ -176,6 +191,8 @@ def delete_bucket_config(
 
     db.delete(cfg)
     db.commit()
+    bump_config_version()
+    invalidate_config(config_id)
     return {"message": "Deleted"}
 
 @router.get("/{dataset_id}/check-config")
@@ -249,6 +266,14 @@ def field_list(dataset_id, db: Session = Depends(get_db)):
 
     return merged_fields
 
+def validated_metrics(metrics):
+    """Metrics of a bucket config payload as stored, 400 when invalid."""
+    try:
+        parse_metrics(metrics)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return metrics or None
+
 def is_dataset_provided(dataset_id:str)->bool:
 
     if not dataset_id:
@@ -282,7 +307,8 @@ async def export_bucket_summaries(
     db: Session = Depends(get_db),
     user=Depends(get_current_user)
 ):
-    summaries = await get_multiple_bucket_summaries(
+    summaries = await run_in_db_pool(
+        get_multiple_bucket_summaries,
         db=db,
         config_ids=payload.config_ids,
         config_types=payload.config_types,
@@ -5,6 +5,7 @@ import json
 import re
 import logging
 from app.core.database import get_db
+from app.core.db_threadpool import run_in_db_pool
 from app.core.auth.dependencies import get_current_user
 from app.models import models
 from app.services.llm_service import LLMService
@@ -20,7 +21,7 @@ llm_service = LLMService(provider="huggingface")  # Default to Hugging Face
 schema_mapper = SchemaMapper()
 
 
-async def get_direct_amount_response(query, dataset_id, db, query_type):
+def get_direct_amount_response(query, dataset_id, db, query_type):
     """
     Get direct amount responses from the database without using LLM.
     
@@ -112,6 +113,29 @@ async def get_direct_amount_response(query, dataset_id, db, query_type):
     # If we couldn't find any values, return None so the LLM can handle it
     return None
 
+def _amount_column_values(db, dataset_id, query_type, columns):
+    """
+    {column: max / min / avg of column} over loan records of dataset, columns without values are left out.
+    """
+    from sqlalchemy import text
+
+    aggregate = {'max': 'MAX', 'min': 'MIN', 'avg': 'AVG'}[query_type]
+    values = {}
+    for col in columns:
+        try:
+            # min skips zero amounts
+            sql = f"SELECT {aggregate}({col}) FROM loan_records WHERE dataset_id = :dataset_id AND {col} IS NOT NULL"
+            if query_type == 'min':
+                sql += f" AND {col} > 0"
+            result = db.execute(text(sql), {"dataset_id": dataset_id}).fetchone()
+
+            if result and result[0] is not None:
+                values[col] = float(result[0])
+                logger.info(f"Found {query_type} value for {col}: {values[col]}")
+        except Exception as e:
+            logger.error(f"Error querying {query_type} value for {col}: {e}")
+    return values
+
 # Prompt templates
 CHAT_QUERY_TEMPLATE = """
 You are a friendly, helpful assistant named Talk2Data that helps loan officers analyze their loan portfolio data.
@@ -167,10 +191,12 @@ async def chat_with_data(
     try:
         # Validate dataset exists and belongs to user
         dataset_uuid = UUID(dataset_id)
-        dataset = db.query(models.Dataset).filter(
-            models.Dataset.id == dataset_uuid,
-            models.Dataset.user_id == current_user.id
-        ).first()
+        dataset = await run_in_db_pool(
+            lambda: db.query(models.Dataset).filter(
+                models.Dataset.id == dataset_uuid,
+                models.Dataset.user_id == current_user.id
+            ).first()
+        )
         
         if not dataset:
             raise HTTPException(status_code=404, detail="Dataset not found")
@@ -179,7 +205,7 @@ async def chat_with_data(
         schema = schema_mapper.get_schema_description()
         
         # Get dataset statistics
-        dataset_stats = schema_mapper.get_dataset_statistics(str(dataset_uuid))
+        dataset_stats = await run_in_db_pool(schema_mapper.get_dataset_statistics, str(dataset_uuid))
         
         # Special handling for direct amount queries that don't need LLM
         direct_query_result = None
@@ -189,19 +215,19 @@ async def chat_with_data(
            any(term in query.lower() for term in ['loan', 'amount', 'sanction', 'disbursed', 'outstanding', 'principal']):
             
             logger.warning(f"DIRECT HANDLING: Bypassing LLM for maximum amount query: {query}")
-            direct_query_result = await get_direct_amount_response(query, str(dataset_uuid), db, 'max')
+            direct_query_result = await run_in_db_pool(get_direct_amount_response, query, str(dataset_uuid), db, 'max')
             
         elif any(term in query.lower() for term in ['minimum', 'min', 'lowest', 'smallest']) and \
              any(term in query.lower() for term in ['loan', 'amount', 'sanction', 'disbursed', 'outstanding', 'principal']):
             
             logger.warning(f"DIRECT HANDLING: Bypassing LLM for minimum amount query: {query}")
-            direct_query_result = await get_direct_amount_response(query, str(dataset_uuid), db, 'min')
+            direct_query_result = await run_in_db_pool(get_direct_amount_response, query, str(dataset_uuid), db, 'min')
             
         elif any(term in query.lower() for term in ['average', 'avg', 'mean']) and \
              any(term in query.lower() for term in ['loan', 'amount', 'sanction', 'disbursed', 'outstanding', 'principal']):
             
             logger.warning(f"DIRECT HANDLING: Bypassing LLM for average amount query: {query}")
-            direct_query_result = await get_direct_amount_response(query, str(dataset_uuid), db, 'avg')
+            direct_query_result = await run_in_db_pool(get_direct_amount_response, query, str(dataset_uuid), db, 'avg')
         
         # Use the direct result or generate a response using LLM
         if direct_query_result:
@@ -265,7 +291,7 @@ async def chat_with_data(
             
             # Execute the SQL query if it's present
             if sql_query:
-                query_results = QueryExecutor.execute_query(sql_query, str(dataset_uuid))
+                query_results = await run_in_db_pool(QueryExecutor.execute_query, sql_query, str(dataset_uuid))
                 
                 # If query execution was successful, enhance the response with the results
                 if "success" in query_results and query_results["success"]:
@@ -480,23 +506,10 @@ async def chat_with_data(
                         # For max loan amount queries, let's directly execute the correct query
                         if is_max_query and ('loan amount' in query.lower() or ('loan' in query.lower() and 'amount' in query.lower())):
                             # Execute a direct SQL query to get the max loan amount
-                            from sqlalchemy import text
-                            
                             # Use columns that actually exist in the database
                             amount_columns = ['sanction_amt', 'total_amt_disb', 'principal_os_amt', 'carrying_value_as_on_date']
                             
-                            max_values = {}
-                            for col in amount_columns:
-                                try:
-                                    # Execute SQL query directly
-                                    sql = text(f"SELECT MAX({col}) FROM loan_records WHERE dataset_id = :dataset_id AND {col} IS NOT NULL")
-                                    result = db.execute(sql, {"dataset_id": str(dataset_uuid)}).fetchone()
-                                    
-                                    if result and result[0] is not None:
-                                        max_values[col] = float(result[0])
-                                        logger.info(f"Found max value for {col}: {max_values[col]}")
-                                except Exception as e:
-                                    logger.error(f"Error querying max value for {col}: {e}")
+                            max_values = await run_in_db_pool(_amount_column_values, db, str(dataset_uuid), 'max', amount_columns)
                             
                             # If we found any valid max values
                             if max_values:
@@ -524,23 +537,10 @@ async def chat_with_data(
                         # For min loan amount queries, use the same approach as max queries
                         elif is_min_query and ('loan amount' in query.lower() or ('loan' in query.lower() and 'amount' in query.lower())):
                             # Execute a direct SQL query to get the min loan amount
-                            from sqlalchemy import text
-                            
                             # Use columns that actually exist in the database
                             amount_columns = ['sanction_amt', 'total_amt_disb', 'principal_os_amt', 'carrying_value_as_on_date']
                             
-                            min_values = {}
-                            for col in amount_columns:
-                                try:
-                                    # Execute SQL query directly
-                                    sql = text(f"SELECT MIN({col}) FROM loan_records WHERE dataset_id = :dataset_id AND {col} IS NOT NULL AND {col} > 0")
-                                    result = db.execute(sql, {"dataset_id": str(dataset_uuid)}).fetchone()
-                                    
-                                    if result and result[0] is not None:
-                                        min_values[col] = float(result[0])
-                                        logger.info(f"Found min value for {col}: {min_values[col]}")
-                                except Exception as e:
-                                    logger.error(f"Error querying min value for {col}: {e}")
+                            min_values = await run_in_db_pool(_amount_column_values, db, str(dataset_uuid), 'min', amount_columns)
                             
                             # If we found any valid min values
                             if min_values:
@@ -565,23 +565,10 @@ async def chat_with_data(
                         # For avg loan amount queries, use the same approach
                         elif is_avg_query and ('loan amount' in query.lower() or ('loan' in query.lower() and 'amount' in query.lower())):
                             # Execute a direct SQL query to get the avg loan amount
-                            from sqlalchemy import text
-                            
                             # Use columns that actually exist in the database
                             amount_columns = ['sanction_amt', 'total_amt_disb', 'principal_os_amt', 'carrying_value_as_on_date']
                             
-                            avg_values = {}
-                            for col in amount_columns:
-                                try:
-                                    # Execute SQL query directly
-                                    sql = text(f"SELECT AVG({col}) FROM loan_records WHERE dataset_id = :dataset_id AND {col} IS NOT NULL")
-                                    result = db.execute(sql, {"dataset_id": str(dataset_uuid)}).fetchone()
-                                    
-                                    if result and result[0] is not None:
-                                        avg_values[col] = float(result[0])
-                                        logger.info(f"Found avg value for {col}: {avg_values[col]}")
-                                except Exception as e:
-                                    logger.error(f"Error querying avg value for {col}: {e}")
+                            avg_values = await run_in_db_pool(_amount_column_values, db, str(dataset_uuid), 'avg', amount_columns)
                             
                             # If we found any valid avg values
                             if avg_values:
@@ -5,7 +5,6 @@ from sqlalchemy import func, text, create_engine, extract
 from typing import List, Dict, Any,Optional
 from uuid import UUID
 import uuid
-import io
 import pandas as pd
 import logging
 import json
@@ -16,7 +15,9 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, or_
 from decimal import Decimal
 from app.core.database import get_db
+from app.core.db_threadpool import run_in_db_pool
 from app.curd.crud import dataset_crud
+from app.services.dataset_partitions import drop_dataset_partition
 from app.curd.crud_loan_records import create_loan_records, get_loan_records as fetch_loan_records, update_collection_fields
 from app.schemas import schemas
 from app.models import models
@@ -26,10 +27,15 @@ from app.core.auth.dependencies import get_current_user, get_current_user_option
 from fastapi import APIRouter, Depends, HTTPException, File, Form, UploadFile, Request
 
 # Import the fixed writeoff summary function
-from app.api.fixed_writeoff_summary import generate_writeoff_pool_summary
+from app.api.fixed_writeoff_summary import generate_writeoff_pool_summary, WRITEOFF_POOL_COLUMNS
 
-# Import mapping based excel file reader, HVB @ 18/10/2025
-from app.services.excel_mapped_upload import fn_read_excel_map_base as read_excel_map,upload_to_postgres as db_upload
+# Mapping based excel upload runs as background ingestion job
+from app.services.ingestion_jobs import submit_mapped_upload, submit_reprocess, submit_delta_upload
+from app.services.artifact_store import retain_upload, release_artifact, unpin_artifact
+from app.services.summary_cache import bump_dataset_version, invalidate_dataset
+from app.services.config_cache import bump_config_version
+from app.services.record_columns import fetch_record_columns, assign_buckets, bucket_sums
+from app.services.upload_spool import spool_upload, remove_spooled_file, PeakMemory, UploadTooLarge
 
 # Import new model & List type for filter criteria fix HVB @ 26/10/2025
 from app.models.FilterCriteriaItem import FilterCriteriaItem
@@ -55,7 +61,7 @@ def get_datasets(
     return datasets
 
 #Added hvb @ 18/10/2025
-@router.post("/upload-mapped", response_model=schemas.Dataset)
+@router.post("/upload-mapped", response_model=schemas.IngestionJob, status_code=status.HTTP_202_ACCEPTED)
 async def upload_mapped_dataset(
 file: UploadFile = File(...),
     metadata: str = Form(None),
@@ -83,21 +89,22 @@ file: UploadFile = File(...),
             print(f"Error parsing metadata: {e}")
 
     print(f"Upload mapped dataset with mapping : {mapping_name}")
-    # Read the file
-    contents = await file.read()
-    file_size = len(contents)
 
     # Determine file type and read accordingly
     file_extension = file.filename.split('.')[-1].lower()
 
+    file_path = None
     # check if file type is xlsx
     try:
         if file_extension in ['xls', 'xlsx']:
              # remove this, no point of reading here!
              # df = pd.read_excel(io.BytesIO(contents))
             print("Upload mapped xls file")
+        elif file_extension == 'csv':
+            # allowed only for csv mapping profile, checked once profile is loaded
+            print("Upload mapped csv file")
         else:
-            raise HTTPException(status_code=400, detail="Unsupported file format. Please upload a Excel file.")
+            raise HTTPException(status_code=400, detail="Unsupported file format. Please upload a Excel or CSV file.")
 
         # mod hvb @ 20/11/2025 read mapping from db
         # get mappings from database in phase 2
@@ -113,30 +120,35 @@ file: UploadFile = File(...),
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid mapping id, {mapping_name}.")
 
-        config = get_full_profile_config(db, mapping_profile_id)
+        config = await run_in_db_pool(get_full_profile_config, db, mapping_profile_id)
 
         if not config:
             raise HTTPException(status_code=404, detail="Mapping profile not found")
 
-        underlying_file_type = config["underlying_file_type"]
+        source_format = config["mapping_config"]["source_format"]
+        if (file_extension == 'csv') != (source_format == "csv"):
+            raise HTTPException(status_code=400, detail=f"Mapping profile expects {source_format} file, uploaded file is {file_extension}.")
 
-        # Create dataset record in a separate transaction
-        try:
-                dataset = dataset_crud.create_dataset(
-                   db,
-                   schemas.DatasetCreate(name=dataset_name, description=dataset_description),
-                   user_id=current_user.id,
-                   file_name=file.filename,
-                   file_size=file_size,
-                   fileType=underlying_file_type # added hvb @ 02/12/2025
-                )
-                db.commit()  # Commit the dataset creation immediately
-        except Exception as e:
-                db.rollback()  # Explicitly rollback on error
-                print(f"Error creating dataset: {e}")
-                raise HTTPException(status_code=500, detail=f"Error creating dataset: {str(e)}")
+        # Stream the file to disk, parser opens it by path in background job
+        file_path, file_size, file_hash = await spool_upload(file)
 
-        print(f"Dataset created with id :{dataset.id}")
+        underlying_file_type = config["underlying_file_type"]
+
+        user_id = current_user.id
+        dataset = await run_in_db_pool(
+            _create_upload_dataset,
+            db,
+            user_id,
+            dataset_name,
+            dataset_description,
+            file.filename,
+            file_path,
+            file_size,
+            file_hash,
+            file_type=underlying_file_type,
+            mapping_profile_id=mapping_profile_id,
+        )
+        file_path = None
 
         # mod hvb @ 20/11/2025 read mapping from db
         # --- Example mapping for Excel with-out header and column as _alias_col_idx ---
@@ -175,21 +187,6 @@ file: UploadFile = File(...),
         if not column_mapping:
             raise HTTPException(status_code=404, detail="Mapping profile don't have column config,from backend")
 
-        try:
-            merged_df = read_excel_map(contents, mapping_config)
-        except Exception as read_error:
-            try:
-                # mod hvb @ 23/11/2025 shifted from mapping read to here.
-                print(f"❌ Error processing Excel: {read_error}")
-                db.refresh(dataset)  # Refresh to get the latest state
-                dataset.status = "error"
-                dataset.description = f"{dataset.description} (Error: {str(read_error)[:100]}...)"
-                db.commit()
-            except Exception as refresh_error:
-                db.rollback()
-                print(f"Error updating dataset status: {refresh_error}")
-
-            raise HTTPException(status_code=500, detail=f"Error reading loan records: {str(read_error)}")
         # --- Example column mapping (for upload) ---
         # while reading column configs for excel, read column config for database
         # this is mock only config.
@@ -256,60 +253,30 @@ file: UploadFile = File(...),
         # }
 
 
-        # --- Example DB Engine ---
-        # (replace credentials with your actual DB)
-        db_engine = db
-
-        if merged_df is not None:
-            # --- Upload merged data to Postgres ---
-            try:
-                upload_result = db_upload(
-                    dataset.id,
-                    merged_df,
-                    db_engine=db_engine.bind,
-                    table_name="loan_records",
-                    #table_name="loan_data", #testing with temporary table
-                    column_mapping=column_mapping,
-                    truncate_before_insert=False, ## Pass this as True only when temporary table
-                    # truncate_before_insert=True  ## Pass this as True only when temporary table
-                    # create_new_table=True
-                )
-
-                if upload_result["status"]:
-                    print(f'> Data successfully processed and uploaded count {upload_result["inserted"]} / {upload_result["total"]}')
-
-                    # Update dataset with record count
-                    dataset.total_records = upload_result["inserted"]
-                    db.commit()
-                else:
-                    print("❌ Failed to insert excel data into the database.")
-                    db.refresh(dataset)  # Refresh to get the latest state
-                    dataset.status = "error"
-                    msg = "Failed to insert excel data into the database."
-                    if upload_result["message"]:
-                        msg = upload_result["message"]
-                    dataset.description = f"{dataset.description} (Error: {msg[:100]}...)"
-                    db.commit()
-                    raise HTTPException(status_code=500, detail=f"Error adding loan records: {msg}")
-            except Exception as upload_error:
-                try:
-                    db.refresh(dataset)  # Refresh to get the latest state
-                    dataset.status = "error"
-                    dataset.description = f"{dataset.description} (Error: {str(upload_error)[:100]}...)"
-                    db.commit()
-                except Exception as refresh_error:
-                    db.rollback()
-                    print(f"Error updating dataset status: {refresh_error}")
-
-                raise HTTPException(status_code=500, detail=f"Error reading loan records: {str(upload_error)}")
-        else:
-            print("❌ Failed to read Excel file.")
+        # Parse & insert run in background, progress is tracked on ingestion job
+        job = await run_in_db_pool(
+            submit_mapped_upload,
+            db,
+            dataset,
+            user_id,
+            dataset.artifact_path,
+            mapping_config,
+            column_mapping,
+        )
 
-        return dataset
+        return job
 
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except HTTPException:
+        # validation errors keep their status code
+        db.rollback()
+        remove_spooled_file(file_path)
+        raise
     except Exception as e:
         # Ensure transaction is rolled back
         db.rollback()
+        remove_spooled_file(file_path)
 
         # Log the error and return a more helpful message
         print(f"Error processing file: {e}")
@@ -329,6 +296,210 @@ file: UploadFile = File(...),
 
         raise HTTPException(status_code=500, detail=f"Error processing file: {error_detail}")
 
+def _create_upload_dataset(
+    db: Session,
+    user_id,
+    dataset_name,
+    dataset_description,
+    file_name,
+    file_path,
+    file_size,
+    file_hash,
+    file_type=None,
+    mapping_profile_id=None,
+):
+    """
+    Creates dataset of an upload and moves spooled file into artifact store, blocking, run through run_in_db_pool.
+    """
+    # Create dataset record in a separate transaction
+    try:
+        dataset = dataset_crud.create_dataset(
+            db,
+            schemas.DatasetCreate(name=dataset_name, description=dataset_description),
+            user_id=user_id,
+            file_name=file_name,
+            file_size=file_size,
+            fileType=file_type,
+            file_sha256=file_hash
+        )
+        db.commit()  # Commit the dataset creation immediately
+    except Exception as e:
+        db.rollback()  # Explicitly rollback on error
+        print(f"Error creating dataset: {e}")
+        raise HTTPException(status_code=500, detail=f"Error creating dataset: {str(e)}")
+
+    print(f"Dataset created with id :{dataset.id}")
+
+    # Keep original upload with dataset, reprocess runs from it
+    artifact_path = retain_upload(file_path, file_hash, file_name)
+    try:
+        dataset.artifact_path = artifact_path
+        dataset.mapping_profile_id = mapping_profile_id
+        db.commit()
+    finally:
+        unpin_artifact(artifact_path)
+    # loaded here, not lazily on the event loop
+    db.refresh(dataset)
+    return dataset
+
+
+def _load_uploaded_file(
+    db: Session,
+    user_id,
+    dataset_name,
+    dataset_description,
+    file_name,
+    file_extension,
+    file_path,
+    file_size,
+    file_hash,
+):
+    """
+    Parses spooled upload and inserts its loan records, blocking, run through run_in_db_pool.
+    """
+    if file_extension == 'csv':
+        # Try different encodings if utf-8 fails
+        try:
+            df = pd.read_csv(file_path, encoding='utf-8')
+        except UnicodeDecodeError:
+            try:
+                df = pd.read_csv(file_path, encoding='latin-1')
+            except:
+                df = pd.read_csv(file_path, encoding='cp1252')
+    elif file_extension in ['xls', 'xlsx']:
+        df = pd.read_excel(file_path)
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported file format. Please upload a CSV or Excel file.")
+    
+    # Print the first few rows of the DataFrame for debugging
+    print(f"DataFrame head:\n{df.head(2)}")
+    print(f"DataFrame columns: {df.columns.tolist()}")
+    
+    dataset = _create_upload_dataset(
+        db, user_id, dataset_name, dataset_description, file_name, file_path, file_size, file_hash
+    )
+    
+    print("\n==== UPLOAD DATASET PROCESSING ====")
+    print(f"Dataset name: {dataset_name}")
+    print(f"File name: {file_name}")
+    print(f"File size: {file_size} bytes")
+    print(f"DataFrame shape: {df.shape}")
+    print(f"DataFrame columns: {df.columns.tolist()}")
+    
+    # SIMPLIFIED APPROACH: Convert DataFrame to records and preserve original column names
+    # Replace NaN/NA values with None for JSON serialization
+    try:
+        print("Replacing NA values...")
+        df = df.replace({pd.NA: None, pd.NaT: None, np.nan: None})
+        print("NA values replaced successfully")
+    except Exception as e:
+        print(f"Error replacing NA values: {e}")
+        # Try a simpler approach
+        df = df.fillna(value=None)
+        print("Used fillna as fallback")
+    
+    # Convert to records
+    try:
+        print("Converting DataFrame to records...")
+        records = df.to_dict('records')
+        print(f"Converted {len(records)} records successfully")
+    except Exception as e:
+        print(f"Error converting DataFrame to records: {e}")
+        raise HTTPException(status_code=500, detail=f"Error converting data to records: {str(e)}")
+    
+    # Log the first record for debugging
+    if records and len(records) > 0:
+        print(f"First record sample: {list(records[0].keys())[:10]}")
+        print(f"Sample values: {list(records[0].items())[:5]}")
+        
+        # Print the first 5 keys and values to help identify field names
+        print("First 5 keys and values:")
+        for i, (k, v) in enumerate(records[0].items()):
+            if i < 5:
+                print(f"  {k}: {v}")
+            else:
+                break
+        
+        # Look for key fields we need
+        key_fields = ['Loan No.', 'DPD', 'Classification', 'Principal O/S', 'Product Type', 'State', 
+                     'POST NPA COLLECTION', 'POST W OFF COLLECTION', 'Arbitration status']
+        for field in key_fields:
+            found = False
+            for col in records[0].keys():
+                if field.lower() in col.lower() or col.lower() in field.lower():
+                    print(f"Found similar field for {field}: {col} = {records[0][col]}")
+                    found = True
+                    break
+            if not found:
+                print(f"Could not find field similar to: {field}")
+                
+        # Create a mapping of expected field names to actual field names
+        field_mapping = {}
+        for expected_field in key_fields:
+            for actual_field in records[0].keys():
+                if expected_field.lower() in actual_field.lower() or \
+                   expected_field.lower().replace(' ', '_') in actual_field.lower() or \
+                   actual_field.lower() in expected_field.lower() or \
+                   actual_field.lower().replace('_', ' ') in expected_field.lower():
+                    field_mapping[expected_field] = actual_field
+                    break
+        
+        print(f"Field mapping: {field_mapping}")
+        
+        # Print all column names from the Excel file for reference
+        print(f"All columns in Excel file: {df.columns.tolist()}")
+        
+        # Print a few sample rows to verify data
+        print(f"Sample data (first 2 rows):")
+        for i, row in df.head(2).iterrows():
+            print(f"Row {i+1}:")
+            for col in df.columns[:5]:  # Print first 5 columns
+                print(f"  {col}: {row[col]}")
+            print("  ...")
+            for col in df.columns[-5:]:  # Print last 5 columns
+                print(f"  {col}: {row[col]}")
+            print("")
+        
+        # Check for specific important fields
+        important_fields = ['DPD', 'Classification', 'Principal O/S']
+        for field in important_fields:
+            similar_fields = [col for col in df.columns if field.lower() in col.lower() or col.lower() in field.lower()]
+            if similar_fields:
+                print(f"Found fields similar to {field}: {similar_fields}")
+                for similar_field in similar_fields:
+                    print(f"  Sample value: {df[similar_field].iloc[0]}")
+            else:
+                print(f"No fields similar to {field} found")
+        
+    # Create loan records in a separate transaction
+    try:
+        created_records = create_loan_records(db, records, dataset.id)
+        
+        # Update dataset with record count
+        dataset.total_records = len(records)
+        db.commit()
+        db.refresh(dataset)
+    except Exception as e:
+        db.rollback()  # Explicitly rollback on error
+        print(f"Error creating loan records: {e}")
+        import traceback
+        traceback.print_exc()
+        
+        # Try to update the dataset status to indicate an error
+        try:
+            db.refresh(dataset)  # Refresh to get the latest state
+            dataset.status = "error"
+            dataset.description = f"{dataset.description} (Error: {str(e)[:100]}...)"
+            db.commit()
+        except Exception as refresh_error:
+            db.rollback()
+            print(f"Error updating dataset status: {refresh_error}")
+        
+        raise HTTPException(status_code=500, detail=f"Error creating loan records: {str(e)}")
+    
+    return dataset
+
+
 @router.post("/upload", response_model=schemas.Dataset)
 async def upload_dataset(
     file: UploadFile = File(...),
@@ -350,165 +521,30 @@ async def upload_dataset(
         except Exception as e:
             print(f"Error parsing metadata: {e}")
     
-    # Read the file
-    contents = await file.read()
-    file_size = len(contents)
-    
     # Determine file type and read accordingly
     file_extension = file.filename.split('.')[-1].lower()
-    
+
+    mem = PeakMemory().start()
+    file_path = None
     try:
-        if file_extension == 'csv':
-            # Try different encodings if utf-8 fails
-            try:
-                df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-            except UnicodeDecodeError:
-                try:
-                    df = pd.read_csv(io.StringIO(contents.decode('latin-1')))
-                except:
-                    df = pd.read_csv(io.StringIO(contents.decode('cp1252')))
-        elif file_extension in ['xls', 'xlsx']:
-            df = pd.read_excel(io.BytesIO(contents))
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file format. Please upload a CSV or Excel file.")
-        
-        # Print the first few rows of the DataFrame for debugging
-        print(f"DataFrame head:\n{df.head(2)}")
-        print(f"DataFrame columns: {df.columns.tolist()}")
-        
-        # Create dataset record in a separate transaction
-        try:
-            dataset = dataset_crud.create_dataset(
-                db,
-                schemas.DatasetCreate(name=dataset_name, description=dataset_description),
-                user_id=current_user.id,
-                file_name=file.filename,
-                file_size=file_size
-            )
-            db.commit()  # Commit the dataset creation immediately
-        except Exception as e:
-            db.rollback()  # Explicitly rollback on error
-            print(f"Error creating dataset: {e}")
-            raise HTTPException(status_code=500, detail=f"Error creating dataset: {str(e)}")
-        
-        print("\n==== UPLOAD DATASET PROCESSING ====")
-        print(f"Dataset name: {dataset_name}")
-        print(f"File name: {file.filename}")
-        print(f"File size: {file_size} bytes")
-        print(f"DataFrame shape: {df.shape}")
-        print(f"DataFrame columns: {df.columns.tolist()}")
-        
-        # SIMPLIFIED APPROACH: Convert DataFrame to records and preserve original column names
-        # Replace NaN/NA values with None for JSON serialization
-        try:
-            print("Replacing NA values...")
-            df = df.replace({pd.NA: None, pd.NaT: None, np.nan: None})
-            print("NA values replaced successfully")
-        except Exception as e:
-            print(f"Error replacing NA values: {e}")
-            # Try a simpler approach
-            df = df.fillna(value=None)
-            print("Used fillna as fallback")
-        
-        # Convert to records
-        try:
-            print("Converting DataFrame to records...")
-            records = df.to_dict('records')
-            print(f"Converted {len(records)} records successfully")
-        except Exception as e:
-            print(f"Error converting DataFrame to records: {e}")
-            raise HTTPException(status_code=500, detail=f"Error converting data to records: {str(e)}")
-        
-        # Log the first record for debugging
-        if records and len(records) > 0:
-            print(f"First record sample: {list(records[0].keys())[:10]}")
-            print(f"Sample values: {list(records[0].items())[:5]}")
-            
-            # Print the first 5 keys and values to help identify field names
-            print("First 5 keys and values:")
-            for i, (k, v) in enumerate(records[0].items()):
-                if i < 5:
-                    print(f"  {k}: {v}")
-                else:
-                    break
-            
-            # Look for key fields we need
-            key_fields = ['Loan No.', 'DPD', 'Classification', 'Principal O/S', 'Product Type', 'State', 
-                         'POST NPA COLLECTION', 'POST W OFF COLLECTION', 'Arbitration status']
-            for field in key_fields:
-                found = False
-                for col in records[0].keys():
-                    if field.lower() in col.lower() or col.lower() in field.lower():
-                        print(f"Found similar field for {field}: {col} = {records[0][col]}")
-                        found = True
-                        break
-                if not found:
-                    print(f"Could not find field similar to: {field}")
-                    
-            # Create a mapping of expected field names to actual field names
-            field_mapping = {}
-            for expected_field in key_fields:
-                for actual_field in records[0].keys():
-                    if expected_field.lower() in actual_field.lower() or \
-                       expected_field.lower().replace(' ', '_') in actual_field.lower() or \
-                       actual_field.lower() in expected_field.lower() or \
-                       actual_field.lower().replace('_', ' ') in expected_field.lower():
-                        field_mapping[expected_field] = actual_field
-                        break
-            
-            print(f"Field mapping: {field_mapping}")
-            
-            # Print all column names from the Excel file for reference
-            print(f"All columns in Excel file: {df.columns.tolist()}")
-            
-            # Print a few sample rows to verify data
-            print(f"Sample data (first 2 rows):")
-            for i, row in df.head(2).iterrows():
-                print(f"Row {i+1}:")
-                for col in df.columns[:5]:  # Print first 5 columns
-                    print(f"  {col}: {row[col]}")
-                print("  ...")
-                for col in df.columns[-5:]:  # Print last 5 columns
-                    print(f"  {col}: {row[col]}")
-                print("")
-            
-            # Check for specific important fields
-            important_fields = ['DPD', 'Classification', 'Principal O/S']
-            for field in important_fields:
-                similar_fields = [col for col in df.columns if field.lower() in col.lower() or col.lower() in field.lower()]
-                if similar_fields:
-                    print(f"Found fields similar to {field}: {similar_fields}")
-                    for similar_field in similar_fields:
-                        print(f"  Sample value: {df[similar_field].iloc[0]}")
-                else:
-                    print(f"No fields similar to {field} found")
-            
-        # Create loan records in a separate transaction
-        try:
-            created_records = create_loan_records(db, records, dataset.id)
-            
-            # Update dataset with record count
-            dataset.total_records = len(records)
-            db.commit()
-        except Exception as e:
-            db.rollback()  # Explicitly rollback on error
-            print(f"Error creating loan records: {e}")
-            import traceback
-            traceback.print_exc()
-            
-            # Try to update the dataset status to indicate an error
-            try:
-                db.refresh(dataset)  # Refresh to get the latest state
-                dataset.status = "error"
-                dataset.description = f"{dataset.description} (Error: {str(e)[:100]}...)"
-                db.commit()
-            except Exception as refresh_error:
-                db.rollback()
-                print(f"Error updating dataset status: {refresh_error}")
-            
-            raise HTTPException(status_code=500, detail=f"Error creating loan records: {str(e)}")
-        
-        return dataset
+        # Stream the file to disk instead of holding it in memory, parsers read it by path
+        file_path, file_size, file_hash = await spool_upload(file)
+
+        # parse & insert block, they run off the event loop
+        return await run_in_db_pool(
+            _load_uploaded_file,
+            db,
+            current_user.id,
+            dataset_name,
+            dataset_description,
+            file.filename,
+            file_extension,
+            file_path,
+            file_size,
+            file_hash,
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
     except Exception as e:
         # Ensure transaction is rolled back
         db.rollback()
@@ -530,6 +566,10 @@ async def upload_dataset(
             error_detail = "Database transaction error. Please try again."
         
         raise HTTPException(status_code=500, detail=f"Error processing file: {error_detail}")
+    finally:
+        remove_spooled_file(file_path)
+        mem.stop()
+        print(f"📊 Upload {file.filename} memory {mem}")
 
 @router.get("/{dataset_id}/records", response_model=List[schemas.LoanRecord])
 def get_loan_records(
@@ -870,6 +910,7 @@ async def create_sample_records(
         
         # Update dataset record count
         dataset.total_records = len(db_records)
+        bump_dataset_version(db, dataset_uuid)
         db.commit()
         
         print(f"Created {len(db_records)} sample records")
@@ -879,7 +920,7 @@ async def create_sample_records(
         print(f"Error creating sample records: {e}")
         raise HTTPException(status_code=500, detail=f"Error creating sample records: {str(e)}")
 
-@router.post("/{dataset_id}/reprocess", response_model=schemas.Dataset)
+@router.post("/{dataset_id}/reprocess", response_model=schemas.IngestionJob, status_code=status.HTTP_202_ACCEPTED)
 async def reprocess_dataset(
     dataset_id: str,
     request: Request = None,  # Make request optional
@@ -887,156 +928,28 @@ async def reprocess_dataset(
     current_user: models.User = Depends(get_current_user_optional)
 ):
     """
-    Reprocess a dataset to fix issues with records not being saved properly.
-    This will attempt to read the original file and save the records again.
+    Reprocess a dataset from its retained original upload.
+    Runs as background ingestion job, new records replace old ones in a single transaction.
     """
+    print(f"\n==== REPROCESSING DATASET ====")
+    print(f"Reprocessing dataset: {dataset_id}")
     try:
-        # Convert string to UUID
-        print(f"\n==== REPROCESSING DATASET ====")
-        print(f"Reprocessing dataset: {dataset_id}")
-        try:
-            dataset_uuid = UUID(dataset_id)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid dataset ID format")
-        
-        # Check if dataset exists
-        dataset = dataset_crud.get_dataset(db, dataset_uuid)
-        if not dataset:
-            raise HTTPException(status_code=404, detail="Dataset not found")
-        
-        print(f"Found dataset: {dataset.name}, total_records: {dataset.total_records}")
-        
-        # Try to find the original file in the uploads directory
-        import os
-        from pathlib import Path
-        
-        # Define possible upload directories
-        upload_dirs = [
-            "./uploads",
-            "../uploads",
-            "./data",
-            "../data",
-            "/tmp/uploads",
-        ]
-        
-        # Try to find the file in one of the upload directories
-        file_path = None
-        for upload_dir in upload_dirs:
-            if os.path.exists(upload_dir):
-                # Look for files with the same name as the dataset file_name
-                if dataset.file_name:
-                    potential_path = os.path.join(upload_dir, dataset.file_name)
-                    if os.path.exists(potential_path):
-                        file_path = potential_path
-                        break
-                        
-                # If we didn't find an exact match, look for any Excel or CSV files
-                for file in os.listdir(upload_dir):
-                    if file.lower().endswith(('.xlsx', '.xls', '.csv')):
-                        file_path = os.path.join(upload_dir, file)
-                        break
-                        
-                if file_path:
-                    break
-        
-        # If we found the file, read it
-        records = []
-        if file_path:
-            print(f"Found original file: {file_path}")
-            try:
-                # Read the file based on its extension
-                file_extension = Path(file_path).suffix.lower()
-                
-                if file_extension in ['.csv']:
-                    # Try different encodings if utf-8 fails
-                    try:
-                        df = pd.read_csv(file_path, encoding='utf-8')
-                    except UnicodeDecodeError:
-                        try:
-                            df = pd.read_csv(file_path, encoding='latin-1')
-                        except:
-                            df = pd.read_csv(file_path, encoding='cp1252')
-                elif file_extension in ['.xls', '.xlsx']:
-                    df = pd.read_excel(file_path)
-                else:
-                    raise ValueError(f"Unsupported file format: {file_extension}")
-                    
-                # Replace NaN/NA values with None for JSON serialization
-                df = df.replace({pd.NA: None, pd.NaT: None, np.nan: None})
-                
-                # Convert to records
-                records = df.to_dict('records')
-                print(f"Successfully read {len(records)} records from file")
-                
-                # Print the first record for debugging
-                if records and len(records) > 0:
-                    print(f"First record sample: {list(records[0].keys())[:10]}")
-                    print(f"Sample values: {list(records[0].items())[:5]}")
-            except Exception as e:
-                print(f"Error reading file: {e}")
-                import traceback
-                traceback.print_exc()
-                raise HTTPException(status_code=500, detail=f"Error reading file: {str(e)}")
-        else:
-            print("Original file not found, generating sample records")
-            # Create sample records (matching the total_records in the dataset)
-            num_records = dataset.total_records or 99  # Default to 99 if total_records is not set
-            for i in range(num_records):
-                # Use the exact field names from the Excel file as seen in the image
-                record = {
-                    # Generate sample data
-                    "Loan No.": f"3019CD{i+1:06d}",
-                    "DPD": i % 90,
-                    "Classification": ["Standard", "Sub-standard", "W/off"][i % 3],
-                    "Principal O/S": 10000 + (i * 100),
-                    "Disbursement Date": f"2024-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}",
-                    "Sanction Date": f"2023-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}",
-                    "Date of NPA": f"2024-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}" if i % 3 == 1 else None,
-                    "Date of Write-off": f"2024-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}" if i % 3 == 2 else None,
-                    "Product Type": ["Consumer Durable", "Personal Loan", "Home Loan", "Auto Loan"][i % 4],
-                    "Property Value": 15000 + (i * 150) if i % 2 == 0 else None,
-                    "LTV": 65 + (i % 30) if i % 2 == 0 else None,
-                    "State": ["AP", "TN", "KA", "MH", "DL", "UP", "MP"][i % 7],
-                    "No. of EMI Paid": i % 24,
-                    "Balance Tenor": 24 - (i % 24),
-                    "Legal Status": ["None", "Notice Sent", "Arbitration", "Recovery"][i % 4],
-                    "POST NPA COLLECTION": i * 50 if i % 3 == 1 else 0,
-                    "6M Collection": i * 100 if i % 2 == 0 else 0,
-                    "12M Collection": i * 200 if i % 2 == 0 else 0,
-                }
-                records.append(record)
-        
-        # Delete existing records
-        print(f"Deleting existing records for dataset {dataset_id}")
-        deleted_count = db.query(models.LoanRecord).filter(models.LoanRecord.dataset_id == dataset_uuid).delete()
-        db.commit()
-        print(f"Deleted {deleted_count} existing records")
-        
-        # Now process the records (either from file or generated)
-        print(f"Processing {len(records)} records for dataset {dataset_id}")
-        
-        # Log the first record for debugging
-        if records and len(records) > 0:
-            print(f"First record sample: {list(records[0].keys())[:10]}")
-            print(f"Sample values: {list(records[0].items())[:5]}")
-        
-        # Save the records
-        print(f"Saving {len(records)} records to database")
-        created_records = loan_record_crud.create_loan_records(db, records, dataset_uuid)
-        
-        # Update the dataset record count
-        actual_record_count = len(created_records) if created_records else 0
-        print(f"Actually created {actual_record_count} records")
-        
-        dataset.total_records = actual_record_count
-        db.commit()
-        print(f"Updated dataset.total_records to {dataset.total_records}")
-        
-        # Verify records were created
-        verification_count = db.query(models.LoanRecord).filter(models.LoanRecord.dataset_id == dataset_uuid).count()
-        print(f"Verification: {verification_count} records exist in database for this dataset")
-        
-        return dataset
+        dataset_uuid = UUID(dataset_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid dataset ID format")
+
+    # Check if dataset exists
+    dataset = await run_in_db_pool(dataset_crud.get_dataset, db, dataset_uuid)
+    if not dataset:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+
+    print(f"Found dataset: {dataset.name}, total_records: {dataset.total_records}")
+
+    user_id = current_user.id if current_user else dataset.user_id
+    try:
+        return await run_in_db_pool(submit_reprocess, db, dataset, user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         db.rollback()
         print(f"Error reprocessing dataset: {e}")
@@ -1044,6 +957,65 @@ async def reprocess_dataset(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error reprocessing dataset: {str(e)}")
 
+@router.post("/{dataset_id}/upload-delta", response_model=schemas.IngestionJob, status_code=status.HTTP_202_ACCEPTED)
+async def upload_delta_dataset(
+    dataset_id: str,
+    file: UploadFile = File(...),
+    delete_missing: bool = Form(True),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Refreshes an existing mapped dataset from a new file, rows are matched by agreement_no.
+    New agreements are inserted, changed ones updated, unchanged ones left as is and agreements
+    missing from the file deleted (kept with delete_missing false). Counts are on the job's change_summary.
+    """
+    try:
+        dataset_uuid = UUID(dataset_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid dataset ID format")
+
+    dataset = await run_in_db_pool(dataset_crud.get_dataset, db, dataset_uuid)
+    if not dataset:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    if dataset.user_id != current_user.id and not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not authorized to access this dataset")
+    if dataset.mapping_profile_id is None:
+        raise HTTPException(status_code=409, detail="Delta upload needs a dataset loaded with a mapping profile.")
+
+    config = await run_in_db_pool(get_full_profile_config, db, dataset.mapping_profile_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Mapping profile not found")
+
+    file_extension = file.filename.split('.')[-1].lower()
+    source_format = config["mapping_config"]["source_format"]
+    if file_extension not in ['xls', 'xlsx', 'csv'] or (file_extension == 'csv') != (source_format == "csv"):
+        raise HTTPException(status_code=400, detail=f"Mapping profile expects {source_format} file, uploaded file is {file_extension}.")
+
+    file_path = None
+    artifact_path = None
+    try:
+        file_path, file_size, file_hash = await spool_upload(file)
+        artifact_path = await run_in_db_pool(retain_upload, file_path, file_hash, file.filename)
+        file_path = None
+        return await run_in_db_pool(
+            submit_delta_upload, db, dataset, current_user.id, artifact_path, file_hash, delete_missing=delete_missing
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ValueError as e:
+        db.rollback()
+        await run_in_db_pool(release_artifact, db, artifact_path, True)
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        remove_spooled_file(file_path)
+        await run_in_db_pool(release_artifact, db, artifact_path, True)
+        print(f"Error queueing delta upload: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Error queueing delta upload: {str(e)}")
+
 @router.post("/{dataset_id}/update-collection-fields")
 async def update_dataset_collection_fields(
     dataset_id: str,
@@ -1089,6 +1061,25 @@ async def update_dataset_collection_fields(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+def _delete_dataset_rows(db: Session, dataset: models.Dataset):
+    """Deletes dataset with its loan records in one transaction, blocking, run through run_in_db_pool."""
+    dataset_id = dataset.id
+    # Loan records of dataset are in their own partition, dropping it is much cheaper than deleting rows.
+    # Rows are deleted when loan_records is not partitioned yet.
+    if not drop_dataset_partition(db, dataset_id):
+        db.query(models.LoanRecord).filter(models.LoanRecord.dataset_id == dataset_id).delete()
+
+    # Delete the dataset
+    artifact_path = dataset.artifact_path
+    db.delete(dataset)
+    db.commit()
+
+    # Remove retained upload if no other dataset uses same file
+    release_artifact(db, artifact_path)
+    invalidate_dataset(dataset_id)
+    bump_config_version()
+
+
 @router.delete("/{dataset_id}", response_model=schemas.Dataset)
 async def delete_dataset(
     dataset_id: UUID,
@@ -1109,15 +1100,7 @@ async def delete_dataset(
         raise HTTPException(status_code=404, detail="Dataset not found or you don't have permission to delete it")
     
     try:
-        # Delete all loan records associated with this dataset
-        # SQLAlchemy will handle this automatically due to the cascade delete relationship
-        # But we can explicitly delete them for clarity
-        db.query(models.LoanRecord).filter(models.LoanRecord.dataset_id == dataset_id).delete()
-        
-        # Delete the dataset
-        db.delete(dataset)
-        db.commit()
-        
+        await run_in_db_pool(_delete_dataset_rows, db, dataset)
         return dataset
     except Exception as e:
         db.rollback()
@@ -1134,7 +1117,7 @@ async def get_dataset_summary(
     """
     Get summary data for a dataset (all records).
     """
-    return await generate_dataset_summary(dataset_id, db, current_user, None)
+    return await run_in_db_pool(generate_dataset_summary, dataset_id, db, current_user, None)
 
 @router.post("/{dataset_id}/summary", response_model=schemas.SummaryData)
 async def get_filtered_dataset_summary(
@@ -1148,7 +1131,7 @@ async def get_filtered_dataset_summary(
     Get summary data for a dataset with optional filter criteria.
     """
     # mod hvb @ 26/10/2025 pointed to new version for bug fixes allow multiple filters over same field
-    return await generate_dataset_summary(dataset_id, db, current_user, filter_criteria)
+    return await run_in_db_pool(generate_dataset_summary, dataset_id, db, current_user, filter_criteria)
 
 @router.post("/{dataset_id}/summary-v2")
 async def get_filtered_dataset_summary(
@@ -1164,7 +1147,7 @@ async def get_filtered_dataset_summary(
     """
     # mod hvb @ 26/10/2025 pointed to new version for bug fixes allow multiple filters over same field
     # return await generate_dataset_summary(dataset_id, db, current_user, filter_criteria)
-    return  await generate_dataset_summary_v2(dataset_id, db, current_user, filter_criteria)
+    return await run_in_db_pool(generate_dataset_summary_v2, dataset_id, db, current_user, filter_criteria)
 
 
 # hvb @ 26/10/2025
@@ -1172,7 +1155,7 @@ async def get_filtered_dataset_summary(
 # with ref. of original generate_dataset_summary function
 # reason for new function : old function allows only one filter per field.
 # updated portion code is marked with ###NEW BUG FIX
-async def generate_dataset_summary_v2(
+def generate_dataset_summary_v2(
         dataset_id: str,
         db: Session,
         current_user: models.User,
@@ -1397,7 +1380,8 @@ async def generate_dataset_summary_v2(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def generate_dataset_summary(
+# blocking, summary endpoints run it through run_in_db_pool
+def generate_dataset_summary(
     dataset_id: str,
     db: Session,
     current_user: models.User,
@@ -1468,29 +1452,16 @@ async def generate_dataset_summary(
                         
                         print(f"Applied filter: {db_field} {operator} {value}")
         
-        loan_records = query.all()
+        # only the columns both summaries read, as arrays
+        records = fetch_record_columns(query, {**WRITEOFF_POOL_COLUMNS, **DPD_SUMMARY_COLUMNS})
+        record_count = len(records["pos"])
         
-        print(f"Found {len(loan_records)} {filtered_records_info} for dataset {dataset.name}")
+        print(f"Found {record_count} {filtered_records_info} for dataset {dataset.name}")
         
-        # Check if any loan records have collection values
-        if loan_records:
-            collection_values_found = False
-            for i, record in enumerate(loan_records[:5]):  # Check first 5 records
-                m3 = getattr(record, 'm3_collection', None)
-                m6 = getattr(record, 'm6_collection', None)
-                m12 = getattr(record, 'm12_collection', None)
-                total = getattr(record, 'total_collection', None)
-                print(f"Record {i+1} collection values: m3={m3}, m6={m6}, m12={m12}, total={total}")
-                if any(val is not None and val != 0 for val in [m3, m6, m12, total]):
-                    collection_values_found = True
-            
-            print(f"Collection values found in records: {collection_values_found}")
-        
-        # Even if there are no loan records, we'll still generate the summary with mock data
+        # Even if there are no loan records, we'll still generate the summary with empty buckets
         # This ensures the frontend always gets a response
-        if not loan_records:
-            print(f"No loan records found for dataset {dataset_uuid}, using mock data")
-            # We'll continue with empty loan_records, the summary functions will handle it
+        if not record_count:
+            print(f"No loan records found for dataset {dataset_uuid}, returning empty buckets")
         
         # Use custom buckets if present
         default_pos_buckets = [
@@ -1506,7 +1477,7 @@ async def generate_dataset_summary(
         ]
         pos_buckets = get_custom_buckets(dataset_id, default_pos_buckets, bucket_type="writeOffPool")
         # Patch the writeoff summary function to accept custom buckets
-        writeoff_pool = generate_writeoff_pool_summary(loan_records, pos_buckets=pos_buckets)
+        writeoff_pool = generate_writeoff_pool_summary(records, pos_buckets=pos_buckets)
         print(f"Write-Off Pool summary generated with {len(writeoff_pool['rows'])} rows")
         # DPD buckets
         default_dpd_buckets = [
@@ -1536,7 +1507,7 @@ async def generate_dataset_summary(
             return default_buckets
         dpd_buckets = get_custom_dpd_buckets(dataset_id, default_dpd_buckets)
         # Patch the dpd summary function to accept custom buckets
-        dpd_summary = generate_dpd_summary(loan_records, dpd_buckets=dpd_buckets)
+        dpd_summary = generate_dpd_summary(records, dpd_buckets=dpd_buckets)
         result = {
             "writeOffPool": writeoff_pool,
             "dpdSummary": dpd_summary
@@ -1583,9 +1554,25 @@ async def generate_dataset_summary(
     return result
 
 
-def generate_dpd_summary(loan_records, dpd_buckets=None):
+# columns the DPD summary reads, fetched with fetch_record_columns
+DPD_SUMMARY_COLUMNS = {
+    "dpd": func.coalesce(models.LoanRecord.dpd, models.LoanRecord.dpd_as_on_31st_jan_2025),
+    # Added hvb @ 11/11/2025 to make it similar field read for both dpd and write off summaries
+    "pos": func.coalesce(models.LoanRecord.principal_os_amt, models.LoanRecord.pos_amount),
+    "disbursement_amount": func.coalesce(models.LoanRecord.disbursement_amount, models.LoanRecord.total_amt_disb),
+    "m3_collection": models.LoanRecord.m3_collection,
+    "m6_collection": models.LoanRecord.m6_collection,
+    "m12_collection": models.LoanRecord.m12_collection,
+    "total_collection": models.LoanRecord.total_collection,
+}
+
+
+def generate_dpd_summary(records, dpd_buckets=None):
     """
     Generate DPD Summary table from loan records.
+
+    Args:
+        records: {column of DPD_SUMMARY_COLUMNS: float array} of loan records
     """
     print("\n==== STARTING DPD SUMMARY GENERATION ====\n")
     # Use custom buckets if provided
@@ -1607,8 +1594,6 @@ def generate_dpd_summary(loan_records, dpd_buckets=None):
         ]
     print("Defined DPD buckets", dpd_buckets)
     
-    # No fallback values - we'll only use real data
-    
     # Initialize buckets with zero counts
     bucket_data = {}
     for bucket in dpd_buckets:
@@ -1627,7 +1612,6 @@ def generate_dpd_summary(loan_records, dpd_buckets=None):
             "totalCollection": 0.0,
             "posSundown": 0.0
         }
-    print("Initialized buckets with zero values")
     
     # Add a grand total bucket
     bucket_data["Grand Total"] = {
@@ -1645,169 +1629,36 @@ def generate_dpd_summary(loan_records, dpd_buckets=None):
         "totalCollection": 0.0,
         "posSundown": 0.0
     }
-    print("Initialized Grand Total bucket")
     
-    # Check if we have loan records to process
-    if not loan_records or len(loan_records) == 0:
-        print("No loan records found, returning empty buckets")
-    else:
-        print(f"Processing {len(loan_records)} loan records for DPD summary")
-        
-        # Debug: Print sample DPD values from the first few records
-        print("\n==== Sample DPD Values ====\n")
-        dpd_samples = []
-        for i, record in enumerate(loan_records[:10]):
-            dpd = record.dpd if record.dpd is not None else record.dpd_as_on_31st_jan_2025
-            pos = float(record.pos_amount) if record.pos_amount is not None else 0.0
-            dpd_samples.append((dpd, pos))
-            print(f"Record {i+1}: DPD = {dpd}, POS = {pos}")
-        print("\n==== End Sample DPD Values ====\n")
+    # Records without DPD or outside every bucket are left out, missing amounts count as 0
+    dpd = records["dpd"]
+    idx = assign_buckets(dpd, [(b["lower"], b["upper"]) for b in dpd_buckets])
+    n = len(dpd_buckets)
+    counts = np.bincount(idx[idx >= 0], minlength=n)
+    sums = {
+        # POS & disbursement in millions, collections as actual values
+        "pos": bucket_sums(idx, np.nan_to_num(records["pos"]) / 1000000, n),
+        "disbursementAmt": bucket_sums(idx, np.nan_to_num(records["disbursement_amount"]) / 1000000, n),
+        "3mCol": bucket_sums(idx, np.nan_to_num(records["m3_collection"]), n),
+        "6mCol": bucket_sums(idx, np.nan_to_num(records["m6_collection"]), n),
+        "12mCol": bucket_sums(idx, np.nan_to_num(records["m12_collection"]), n),
+        "totalCollection": bucket_sums(idx, np.nan_to_num(records["total_collection"]), n),
+    }
+    without_dpd = int(np.isnan(dpd).sum())
+    print(
+        f"Processed {len(dpd)} loan records: {len(dpd) - without_dpd} with DPD, {without_dpd} without, "
+        f"{len(dpd) - without_dpd - int(counts.sum())} outside bucket ranges"
+    )
     
-    # Process each loan record if we have real data
-    if loan_records and len(loan_records) > 0:
-        has_data = False
-        dpd_distribution = {bucket["name"]: 0 for bucket in dpd_buckets}
-        records_with_dpd = 0
-        records_without_dpd = 0
-        records_outside_buckets = 0
-        
-        for record in loan_records:
-            # Try to get DPD value from different possible fields
-            dpd_value = None
-            if hasattr(record, 'dpd') and record.dpd is not None:
-                dpd_value = float(record.dpd)
-            elif hasattr(record, 'dpd_as_on_31st_jan_2025') and record.dpd_as_on_31st_jan_2025 is not None:
-                dpd_value = float(record.dpd_as_on_31st_jan_2025)
-            elif hasattr(record, 'dpd_days') and record.dpd_days is not None:
-                dpd_value = float(record.dpd_days)
-            
-            if dpd_value is None:
-                records_without_dpd += 1
-                continue  # Skip records without DPD
-            
-            records_with_dpd += 1
-            
-            # Get financial values
-            pos_amount = 0.0
-            disbursement_amount = 0.0
-            
-            # Try to get POS amount from different possible fields
-            # Added hvb @ 11/11/2025 to make it similar field read for both dpd and write off summaries
-            if hasattr(record, 'principal_os_amt') and record.principal_os_amt is not None:
-                try:
-                    pos_amount = float(record.principal_os_amt)
-                except (ValueError, TypeError):
-                    #  print(f"Error converting principal_os_amt: {record.principal_os_amt}")
-                    pos_amount = 0
-            elif hasattr(record, 'pos_amount') and record.pos_amount is not None:
-                try:
-                    pos_amount = float(record.pos_amount)
-                except (ValueError, TypeError):
-                    pass
-            
-            # Try to get disbursement amount
-            if hasattr(record, 'disbursement_amount') and record.disbursement_amount is not None:
-                try:
-                    disbursement_amount = float(record.disbursement_amount)
-                except (ValueError, TypeError):
-                    pass
-            # Added hvb @ 05/11/2025 for column from db.
-            elif hasattr(record, 'total_amt_disb') and record.total_amt_disb is not None:
-                try:
-                    disbursement_amount = float(record.total_amt_disb)
-                except (ValueError, TypeError):
-                    pass
-            
-            # Find the appropriate bucket for this record
-            bucket_name = None
-            for bucket in dpd_buckets:
-                if bucket["lower"] <= dpd_value < bucket["upper"]:
-                    bucket_name = bucket["name"]
-                    dpd_distribution[bucket_name] += 1
-                    break
-            
-            if bucket_name is None:
-                records_outside_buckets += 1
-                print(f"Record with DPD {dpd_value} doesn't fit in any bucket")
-                continue  # Skip records that don't fit in any bucket
-            
-            has_data = True  # We found at least one valid record
-            
-            # Update bucket data
-            bucket_data[bucket_name]["noOfAccs"] += 1
-            bucket_data[bucket_name]["pos"] += pos_amount / 1000000  # Convert to millions
-            bucket_data[bucket_name]["disbursementAmt"] += disbursement_amount / 1000000
-            
-            # Update collection data
-            m3_col = 0.0
-            m6_col = 0.0
-            m12_col = 0.0
-            total_col = 0.0
-            
-            # Try to get collection values safely
-            if hasattr(record, 'm3_collection') and record.m3_collection is not None:
-                try:
-                    m3_col = float(record.m3_collection)
-                except (ValueError, TypeError):
-                    pass
-                    
-            if hasattr(record, 'm6_collection') and record.m6_collection is not None:
-                try:
-                    m6_col = float(record.m6_collection)
-                except (ValueError, TypeError):
-                    pass
-                    
-            if hasattr(record, 'm12_collection') and record.m12_collection is not None:
-                try:
-                    m12_col = float(record.m12_collection)
-                except (ValueError, TypeError):
-                    pass
-                    
-            if hasattr(record, 'total_collection') and record.total_collection is not None:
-                try:
-                    total_col = float(record.total_collection)
-                except (ValueError, TypeError):
-                    pass
-            
-            # Add collection values without dividing by 1,000,000 to show actual values
-            bucket_data[bucket_name]["3mCol"] += m3_col
-            bucket_data[bucket_name]["6mCol"] += m6_col
-            bucket_data[bucket_name]["12mCol"] += m12_col
-            bucket_data[bucket_name]["totalCollection"] += total_col
-            
-            # Update grand total
-            bucket_data["Grand Total"]["noOfAccs"] += 1
-            bucket_data["Grand Total"]["pos"] += pos_amount / 1000000  # Keep POS in millions
-            bucket_data["Grand Total"]["disbursementAmt"] += disbursement_amount / 1000000  # Keep disbursement in millions
-            bucket_data["Grand Total"]["3mCol"] += m3_col
-            bucket_data["Grand Total"]["6mCol"] += m6_col
-            bucket_data["Grand Total"]["12mCol"] += m12_col
-            bucket_data["Grand Total"]["totalCollection"] += total_col
-        
-        # Print DPD distribution statistics
-        print(f"\n==== DPD Distribution Statistics ====\n")
-        print(f"Total records: {len(loan_records)}")
-        print(f"Records with DPD: {records_with_dpd}")
-        print(f"Records without DPD: {records_without_dpd}")
-        print(f"Records outside bucket ranges: {records_outside_buckets}")
-        print("\nDistribution across buckets:")
-        for bucket_name, count in dpd_distribution.items():
-            print(f"  {bucket_name}: {count} records")
-        print("\n==== End DPD Distribution Statistics ====\n")
-        
-        # Log whether we found valid data
-        if not has_data:
-            print("No valid DPD records found in loan data, using empty values")
-        else:
-            print("Using real data for DPD summary")
-            
-            # Only estimate POS values if needed, but don't add any collection values
-            total_accs = bucket_data["Grand Total"]["noOfAccs"]
-            total_pos = bucket_data["Grand Total"]["pos"]
-            
-            # If we have accounts but no POS values, log this but don't estimate
-            if total_accs > 0 and total_pos == 0:
-                print("Found accounts but no POS values in the data. Using actual values (0) for POS.")
+    grand_total = bucket_data["Grand Total"]
+    for i, bucket in enumerate(dpd_buckets):
+        row = bucket_data[bucket["name"]]
+        row["noOfAccs"] = int(counts[i])
+        for key, values in sums.items():
+            row[key] = float(values[i])
+    grand_total["noOfAccs"] = int(counts.sum())
+    for key, values in sums.items():
+        grand_total[key] = float(values.sum())
     
     # Calculate percentages and POS Sundown
     total_pos = bucket_data["Grand Total"]["pos"]
@@ -1819,7 +1670,6 @@ def generate_dpd_summary(loan_records, dpd_buckets=None):
             if bucket_data[bucket_name]["pos"] > 0:
                 bucket_data[bucket_name]["posSundown"] = (bucket_data[bucket_name]["totalCollection"] / bucket_data[bucket_name]["pos"]) * 100
     
-    print(f"DPD Summary calculations complete")
     print(f"Total POS: {bucket_data['Grand Total']['pos']}")
     print(f"Total Accounts: {bucket_data['Grand Total']['noOfAccs']}")
     print(f"Total Collection: {bucket_data['Grand Total']['totalCollection']}")
@@ -1832,10 +1682,10 @@ def generate_dpd_summary(loan_records, dpd_buckets=None):
                 bucket_data[bucket_name][key] = 0.0  # Replace non-JSON-serializable floats with 0.0
             # Remove string conversion for collection values; keep as float
             if key in ['3mCol', '6mCol', '12mCol', 'totalCollection']:
-                bucket_data[bucket_name][key] = float(value)
-            elif isinstance(value, float):
+                bucket_data[bucket_name][key] = float(bucket_data[bucket_name][key])
+            elif isinstance(bucket_data[bucket_name][key], float):
                 # Round other float values to 2 decimal places
-                bucket_data[bucket_name][key] = round(value, 2)
+                bucket_data[bucket_name][key] = round(bucket_data[bucket_name][key], 2)
     
     # Prepare the summary table
     columns = [
@@ -1853,25 +1703,10 @@ def generate_dpd_summary(loan_records, dpd_buckets=None):
         {"key": "posSundown", "title": "POS SUNDOWN"}
     ]
     
-    # Convert bucket data to rows
-    rows = []
-    for bucket in dpd_buckets:
-        rows.append(bucket_data[bucket["name"]])
-    
-    # Add grand total row at the end
+    # Convert bucket data to rows, grand total row at the end
+    rows = [bucket_data[bucket["name"]] for bucket in dpd_buckets]
     rows.append(bucket_data["Grand Total"])
     
-    # Debug the final result
-    print("\n==== Debug DPD Summary ====\n")
-    for i, row in enumerate(rows):
-        print(f"Row {i+1} - Bucket: {row['bucket']}")
-        print(f"  Accounts: {row['noOfAccs']}")
-        print(f"  POS: {row['pos']}")
-        print(f"  3M Col: {row['3mCol']}")
-        print(f"  Total Collection: {row['totalCollection']}")
-        print("---")
-    print("\n==== End Debug DPD Summary ====\n")
-    
     return {
         "id": "dpdSummary",
         "title": "DPD Summary",
@@ -1953,6 +1788,7 @@ async def reprocess_csv_dataset(dataset_id: str, db: Session = Depends(get_db)):
         # Update the dataset with the new record count
         dataset.total_records = len(created_records) if created_records else 0
         dataset.processed = True
+        bump_dataset_version(db, dataset_uuid)
         db.commit()
         
         # Verify records were created
@@ -1983,6 +1819,8 @@ def update_file_type(
     dataset.file_type = payload.file_type
     db.commit()
     db.refresh(dataset)
+    # effective configs depend on file type
+    bump_config_version()
 
     return {"message": "File type updated", "file_type": dataset.file_type}
 
@@ -0,0 +1,59 @@
+from typing import List
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.core.auth.dependencies import get_current_user
+from app.models import models
+from app.schemas import schemas
+from app.services.ingestion_jobs import get_job, get_jobs_for_dataset, request_cancel
+
+router = APIRouter()
+
+
+def _can_access_dataset(db: Session, dataset_id, user: models.User) -> bool:
+    if user.is_superuser:
+        return True
+    dataset = db.query(models.Dataset.user_id).filter(models.Dataset.id == dataset_id).first()
+    return dataset is not None and dataset.user_id == user.id
+
+
+def _get_accessible_job(db: Session, job_id, user: models.User):
+    """Job submitted by user or on a dataset of user, 404 otherwise (superusers see all jobs)."""
+    job = get_job(db, job_id)
+    if not job or (job.user_id != user.id and not _can_access_dataset(db, job.dataset_id, user)):
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
+
+
+@router.get("/dataset/{dataset_id}", response_model=List[schemas.IngestionJob])
+def list_dataset_jobs(
+    dataset_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    if not _can_access_dataset(db, dataset_id, current_user):
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    return get_jobs_for_dataset(db, dataset_id)
+
+
+@router.get("/{job_id}", response_model=schemas.IngestionJob)
+def get_ingestion_job(
+    job_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    job = _get_accessible_job(db, job_id, current_user)
+    return job
+
+
+@router.post("/{job_id}/cancel", response_model=schemas.IngestionJob)
+def cancel_ingestion_job(
+    job_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    job = _get_accessible_job(db, job_id, current_user)
+    return request_cancel(db, job)
@@ -6,6 +6,7 @@ from typing import Dict, Any, List, Optional
 import logging
 
 from app.core.database import get_db
+from app.core.db_threadpool import run_in_db_pool
 from app.core.auth.dependencies import get_current_user
 from app.models import models
 from app.models.pool_selection import PoolSelection, PoolSelectionRecord
@@ -32,6 +33,10 @@ async def filter_loan_pool(
     Filter loan records based on specified criteria and return matching records.
     This is used for the initial filtering step.
     """
+    return await run_in_db_pool(_filter_loan_pool, dataset_id, filter_criteria, db)
+
+def _filter_loan_pool(dataset_id: str, filter_criteria: Dict[str, Any], db: Session):
+    """Blocking part of filter_loan_pool, runs on the db threadpool."""
     try:
         logger.info(f"Filter request received with dataset_id: {dataset_id}")
         logger.info(f"Filter criteria: {filter_criteria}")
@@ -325,6 +330,7 @@ async def save_selection(
         for record in records:
             pool_record = PoolSelectionRecord(
                 pool_selection_id=pool_selection.id,
+                dataset_id=dataset_id,
                 loan_record_id=record["id"],
                 principal_os_amt=record["principal_os_amt"]
             )
@@ -404,7 +410,7 @@ async def get_selection(
         records_query = """
         SELECT lr.*
         FROM loan_records lr
-        JOIN pool_selection_records psr ON lr.id = psr.loan_record_id
+        JOIN pool_selection_records psr ON lr.dataset_id = psr.dataset_id AND lr.id = psr.loan_record_id
         WHERE psr.pool_selection_id = :selection_id
         """
         
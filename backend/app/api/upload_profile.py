@@ -1,6 +1,6 @@
 # routes/mapping_profiles.py
 import sqlalchemy
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from typing import List
 import json
@@ -15,9 +15,10 @@ from app.models.upload_profile import (
 )
 from app.schemas.schemas import (
     MappingProfileCreateSchema, MappingProfileOutSchema,
-    MappingProfileUpdateSchema, ColumnInfo
+    MappingProfileUpdateSchema, ColumnInfo, FilePreviewSchema
 )
 from app.services.record_fields_service import get_table_columns
+from app.services.excel_processor import preview_file, PreviewError, PREVIEW_ROWS
 
 router = APIRouter()
 
@@ -85,6 +86,7 @@ def create_profile(payload: MappingProfileCreateSchema, db: Session = Depends(ge
         name=payload.name,
         description=payload.description,
         file_type=payload.file_type,
+        source_format=payload.source_format,
         is_global=payload.is_global,
         created_by=user.id,
         profile_json=payload.model_dump()  # store snapshot
@@ -101,7 +103,9 @@ def create_profile(payload: MappingProfileCreateSchema, db: Session = Depends(ge
             header_row=sh.header_row,
             skip_rows=sh.skip_rows,
             cols_to_read=sh.cols_to_read,
-            key_columns=sh.key_columns
+            key_columns=sh.key_columns,
+            delimiter=sh.delimiter,
+            encoding=sh.encoding
         )
         db.add(sheet)
         db.flush()
@@ -128,7 +132,8 @@ def create_profile(payload: MappingProfileCreateSchema, db: Session = Depends(ge
     # relations
     for rel in payload.relations or []:
         db.add(SheetRelation(profile_id=profile.id, left_sheet=rel.left_sheet, right_sheet=rel.right_sheet,
-                             left_col=rel.left_col, right_col=rel.right_col, how=rel.how))
+                             left_col=rel.left_col, right_col=rel.right_col, how=rel.how,
+                             on_duplicate=rel.on_duplicate))
     db.commit()
     db.refresh(profile)
     return profile
@@ -161,6 +166,20 @@ def available_columns(
     return rows
 
 
+# PREVIEW of a sample file while authoring a profile, only first rows of every sheet are read
+@router.post("/preview", response_model=FilePreviewSchema)
+def preview_upload(
+        file: UploadFile = File(...),
+        rows: int = Form(PREVIEW_ROWS),
+        delimiter: str = Form(","),
+        encoding: str = Form("utf-8"),
+        user=Depends(get_current_user)
+):
+    try:
+        return preview_file(file.file, file.filename, rows, delimiter=delimiter, encoding=encoding)
+    except (PreviewError, LookupError, UnicodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # LIST (global + owned)
 @router.get("/", response_model=List[MappingProfileOutSchema])
 def list_profiles(db: Session = Depends(get_db), user=Depends(get_current_user)):
@@ -197,6 +216,7 @@ def get_profile(profile_id: int, db: Session = Depends(get_db), user=Depends(get
     resp = {
         "id": profile.id, "name": profile.name, "description": profile.description,
         "file_type" : profile.file_type,
+        "source_format": profile.source_format,
         "is_global": profile.is_global, "is_active": profile.is_active,
         "sheets": [], "column_mappings": [], "relations": []
     }
@@ -211,6 +231,8 @@ def get_profile(profile_id: int, db: Session = Depends(get_db), user=Depends(get
             "skip_rows": sh.skip_rows,
             "cols_to_read": sh.cols_to_read,
             "key_columns": sh.key_columns,
+            "delimiter": sh.delimiter,
+            "encoding": sh.encoding,
             "extra": [],
             "cleanup": []
         }
@@ -232,7 +254,8 @@ def get_profile(profile_id: int, db: Session = Depends(get_db), user=Depends(get
             "right_sheet": r.right_sheet,
             "left_col": r.left_col,
             "right_col": r.right_col,
-            "how": r.how
+            "how": r.how,
+            "on_duplicate": r.on_duplicate
         })
     return resp
 
@@ -252,7 +275,7 @@ def update_profile(profile_id: int, payload: MappingProfileUpdateSchema, db: Ses
 
     # Update basic fields
     for k,v in payload.model_dump().items():
-        if k in ("name","description","is_global","file_type") and v is not None:
+        if k in ("name","description","is_global","file_type","source_format") and v is not None:
             setattr(profile, k, v)
     # If sheets or mappings sent, simplest approach: delete existing and recreate
     if payload.sheets is not None:
@@ -266,7 +289,9 @@ def update_profile(profile_id: int, payload: MappingProfileUpdateSchema, db: Ses
                 header_row=sh.header_row,
                 skip_rows=sh.skip_rows,
                 cols_to_read=sh.cols_to_read,
-                key_columns=sh.key_columns
+                key_columns=sh.key_columns,
+                delimiter=sh.delimiter,
+                encoding=sh.encoding
             )
             db.add(sheet); db.flush()
             if sh.extra:
@@ -294,7 +319,7 @@ def update_profile(profile_id: int, payload: MappingProfileUpdateSchema, db: Ses
     if payload.relations is not None:
         db.query(SheetRelation).filter(SheetRelation.profile_id == profile.id).delete()
         for rel in payload.relations:
-            db.add(SheetRelation(profile_id=profile.id, left_sheet=rel.left_sheet, right_sheet=rel.right_sheet, left_col=rel.left_col, right_col=rel.right_col, how=rel.how))
+            db.add(SheetRelation(profile_id=profile.id, left_sheet=rel.left_sheet, right_sheet=rel.right_sheet, left_col=rel.left_col, right_col=rel.right_col, how=rel.how, on_duplicate=rel.on_duplicate))
 
     profile.profile_json = payload.model_dump()
     db.commit()
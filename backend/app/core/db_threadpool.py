@@ -0,0 +1,39 @@
+# core/db_threadpool.py
+# Bounded threadpool for blocking database / pandas work of async endpoints.
+# Sync SQLAlchemy sessions block the thread they run on, called straight from an async endpoint they
+# stall the event loop and every other request of the worker waits for the query. Such work is run
+# through run_in_db_pool instead, at most DB_THREADPOOL_SIZE calls at once, further calls wait for a
+# free slot without blocking the loop. Pool is kept separate from the threadpool FastAPI runs sync
+# endpoints & dependencies on, so long summaries can not take every thread away from cheap requests.
+# Connection budget of a worker against the engine's pool (5 + 10 overflow): a call here holds its
+# request's connection, DB_THREADPOOL_SIZE at once, bucket summaries take up to SUMMARY_FANOUT_CONNECTIONS
+# more across the process, ingestion jobs two each (INGESTION_WORKERS): a load holds a raw connection
+# for its whole COPY and the job's session checks out another to record progress. Defaults
+# 8 + 2 + 2 * 2 = 14 leave 1 connection to sync endpoints & dependencies, raise the engine's pool
+# before raising any of these.
+# Session is not thread safe, a request's session must only be used by one call at a time.
+
+import functools
+import os
+
+import anyio
+
+DB_THREADPOOL_SIZE = int(os.getenv("DB_THREADPOOL_SIZE", "8"))
+
+_limiter = None
+
+
+def _get_limiter():
+    # created on first use, inside the running event loop
+    global _limiter
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(DB_THREADPOOL_SIZE)
+    return _limiter
+
+
+async def run_in_db_pool(fn, *args, **kwargs):
+    """
+    Runs fn(*args, **kwargs) on a worker thread of the bounded pool and waits for its result.
+    Exceptions raised by fn (HTTPException included) are raised to the caller.
+    """
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs), limiter=_get_limiter())
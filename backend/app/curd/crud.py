@@ -9,6 +9,7 @@ import datetime
 import re
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
+from app.services.dataset_partitions import create_dataset_partition
 
 # Password hashing context - use sha256_crypt instead of bcrypt due to compatibility issues
 pwd_context = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
@@ -79,7 +80,7 @@ class CRUDDataset:
             query = query.filter(models.Dataset.user_id == user_id)
         return query.offset(skip).limit(limit).all()
     
-    def create_dataset(self, db: Session, dataset: schemas.DatasetCreate, user_id: UUID, file_name: str = None, file_size: int = 0,fileType: str = None) -> models.Dataset:
+    def create_dataset(self, db: Session, dataset: schemas.DatasetCreate, user_id: UUID, file_name: str = None, file_size: int = 0,fileType: str = None, file_sha256: str = None) -> models.Dataset:
         db_dataset = models.Dataset(
             name=dataset.name,
             description=dataset.description,
@@ -87,8 +88,12 @@ class CRUDDataset:
             file_name=file_name,
             file_size=file_size,
             file_type=fileType, #Added hvb @ 02/12/2025
+            file_sha256=file_sha256,
         )
         db.add(db_dataset)
+        db.flush()
+        # loan_records partition of dataset, committed together with dataset
+        create_dataset_partition(db, db_dataset.id)
         db.commit()
         db.refresh(db_dataset)
         return db_dataset
@@ -2,14 +2,26 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import datasets, auth, chat, pool_selection, filter_management, upload_profile, bucket_summary # added hvb @ 15/11/2025 upload_profile,added hvb @ 26/11/2025 bucket_summary
 from app.api import fields_management
-from app.core.database import engine
+from app.api import ingestion_jobs
+from app.core.database import engine, SessionLocal
 from app.models import models, pool_selection as pool_models
+from app.services.ingestion_jobs import fail_unfinished_jobs
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="TalkToData LoanPro API")
 
+
+@app.on_event("startup")
+def fail_interrupted_ingestion_jobs():
+    # jobs run in this process, ones left unfinished by the last run would stay running forever
+    db = SessionLocal()
+    try:
+        fail_unfinished_jobs(db)
+    finally:
+        db.close()
+
 # Enable CORS with detailed error information
 app.add_middleware(
     CORSMiddleware,
@@ -33,6 +45,7 @@ app.include_router(upload_profile.router, prefix="/api/upload-profile", tags=["u
 app.include_router(bucket_summary.router, prefix="/api/data-bucket", tags=["bucket-summary"]) # added hvb @ 15/11/2025
 
 app.include_router(fields_management.router, prefix="/api/fields-mgmt", tags=["fields-management"])
+app.include_router(ingestion_jobs.router, prefix="/api/ingestion-jobs", tags=["ingestion-jobs"])
 
 @app.get("/")
 def read_root():
@@ -46,8 +46,10 @@ def run_migration():
             CREATE TABLE IF NOT EXISTS pool_selection_records (
                 id SERIAL PRIMARY KEY,
                 pool_selection_id INTEGER NOT NULL REFERENCES pool_selections(id) ON DELETE CASCADE,
-                loan_record_id UUID NOT NULL REFERENCES loan_records(id) ON DELETE CASCADE,
-                principal_os_amt NUMERIC NOT NULL
+                dataset_id UUID NOT NULL,
+                loan_record_id UUID NOT NULL,
+                principal_os_amt NUMERIC NOT NULL,
+                FOREIGN KEY (dataset_id, loan_record_id) REFERENCES loan_records(dataset_id, id) ON DELETE CASCADE
             )
             """))
             
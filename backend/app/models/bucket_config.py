@@ -20,6 +20,8 @@ class BucketConfig(Base):
     bucket_config = Column(JSONB, nullable=False)
     target_field = Column(String(255), nullable=False)
     target_field_is_json = Column(Boolean, default=False)
+    # metrics added to the standard ones of its summary, see services/summary_metrics.py
+    metrics = Column(JSONB, nullable=True)
 
     is_default = Column(Boolean, default=False)
     description = Column(Text)
@@ -0,0 +1,38 @@
+from sqlalchemy import (
+    Column, Integer, BigInteger, Float, Numeric, DateTime, ForeignKey
+)
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class DatasetCube(Base):
+    """Aggregate cube of a dataset, built for data_version of dataset."""
+    __tablename__ = "dataset_cubes"
+
+    dataset_id = Column(UUID(as_uuid=True), ForeignKey("datasets.id", ondelete="CASCADE"), primary_key=True)
+    data_version = Column(Integer, nullable=False)
+    # [[field, is_json], ...] cells are grouped on
+    fields = Column(JSONB, nullable=False)
+    cell_count = Column(Integer, nullable=False)
+    build_seconds = Column(Float, nullable=True)
+    built_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class DatasetCubeCell(Base):
+    """Summary metric sums of loan records sharing same values of cube fields."""
+    __tablename__ = "dataset_cube_cells"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    dataset_id = Column(UUID(as_uuid=True), ForeignKey("datasets.id", ondelete="CASCADE"), nullable=False, index=True)
+    # {field: value}, values as in loan record (JSON fields as in additional_fields)
+    dims = Column(JSONB, nullable=False)
+    row_count = Column(BigInteger, nullable=False)
+
+    principal_os_amt = Column(Numeric, nullable=True)
+    disbursement_amount = Column(Numeric, nullable=True)
+    post_npa_collection = Column(Numeric, nullable=True)
+    post_woff_collection = Column(Numeric, nullable=True)
+    m6_collection = Column(Numeric, nullable=True)
+    m12_collection = Column(Numeric, nullable=True)
+    total_collection = Column(Numeric, nullable=True)
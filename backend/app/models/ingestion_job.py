@@ -0,0 +1,50 @@
+from sqlalchemy import (
+    Column, String, Boolean, DateTime, Integer, BigInteger, Text, ForeignKey, Index, text
+)
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.sql import func
+import uuid
+from app.core.database import Base
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    # one queued or running job per dataset (sql/feat_ingest_jobs/009)
+    __table_args__ = (
+        Index(
+            "ux_ingestion_jobs_dataset_active", "dataset_id", unique=True,
+            postgresql_where=text("status in ('queued', 'running')"),
+        ),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    dataset_id = Column(UUID(as_uuid=True), ForeignKey("datasets.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+
+    job_type = Column(String(50), nullable=False, default="upload_mapped")
+    # queued -> running -> completed / failed / cancelled
+    status = Column(String(50), nullable=False, default="queued")
+    # stage currently executing, e.g. parsing, loading, streaming (pipelined parse & load)
+    stage = Column(String(50), nullable=False, default="queued")
+
+    rows_processed = Column(Integer, default=0)
+    total_rows = Column(Integer, nullable=True)
+    # {"parsing": 12.4, "loading": 3.1} seconds spent per stage
+    stage_timings = Column(JSONB, nullable=True)
+    # {"Pool": {"_Pool_col_7": 12}} values nulled by clean-up rules, per sheet & column
+    rejected_values = Column(JSONB, nullable=True)
+    # highest resident memory of api process seen while job ran
+    peak_memory_bytes = Column(BigInteger, nullable=True)
+    # [{"relation": "Pool -> DPD", "match_rate": 0.98, "fan_out": 1.0, ...}] per sheet relation
+    join_stats = Column(JSONB, nullable=True)
+    # delta upload: {"staged", "inserted", "updated", "unchanged", "dropped", "delete_missing", "total"}
+    change_summary = Column(JSONB, nullable=True)
+    # pipelined load: {"elapsed_seconds", "chunk_rows", "stages": [{"stage": "read", "rows_per_second", ...}]}
+    pipeline_metrics = Column(JSONB, nullable=True)
+    error = Column(Text, nullable=True)
+    cancel_requested = Column(Boolean, default=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
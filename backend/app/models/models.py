@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Date, JSON, Text, Numeric
+from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Date, JSON, Text, Numeric, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import uuid
@@ -38,14 +38,29 @@ class Dataset(Base):
     #Added hvb @ 02/12/2025 for filetype of dataset
     file_type = Column(String(150), nullable=True)
 
+    # SHA-256 of uploaded file, key of parse cache
+    file_sha256 = Column(String(64), nullable=True, index=True)
+    # retained original upload and mapping profile it was loaded with, used by reprocess
+    artifact_path = Column(String(500), nullable=True)
+    mapping_profile_id = Column(Integer, nullable=True)
+    # incremented on every change of loan records, key of bucket summary cache
+    data_version = Column(Integer, nullable=False, default=1, server_default="1")
+
     user = relationship("User", back_populates="datasets")
     loan_records = relationship("LoanRecord", back_populates="dataset")
 
 class LoanRecord(Base):
     __tablename__ = "loan_records"
+    # list partitioned by dataset, one partition per dataset (services/dataset_partitions.py),
+    # partition key has to be part of primary key
+    # delta upload matches rows of a dataset by agreement number
+    __table_args__ = (
+        Index("ix_loan_records_dataset_agreement", "dataset_id", "agreement_no"),
+        {"postgresql_partition_by": "LIST (dataset_id)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    dataset_id = Column(UUID(as_uuid=True), ForeignKey("datasets.id", ondelete="CASCADE"), nullable=False)
+    dataset_id = Column(UUID(as_uuid=True), ForeignKey("datasets.id", ondelete="CASCADE"), primary_key=True)
     
     # Core fields - always present
     agreement_no = Column(String(255), nullable=False)
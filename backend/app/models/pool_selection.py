@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Date, Text, Numeric
+from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, ForeignKeyConstraint, Date, Text, Numeric
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import uuid
@@ -26,10 +26,19 @@ class PoolSelection(Base):
 
 class PoolSelectionRecord(Base):
     __tablename__ = "pool_selection_records"
+    # loan_records primary key is (dataset_id, id) since it is partitioned by dataset
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["dataset_id", "loan_record_id"],
+            ["loan_records.dataset_id", "loan_records.id"],
+            ondelete="CASCADE",
+        ),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     pool_selection_id = Column(Integer, ForeignKey("pool_selections.id", ondelete="CASCADE"), nullable=False)
-    loan_record_id = Column(UUID(as_uuid=True), ForeignKey("loan_records.id", ondelete="CASCADE"), nullable=False)
+    dataset_id = Column(UUID(as_uuid=True), nullable=False)
+    loan_record_id = Column(UUID(as_uuid=True), nullable=False)
     principal_os_amt = Column(Numeric, nullable=False)  # Store amount at time of selection
     
     # Relationships
@@ -21,6 +21,9 @@ class MappingProfile(Base):
     # Added hvb @ 02/12/2025 for filetype of dataset
     file_type = Column(String(150), nullable=True)
 
+    # "excel" or "csv", csv profiles read every sheet entry from the uploaded csv file
+    source_format = Column(String(10), nullable=False, default="excel", server_default="excel")
+
     sheets = relationship("MappingSheet", back_populates="profile", cascade="all,delete")
     column_mappings = relationship("SheetColumnMapping", back_populates="profile", cascade="all,delete")
     relations = relationship("SheetRelation", back_populates="profile", cascade="all,delete")
@@ -35,6 +38,9 @@ class MappingSheet(Base):
     skip_rows = Column(Integer, default=0)
     cols_to_read = Column(Text, nullable=True)
     key_columns = Column(JSON, nullable=True)
+    # csv dialect, used only when profile source_format is csv
+    delimiter = Column(Text, nullable=True)
+    encoding = Column(Text, nullable=True)
 
     profile = relationship("MappingProfile", back_populates="sheets")
     extra_columns = relationship("SheetExtraColumn", cascade="all,delete")
@@ -72,5 +78,7 @@ class SheetRelation(Base):
     left_col = Column(Text, nullable=False)
     right_col = Column(Text, nullable=False)
     how = Column(Text, default="left")
+    # duplicate keys on right sheet: error / first / last / allow
+    on_duplicate = Column(Text, nullable=False, default="error", server_default="error")
 
     profile = relationship("MappingProfile", back_populates="relations")
@@ -28,6 +28,7 @@ class BucketConfigItem(BaseModel):
     is_default: bool
     target_field: Optional[str]
     target_field_is_json: bool
+    metrics: Optional[List[Dict[str, Any]]] = None
     created_at: datetime
     updated_at: datetime
 
@@ -59,6 +60,7 @@ class BucketConfigCreate(BaseModel):
     bucket_config: List[Dict[str, Any]]
     is_default: bool = False
     target_field_is_json: bool = False # added hvb @ 05/12/2025
+    metrics: Optional[List[Dict[str, Any]]] = None
 
 # added hvb @ 02-12-2025
 class BucketConfigUpdate(BaseModel):
@@ -67,3 +69,4 @@ class BucketConfigUpdate(BaseModel):
     summary_type: Optional[str] = None # we will save file_type in this field
     bucket_config: Optional[List[Dict[str, Any]]] = None
     is_default: Optional[bool] = None
+    metrics: Optional[List[Dict[str, Any]]] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Union, Literal
 from datetime import datetime
 from uuid import UUID
 
@@ -125,6 +125,7 @@ class ExtraColumnSchema(BaseModel):
 class CleanupRuleSchema(BaseModel):
     col: int
     type: str  # 'dt', 'int', 'float', 'str', etc.
+    formats: Optional[List[str]] = None  # explicit date formats for 'dt', tried in order e.g. ["%d/%m/%Y"]
 
 class SheetConfigSchema(BaseModel):
     sheet_index: int
@@ -135,6 +136,8 @@ class SheetConfigSchema(BaseModel):
     key_columns: Optional[List[int]] = None
     extra: Optional[List[ExtraColumnSchema]] = None
     cleanup: Optional[List[CleanupRuleSchema]] = None
+    delimiter: Optional[str] = None  # csv source only, default ","
+    encoding: Optional[str] = None  # csv source only, default utf-8
 
 class ColumnMappingSchema(BaseModel):
     sheet_index: int
@@ -147,11 +150,14 @@ class RelationSchema(BaseModel):
     left_col: str
     right_col: str
     how: str = "left"
+    on_duplicate: Literal["error", "first", "last", "allow"] = "error"
 
 class MappingProfileCreateSchema(BaseModel):
     name: str
     description: Optional[str] = None
     is_global: bool = True
+    file_type: Optional[str] = None
+    source_format: Literal["excel", "csv"] = "excel"
     sheets: List[SheetConfigSchema]
     column_mappings: Optional[List[ColumnMappingSchema]] = []
     relations: Optional[List[RelationSchema]] = []
@@ -161,6 +167,7 @@ class MappingProfileUpdateSchema(BaseModel):
     description: Optional[str] = None
     is_global: Optional[bool] = None
     file_type: Optional[str] = None #Added hvb @ 03/12/205
+    source_format: Optional[Literal["excel", "csv"]] = None
     sheets: Optional[List[SheetConfigSchema]] = None
     column_mappings: Optional[List[ColumnMappingSchema]] = None
     relations: Optional[List[RelationSchema]] = None
@@ -172,6 +179,7 @@ class MappingProfileOutSchema(BaseModel):
     is_global: bool
     is_active: bool
     file_type: Optional[str] = None  # Added hvb @ 03/12/205
+    source_format: Optional[str] = "excel"
     created_at: Optional[datetime]
     updated_at: Optional[datetime]
 
@@ -184,5 +192,46 @@ class ColumnInfo(BaseModel):
     data_type: str
     is_json_col: bool # added hvb @ 05/12/2025
 
+class PreviewColumnSchema(BaseModel):
+    index: int
+    name: Optional[str] = None
+    inferred_type: Optional[str] = None   # dt / int / float / string, as cleanup rule types
+    samples: List[Any] = []
+
+class SheetPreviewSchema(BaseModel):
+    sheet_no: int
+    sheet_name: str
+    header_row: int   # index among non-blank rows, -1 for header-less
+    columns: List[PreviewColumnSchema]
+    rows: List[List[Any]]
+
+class FilePreviewSchema(BaseModel):
+    file_name: str
+    source_format: str
+    sheets: List[SheetPreviewSchema]
+
 class UpdateFileType(BaseModel):
-    file_type: str
\ No newline at end of file
+    file_type: str
+
+class IngestionJob(BaseModel):
+    id: UUID
+    dataset_id: UUID
+    job_type: str
+    status: str
+    stage: str
+    rows_processed: Optional[int] = 0
+    total_rows: Optional[int] = None
+    stage_timings: Optional[Dict[str, float]] = None
+    rejected_values: Optional[Dict[str, Dict[str, int]]] = None
+    peak_memory_bytes: Optional[int] = None
+    join_stats: Optional[List[Dict[str, Any]]] = None
+    change_summary: Optional[Dict[str, Any]] = None
+    pipeline_metrics: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_requested: Optional[bool] = False
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
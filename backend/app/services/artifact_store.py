@@ -0,0 +1,107 @@
+# services/artifact_store.py
+# Retained store of original uploads, so a dataset can be reprocessed from exactly the file it was
+# created from. Files are content addressed by SHA-256, same workbook uploaded twice is kept once.
+# An upload pins the artifact it retains until the dataset row referring to it is committed (or the
+# upload is abandoned), release skips pinned artifacts, so a file retained by an upload in flight is not
+# removed because no committed dataset refers to it yet. Retain & release of an artifact are serialised.
+# Pins are per process, ingestion jobs run in the process which retained their upload.
+
+import os
+import shutil
+import tempfile
+import threading
+from collections import Counter
+
+from sqlalchemy.orm import Session
+
+from app.models import models
+
+ARTIFACT_STORE_DIR = os.getenv("ARTIFACT_STORE_DIR") or os.path.join(os.getcwd(), "uploads", "artifacts")
+
+_LOCK_STRIPES = [threading.Lock() for _ in range(64)]
+_pins = Counter()   # artifact path -> uploads in flight, changed under the path's lock
+
+
+def _artifact_lock(artifact_path):
+    return _LOCK_STRIPES[hash(artifact_path) % len(_LOCK_STRIPES)]
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def retain_upload(spooled_path, file_hash, file_name) -> str:
+    """
+    Moves spooled upload into artifact store and pins it, caller drops the pin with unpin_artifact once
+    the dataset referring to it is committed, or with release_artifact(..., pinned=True) when abandoned.
+
+    Returns:
+        Path of retained artifact, spooled file is consumed.
+    """
+    extension = os.path.splitext(file_name or "")[1].lower()
+    artifact_dir = os.path.join(ARTIFACT_STORE_DIR, file_hash[:2])
+    artifact_path = os.path.join(artifact_dir, f"{file_hash}{extension}")
+    os.makedirs(artifact_dir, exist_ok=True)
+
+    with _artifact_lock(artifact_path):
+        if os.path.exists(artifact_path):
+            # same content already retained
+            os.remove(spooled_path)
+        else:
+            # spool dir can be on another file system, move falls back to copy there
+            fd, tmp_path = tempfile.mkstemp(dir=artifact_dir, prefix=f"{file_hash}.", suffix=".tmp")
+            os.close(fd)
+            try:
+                shutil.move(spooled_path, tmp_path)
+                os.replace(tmp_path, artifact_path)
+            except OSError:
+                _remove_quietly(tmp_path)
+                if not os.path.exists(artifact_path):
+                    raise
+                # retained meanwhile by another process, same content
+                _remove_quietly(spooled_path)
+        _pins[artifact_path] += 1
+
+    print(f"📦 Retained upload {file_name} as {artifact_path}")
+    return artifact_path
+
+
+def unpin_artifact(artifact_path):
+    """Drops pin taken by retain_upload, call once the dataset referring to artifact is committed."""
+    if not artifact_path:
+        return
+    with _artifact_lock(artifact_path):
+        _unpin(artifact_path)
+
+
+def _unpin(artifact_path):
+    _pins[artifact_path] -= 1
+    if _pins[artifact_path] <= 0:
+        del _pins[artifact_path]
+
+
+def release_artifact(db: Session, artifact_path, pinned=False):
+    """
+    Removes artifact once no dataset refers to it and no upload in flight holds it, call after dataset
+    is deleted, or with pinned=True for an artifact retained by the caller which is no longer needed.
+    """
+    if not artifact_path:
+        return
+    with _artifact_lock(artifact_path):
+        if pinned:
+            _unpin(artifact_path)
+        if _pins.get(artifact_path):
+            return
+        in_use = db.query(models.Dataset.id).filter(models.Dataset.artifact_path == artifact_path).first()
+        if in_use:
+            return
+        try:
+            os.remove(artifact_path)
+            print(f"🗑️ Removed artifact {artifact_path}")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️ Could not remove artifact {artifact_path}: {e}")
@@ -1,19 +1,33 @@
 # app/services/bucket_summary_service.py
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List
 
 from fastapi import HTTPException
 from pandas.core.computation.expressions import where
-from sqlalchemy import case, func, select, Float, and_, text, cast, Text
+from sqlalchemy import case, func, select, Float, and_, text, cast, Text, BigInteger, Integer, Numeric, bindparam, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql.elements import Grouping
 #from sqlalchemy.databases import postgresql
 from sqlalchemy.orm import Session
 from uuid import UUID
 
+from app.core.database import SessionLocal
 from app.curd.crud import dataset_crud
 from app.models import models
 from app.models.FilterCriteriaItem import FilterCriteriaItem
 from app.models.bucket_config import BucketConfig
 from app.models.models import LoanRecord, Dataset
 from app.schemas.schemas import ColumnInfo
+from app.services.summary_cache import summary_cache_key, get_cached_summaries, store_summaries, get_dataset_version
+from app.services.config_cache import config_version, snapshot_configs, get_cached as get_cached_config, store as store_config
+from app.services.dataset_cube import get_current_cube, cube_answers, cube_cells_subquery
+from app.services.summary_metrics import (
+    SUMMARY_SUMS, STANDARD_KEYS, config_metrics, metric_key, metric_inputs, input_column, metric_aggregate,
+    metric_additive,
+)
 
 PG_TYPE_MAP = {
     "string": "str",
@@ -25,8 +39,11 @@ PG_TYPE_MAP = {
 }
 
 #async def apply_filters(query, filter_criteria: Dict[str, Any] = None):
-async def apply_filters(query, filter_criteria: List[FilterCriteriaItem] = None):
-    """Replace with your existing filtering logic."""
+def apply_filters(query, filter_criteria: List[FilterCriteriaItem] = None, source=None):
+    """Replace with your existing filtering logic.
+    source: columns filters are applied on, default loan records (e.g. columns of dataset cube cells)."""
+    if source is None:
+        source = models.LoanRecord
     if filter_criteria:
         print(f"Applying filter criteria: {filter_criteria}")
         filtered_records_info = "filtered records"
@@ -42,9 +59,9 @@ async def apply_filters(query, filter_criteria: List[FilterCriteriaItem] = None)
                 is_direct_field = False
 
             if is_direct_field:
-                column = getattr(models.LoanRecord, field)
+                column = getattr(source, field)
             else:
-                column = models.LoanRecord.additional_fields[field].astext
+                column = source.additional_fields[field].astext
 
             # Apply filter based on operator
             try:
@@ -94,6 +111,113 @@ async def apply_filters(query, filter_criteria: List[FilterCriteriaItem] = None)
     return query
 
 
+# ==========================================================
+#  Range buckets
+# ==========================================================
+# Numeric rules are compiled to sorted boundaries b1 < ... < bk, which cut the number line into 2k+1
+# pieces: below b1, b1 itself, between b1 & b2, b2, ..., above bk. Every piece lies fully inside or
+# outside each rule, its label is the first rule containing it (as the CASE chain did, overlapping rules
+# keep their order) or "Others" for gaps. Row's piece is found by width_bucket over the boundaries.
+
+_INF = float("inf")
+
+
+def _is_number(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _rule_interval(min_v, max_v):
+    """(low, low_closed, high, high_closed) a rule matches, None when it matches no number."""
+    # NEGATIVE values bucket (max < 0) matches col < 0, whatever max is
+    if min_v is None and max_v is not None and max_v < 0:
+        return (-_INF, False, 0, False)
+    # open-ended upper range
+    if max_v is None and min_v is not None:
+        return (min_v, True, _INF, False)
+    # normal range, inclusive on both ends like BETWEEN (min == max is a single value)
+    if min_v is not None and max_v is not None:
+        return (min_v, True, max_v, True)
+    return None
+
+
+def _piece_in(interval, low, high):
+    # piece is the single point low when low == high, else open range (low, high)
+    i_low, low_closed, i_high, high_closed = interval
+    if low == high:
+        return (i_low < low or (low_closed and i_low == low)) and (low < i_high or (high_closed and low == i_high))
+    return i_low <= low and high <= i_high
+
+
+def compile_range_rules(rules):
+    """
+    Compiles numeric bucket rules to (boundaries, label of each piece, label of NULL).
+
+    Returns:
+        None when a rule has non numeric bounds or no rule has a range, CASE chain is used then.
+    """
+    null_label = None
+    intervals = []
+    for r in rules:
+        min_v, max_v = r.get("min"), r.get("max")
+        if any(v is not None and not _is_number(v) for v in (min_v, max_v)):
+            return None
+        if min_v is None and max_v is None:
+            # BLANK (NULL) values bucket, first one wins
+            if null_label is None:
+                null_label = r["label"]
+            continue
+        interval = _rule_interval(min_v, max_v)
+        if interval is not None:
+            intervals.append((interval, r["label"]))
+
+    bounds = sorted({v for (low, _, high, _), _ in intervals for v in (low, high) if abs(v) != _INF})
+    if not bounds:
+        return None
+
+    edges = [-_INF] + bounds + [_INF]
+    pieces = []
+    for i, bound in enumerate(bounds):
+        pieces += [(edges[i], bound), (bound, bound)]
+    pieces.append((bounds[-1], _INF))
+
+    labels = [
+        next((label for interval, label in intervals if _piece_in(interval, low, high)), "Others")
+        for low, high in pieces
+    ]
+    return bounds, labels, null_label
+
+
+def _bounds_array(values, bound_type):
+    # parenthesised when indexed, (CAST(... AS type[]))[i]
+    return Grouping(cast(bindparam(None, values, type_=ARRAY(bound_type)), ARRAY(bound_type)))
+
+
+def range_bucket_expr(col, compiled):
+    """
+    Label of col's piece. Piece number is count of boundaries <= col plus count of boundaries < col,
+    both counted by width_bucket in sorted boundaries.
+    """
+    bounds, labels, null_label = compiled
+    k = len(bounds)
+
+    if isinstance(col.type, Integer) and all(float(b).is_integer() for b in bounds):
+        # integers: b < col is b + 1 <= col
+        bounds = [int(b) for b in bounds]
+        below_or_at = func.width_bucket(col, _bounds_array(bounds, Integer))
+        below = func.width_bucket(col, _bounds_array([b + 1 for b in bounds], Integer))
+    else:
+        # float columns (JSON values cast to Float) compare as double, others exactly as numeric
+        bound_type = Float if isinstance(col.type, Float) else Numeric
+        value = col if isinstance(col.type, (Float, Numeric)) else cast(col, Numeric)
+        below_or_at = func.width_bucket(value, _bounds_array(bounds, bound_type))
+        # b < col is -col < -b, k minus count of -b <= -col
+        below = k - func.width_bucket(-value, _bounds_array([-b for b in reversed(bounds)], bound_type))
+
+    labels_arr = _bounds_array(labels, Text)
+    # NULL col gives NULL piece
+    return func.coalesce(labels_arr[below_or_at + below + 1], null_label if null_label is not None else "Others")
+
+
 def build_bucket_case(col, rules):
     """Supports both numeric and string bucket configs."""
 
@@ -133,6 +257,11 @@ def build_bucket_case(col, rules):
         #
         # return case(*whens, else_="Others")
 
+        # one lookup in sorted boundaries per row, however many rules
+        compiled = compile_range_rules(rules)
+        if compiled is not None:
+            return range_bucket_expr(col, compiled)
+
         whens = []
 
         for r in rules:
@@ -170,13 +299,24 @@ def build_bucket_case(col, rules):
         return case(*whens, else_="Others")
 
 
-# mod hvb @ 08/12/2025 for merging filter-criteria
-# async def get_bucket_summary(db, config, filters: Dict[str, Any],dataset_uuid:UUID,create_empty_buckets: bool):
-async def get_bucket_summary(db, config, filters: List[FilterCriteriaItem], dataset_uuid: UUID, create_empty_buckets: bool):
-    """Generate bucket summary for one config."""
+# ==========================================================
+#  Bucket summaries
+# ==========================================================
+# All requested configs are summarised by one query: every config's bucket expression is a column of
+# the filtered rows and GROUPING SETS groups them by each column separately, so the dataset is scanned
+# once however many configs a dashboard asks for.
 
-    print("\n\n====** STARTING CONFIG-ED SUMMARY GENERATION ====\n")
+# cube & records queries of a request run at once when a spare pooled connection is free, at most
+# SUMMARY_FANOUT_CONNECTIONS of them across the process (connection budget in core/db_threadpool.py),
+# 0 runs them one by one on the request's session
+SUMMARY_FANOUT_CONNECTIONS = int(os.getenv("SUMMARY_FANOUT_CONNECTIONS", "2"))
+
+_fanout_slots = threading.BoundedSemaphore(max(SUMMARY_FANOUT_CONNECTIONS, 1))
+_fanout_executor = ThreadPoolExecutor(max_workers=max(SUMMARY_FANOUT_CONNECTIONS, 1), thread_name_prefix="bucket-summary")
 
+
+def filtered_records_cte(db, filters: List[FilterCriteriaItem], dataset_uuid: UUID):
+    """Loan records of dataset with filters applied, as CTE "filtered"."""
     # Check if dataset exists
     dataset = dataset_crud.get_dataset(db, dataset_uuid)
     if not dataset:
@@ -190,92 +330,266 @@ async def get_bucket_summary(db, config, filters: List[FilterCriteriaItem], data
         models.LoanRecord.dataset_id == dataset_uuid
     )
 
-    #base_q = db.query(Loan)
+    base_q = apply_filters(base_q, filters)
+    return base_q.cte("filtered")
+
+
+def filtered_cube_cte(db, filters: List[FilterCriteriaItem], cube):
+    """Cells of dataset cube with filters applied, as CTE "filtered", rows carry row_count."""
+    cells = cube_cells_subquery(cube)
+    cells_q = apply_filters(db.query(cells), filters, source=cells.c)
+    return cells_q.cte("filtered")
 
-    base_q = await apply_filters(base_q, filters)
-    filtered_cte = base_q.cte("filtered")
 
+def bucket_column(filtered_cte, config):
+    """Column of filtered CTE a config buckets on, JSON fields are cast as per bucket type."""
     # choose JSON or normal column
     if config.target_field_is_json:
-        # col = func.cast(filtered_cte.c.additional_fields[config.target_field].astext, func.text)
         col_raw = filtered_cte.c.additional_fields[config.target_field].astext
 
         # detect bucket type
         string_mode = "values" in config.bucket_config[0]
         if not string_mode:
-            col = cast(col_raw, Float)   # numeric grouping
-        else:
-            col = cast(col_raw, Text)  # string grouping
-    else:
-        # mod hvb @ 28/11/2025 as its not printing records with 0 rows
-        col = getattr(filtered_cte.c, config.target_field)
-        # error, not generating desire output.
-        # col_raw = getattr(filtered_cte.c, config.target_field)
-        #
-        # col = case(
-        #     (col_raw.is_(None), "0"),  # string 0
-        #     else_=col_raw  # string column
-        # ).cast(Float)
+            return cast(col_raw, Float)   # numeric grouping
+        return cast(col_raw, Text)  # string grouping
 
-    case_expr = build_bucket_case(col, config.bucket_config).label("bucket")
+    # mod hvb @ 28/11/2025 as its not printing records with 0 rows
+    return getattr(filtered_cte.c, config.target_field)
 
-    stmt = (
-        select(
-            case_expr,
-            func.count().label("count"),
-            #func.sum(filtered_cte.c.amount).label("sum_amount"),
 
-            func.sum(filtered_cte.c.principal_os_amt).label("POS"),
-            func.sum(filtered_cte.c.disbursement_amount).label("disbursement_amount"),
+def _bucket_key(config):
+    # configs with same key compile to the same bucket expression
+    return (
+        config.target_field,
+        bool(config.target_field_is_json),
+        json.dumps(config.bucket_config, sort_keys=True, default=str),
+    )
+
+
+def _plan_summary_groups(answered):
+    """
+    Splits configs into independent queries: configs the cube answers in one, the others in one scan of
+    loan records, GROUPING SETS summarises all of them in that scan.
+
+    Returns:
+        List of (from_cube, [config index]), cube group first
+    """
+    groups = []
+    cube_idx = [i for i, a in enumerate(answered) if a]
+    records_idx = [i for i, a in enumerate(answered) if not a]
+    if cube_idx:
+        groups.append((True, cube_idx))
+    if records_idx:
+        groups.append((False, records_idx))
+    return groups
+
+
+def _summarise_on_own_session(configs, filters, dataset_uuid, cube, create_empty_buckets):
+    # fanned out query takes its own pooled connection, Session is not shared across threads
+    db = SessionLocal()
+    try:
+        return summarise_configs(db, configs, filters, dataset_uuid, cube, create_empty_buckets)
+    finally:
+        db.close()
+
+
+def get_bucket_summaries(db, configs, filters: List[FilterCriteriaItem], dataset_uuid: UUID, create_empty_buckets: bool):
+    """
+    Generate bucket summaries for many configs.
+    Configs on fields of dataset's cube are summarised from the cube, the others from one scan of filtered
+    loan records. Cube query runs on a spare pooled connection meanwhile, when one is free.
+
+    Returns:
+        List of summaries in order of configs, same as get_bucket_summary returns for each config.
+    """
+    print("\n\n====** STARTING CONFIG-ED SUMMARY GENERATION ====\n")
+    if not configs:
+        return []
+
+    cube = get_current_cube(db, dataset_uuid)
+    answered = cube_answers(cube, configs, filters) if cube is not None else [False] * len(configs)
+    # cube only holds the standard sums
+    answered = [a and not config_metrics(c) for a, c in zip(answered, configs)]
+    groups = _plan_summary_groups(answered)
 
-            func.sum(filtered_cte.c.post_npa_collection).label("Post_NPA_Coll"),
-            func.sum(filtered_cte.c.post_woff_collection).label("Post_W_Off_Coll"),
+    summaries = [None] * len(configs)
 
-            func.sum(filtered_cte.c.m6_collection).label("M6_Collection"),
-            func.sum(filtered_cte.c.m12_collection).label("M12_Collection"),
-            func.sum(filtered_cte.c.total_collection).label("total_collection")
-            
+    def collect(idx, group):
+        for i, summary in zip(idx, group):
+            summaries[i] = summary
+
+    if len(groups) == 2 and SUMMARY_FANOUT_CONNECTIONS > 0 and _fanout_slots.acquire(blocking=False):
+        (_, cube_idx), (_, records_idx) = groups
+        print(f"🔀 Summarising {len(cube_idx)} configs from cube alongside {len(records_idx)} from loan records")
+        try:
+            cube_future = _fanout_executor.submit(
+                _summarise_on_own_session, [configs[i] for i in cube_idx], filters, dataset_uuid, cube, create_empty_buckets
+            )
+        except BaseException:
+            _fanout_slots.release()
+            raise
+        # slot is free again once the cube query is done, also when the records query fails first
+        cube_future.add_done_callback(lambda _: _fanout_slots.release())
+        collect(records_idx, summarise_configs(
+            db, [configs[i] for i in records_idx], filters, dataset_uuid, None, create_empty_buckets
+        ))
+        collect(cube_idx, cube_future.result())
+        return summaries
+
+    for from_cube, idx in groups:
+        collect(idx, summarise_configs(
+            db, [configs[i] for i in idx], filters, dataset_uuid, cube if from_cube else None, create_empty_buckets
+        ))
+    return summaries
+
+
+def summarise_configs(db, configs, filters: List[FilterCriteriaItem], dataset_uuid: UUID, cube, create_empty_buckets: bool):
+    """
+    Bucket summaries of configs from a single scan, of cube cells when cube is given, of filtered
+    loan records otherwise.
+    """
+    from_cube = cube is not None
+    if from_cube:
+        print(f"🧊 Summarising {len(configs)} configs from cube of dataset {dataset_uuid} ({cube.cell_count} cells)")
+        filtered_cte = filtered_cube_cte(db, filters, cube)
+    else:
+        filtered_cte = filtered_records_cte(db, filters, dataset_uuid)
+
+    # one bucket column per distinct expression, identical configs share a grouping set
+    bucket_exprs = []
+    expr_idx = {}
+    config_expr_idx = []
+    for config in configs:
+        key = _bucket_key(config)
+        if key not in expr_idx:
+            expr_idx[key] = len(bucket_exprs)
+            bucket_exprs.append(build_bucket_case(bucket_column(filtered_cte, config), config.bucket_config))
+        config_expr_idx.append(expr_idx[key])
+
+    # one column per distinct metric of configs, reading one input column per distinct field
+    metrics = []
+    metric_idx = {}
+    config_metrics_idx = []
+    inputs = {}
+    for config in configs:
+        idx = []
+        for metric in config_metrics(config):
+            key = metric_key(metric)
+            if key not in metric_idx:
+                metric_idx[key] = len(metrics)
+                metrics.append(metric)
+                for field in metric_inputs(metric):
+                    inputs.setdefault(field, f"input_{len(inputs)}")
+            idx.append((metric["name"], metric_idx[key]))
+        config_metrics_idx.append(idx)
+
+    bucketed = (
+        select(
+            *[expr.label(f"bucket_{i}") for i, expr in enumerate(bucket_exprs)],
+            *[getattr(filtered_cte.c, column) for _, column in SUMMARY_SUMS],
+            *([filtered_cte.c.row_count] if from_cube else []),
+            *[input_column(filtered_cte.c, field, is_json).label(label) for (field, is_json), label in inputs.items()],
         )
         .select_from(filtered_cte)
-        .group_by(case_expr)
-        .order_by(case_expr)
+        .cte("bucketed")
     )
+    # a cube cell stands for row_count records
+    count_expr = cast(func.sum(bucketed.c.row_count), BigInteger) if from_cube else func.count()
+
+    buckets = [bucketed.c[f"bucket_{i}"] for i in range(len(bucket_exprs))]
+    # grouping() is 0 for the column a row is grouped by, tells a NULL bucket from other sets' rows
+    groupings = [func.grouping(b).label(f"grouping_{i}") for i, b in enumerate(buckets)]
+    metric_exprs = [
+        metric_aggregate(metric, [bucketed.c[inputs[field]] for field in metric_inputs(metric)]).label(f"metric_{j}")
+        for j, metric in enumerate(metrics)
+    ]
+    # totals of non additive metrics need all records, empty grouping set gives them
+    grand_total = any(not metric_additive(m) for m in metrics)
 
-    #Uncomment to print statement
-    # print(stmt.compile(
-    #     dialect=postgresql.dialect(),
-    #     compile_kwargs={"literal_binds": True}
-    # ))
-
-    rows = db.execute(stmt).fetchall()
-    # Map SQL rows by label
-    rows_by_label = {r.bucket: r for r in rows}
-    #found_labels = set(rows_by_label.keys())
-
-    # mod hvb for missing buckets with 0 rows
-    # initialize totals
-    totals = {
-        "count": 0,
-        "POS": 0,
-        "disbursement_amount": 0,
-        "Post_NPA_Coll": 0,
-        "Post_W_Off_Coll": 0,
-        "M6_Collection": 0,
-        "M12_Collection": 0,
-        "total_collection": 0,
-    }
+    stmt = (
+        select(
+            *buckets,
+            *groupings,
+            count_expr.label("count"),
+            *[func.sum(getattr(bucketed.c, column)).label(label) for label, column in SUMMARY_SUMS],
+            *metric_exprs,
+        )
+        .select_from(bucketed)
+        .group_by(func.grouping_sets(*buckets, *([tuple_()] if grand_total else [])))
+        # rows of one set together, ordered by bucket as before
+        .order_by(*[c for pair in zip(groupings, buckets) for c in pair])
+    )
+
+    rows_by_expr = [[] for _ in bucket_exprs]
+    total_row = None
+    for r in db.execute(stmt):
+        m = r._mapping
+        i = next((i for i in range(len(bucket_exprs)) if m[f"grouping_{i}"] == 0), None)
+        values = {key: m[key] for key in STANDARD_KEYS}
+        values.update({f"metric_{j}": m[f"metric_{j}"] for j in range(len(metrics))})
+        if i is None:
+            total_row = values
+        else:
+            rows_by_expr[i].append((m[f"bucket_{i}"], values))
+
+    summaries = []
+    for config, i, idx in zip(configs, config_expr_idx, config_metrics_idx):
+        # rows of config keyed by its own metric names
+        config_metric_list = [(name, metric_additive(metrics[j])) for name, j in idx]
+        rows = [
+            (bucket, {**{k: v[k] for k in STANDARD_KEYS}, **{name: v[f"metric_{j}"] for name, j in idx}})
+            for bucket, v in rows_by_expr[i]
+        ]
+        totals = {name: total_row[f"metric_{j}"] for name, j in idx} if total_row is not None else {}
+        summaries.append(build_summary(config, rows, create_empty_buckets, config_metric_list, totals))
+    return summaries
 
-    # accumulate
-    for r in rows:
 
-        totals["count"] += r.count or 0
-        totals["POS"] += r.POS or 0
-        totals["disbursement_amount"] += r.disbursement_amount or 0
-        totals["Post_NPA_Coll"] += r.Post_NPA_Coll or 0
-        totals["Post_W_Off_Coll"] += r.Post_W_Off_Coll or 0
-        totals["M6_Collection"] += r.M6_Collection or 0
-        totals["M12_Collection"] += r.M12_Collection or 0
-        totals["total_collection"] += r.total_collection or 0
+# mod hvb @ 08/12/2025 for merging filter-criteria
+# async def get_bucket_summary(db, config, filters: Dict[str, Any],dataset_uuid:UUID,create_empty_buckets: bool):
+def get_bucket_summary(db, config, filters: List[FilterCriteriaItem], dataset_uuid: UUID, create_empty_buckets: bool):
+    """Generate bucket summary for one config."""
+    return get_bucket_summaries(db, [config], filters, dataset_uuid, create_empty_buckets)[0]
+
+
+def _bucket_row(label, values, total_pos):
+    """Row of a bucket with ratios derived from its values, POS_Per is its share of total POS."""
+    pos_val = values["POS"]
+    disb = values["disbursement_amount"]
+    pos_percent = (pos_val / total_pos * 100) if total_pos else 0
+    pos_rundown = (
+        round((1 - (pos_val / disb)) * 100, 2)
+        if disb > 0 else 0
+    )
+    row = {"label": label, "count": values["count"], "POS": pos_val, "disbursement_amount": disb}
+    row["POS_Per"] = round(pos_percent, 2)
+    row["POS_Rundown_Per"] = pos_rundown
+    row.update({k: v for k, v in values.items() if k not in row})
+    return row
+
+
+def build_summary(config, rows, create_empty_buckets: bool, metrics=(), metric_totals=None):
+    """
+    Summary of one config from its grouped rows, ordered by bucket.
+
+    Args:
+        rows: List of (bucket, {metric: value}), standard metrics and config's own ones.
+        metrics: (name, additive) of config's own metrics.
+        metric_totals: {name: value over all records} of non additive metrics.
+    """
+    additive = STANDARD_KEYS + [name for name, is_additive in metrics if is_additive]
+
+    def row_values(values):
+        # empty sums read as 0, averages & percentiles of no records stay None
+        return {**values, **{k: values[k] or 0 for k in additive}}
+
+    rows = [(bucket, row_values(values)) for bucket, values in rows]
+    rows_by_label = dict(rows)
+    totals = {k: 0 for k in additive}
+    for _, values in rows:
+        for k in additive:
+            totals[k] += values[k]
+    total_pos = totals["POS"]
 
     summary_rows = []
 
@@ -286,108 +600,35 @@ async def get_bucket_summary(db, config, filters: List[FilterCriteriaItem], data
     if shall_create_empty_buckets:
         # 🚀 Build rows in EXACT CONFIG ORDER (fixes sequencing)
         config_label_set = set()
-
         for rule in config.bucket_config:
             label = rule["label"]
-            r = rows_by_label.get(label)
-
-            config_label_set.add(label)  # <-- TRACK configured labels
-
-            if r is None:
+            config_label_set.add(label)
+            values = rows_by_label.get(label)
+            if values is None:
                 # bucket missing → inject zero bucket
-                summary_rows.append({
-                    "label": label,
-                    "count": 0,
-                    "POS": 0,
-                    "disbursement_amount": 0,
-                    "POS_Per": 0,
-                    "POS_Rundown_Per": 0,
-                    "Post_NPA_Coll": 0,
-                    "Post_W_Off_Coll": 0,
-                    "M6_Collection": 0,
-                    "M12_Collection": 0,
-                    "total_collection": 0,
-                })
-            else:
-                pos_val = r.POS or 0
-                pos_percent = (pos_val / totals["POS"] * 100) if totals["POS"] else 0
-                
-                disb = r.disbursement_amount or 0
-                pos_val = r.POS or 0
-
-                pos_rundown = (
-                    round((1 - (pos_val / disb)) * 100, 2)
-                    if disb > 0 else 0
-                )
-
-                summary_rows.append({
-                    "label": label,
-                    "count": r.count,
-                    "POS": pos_val,
-                    "disbursement_amount": disb,
-                    "POS_Per": round(pos_percent, 2),
-                    "POS_Rundown_Per": pos_rundown,                                    
-                    "Post_NPA_Coll": r.Post_NPA_Coll,
-                    "Post_W_Off_Coll": r.Post_W_Off_Coll,
-                    "M6_Collection": r.M6_Collection,
-                    "M12_Collection": r.M12_Collection,
-                    "total_collection": r.total_collection,
-                })
-        # check missed bucket in rows
-        # and add it
-        for r in rows:
-            if r.bucket not in config_label_set:
-                pos_val = r.POS or 0
-                pos_percent = (pos_val / totals["POS"] * 100) if totals["POS"] else 0
-
-                
-                summary_rows.append({
-                    "label": r.bucket,
-                    "count": r.count or 0,
-                    "POS": pos_val,
-                    "POS_Per": round(pos_percent, 2),
-                    "Post_NPA_Coll": r.Post_NPA_Coll or 0,
-                    "Post_W_Off_Coll": r.Post_W_Off_Coll or 0,
-                    "M6_Collection": r.M6_Collection or 0,
-                    "M12_Collection": r.M12_Collection or 0,
-                    "total_collection": r.total_collection or 0,
-                })
+                values = {**{k: 0 for k in additive}, **{name: None for name, _ in metrics}}
+            summary_rows.append(_bucket_row(label, values, total_pos))
+        # buckets not in config (e.g. Others) after configured ones
+        for bucket, values in rows:
+            if bucket not in config_label_set:
+                summary_rows.append(_bucket_row(bucket, values, total_pos))
     else:
-        for r in rows:
-            pos_percent = (
-                (r.POS / totals["POS"] * 100)
-                if totals["POS"] else 0
-            )
-
-            summary_rows.append(
-                {
-                    "label": r.bucket,
-                    "count": r.count,
-                    "POS": r.POS,
-                    "POS_Per": round(pos_percent, 2),
-                    "Post_NPA_Coll": r.Post_NPA_Coll,
-                    "Post_W_Off_Coll": r.Post_W_Off_Coll,
-                    "M6_Collection": r.M6_Collection,
-                    "M12_Collection": r.M12_Collection,
-                    "total_collection": r.total_collection,
-                }
-            )
+        for bucket, values in rows:
+            summary_rows.append(_bucket_row(bucket, values, total_pos))
 
     # ✅ Append total row ONLY ONCE
     total_disb = totals["disbursement_amount"]
-    total_pos = totals["POS"]
-
     total_pos_rundown = (
         round((1 - (total_pos / total_disb)) * 100, 2)
         if total_disb > 0 else 0
     )
-
     summary_rows.append(
         {
             "label": "Total",
-            **totals,
+            **{k: totals[k] for k in STANDARD_KEYS},
             "POS_Per": 100.0,
             "POS_Rundown_Per": total_pos_rundown,
+            **{name: totals[name] if is_additive else (metric_totals or {}).get(name) for name, is_additive in metrics},
         }
     )
 
@@ -480,13 +721,27 @@ def get_configs(db,user_id,dataset_id:str) -> List[BucketConfig]:
        Returns a list of *effective* bucket configs for the dataset,
        respecting override rules:
            dataset+user → dataset+default → global default
+       Configs are detached snapshots, resolved ones are cached until bucket configs change.
        """
+    version = config_version()
 
     # Step 0 - check for dataset file-type and map that with summary-type
-    file_type = db.query(Dataset).where(Dataset.id == dataset_id).first().file_type
-    if not file_type:
-        file_type = "--BLANK--"
+    file_type = get_cached_config(version, ("file_type", str(dataset_id)))
+    if file_type is None:
+        file_type = db.query(Dataset).where(Dataset.id == dataset_id).first().file_type
+        if not file_type:
+            file_type = "--BLANK--"
+        store_config(version, ("file_type", str(dataset_id)), file_type)
+
+    key = ("configs", str(user_id), str(dataset_id), file_type)
+    effective_configs = get_cached_config(version, key)
+    if effective_configs is None:
+        effective_configs = snapshot_configs(_resolve_configs(db, user_id, dataset_id, file_type))
+        store_config(version, key, effective_configs)
+    return effective_configs
+
 
+def _resolve_configs(db, user_id, dataset_id, file_type) -> List[BucketConfig]:
     # Step 1 — get all configs for this dataset
     dataset_configs = (
         db.query(BucketConfig)
@@ -556,8 +811,45 @@ def get_configs(db,user_id,dataset_id:str) -> List[BucketConfig]:
     return effective_configs
 
 
+def _configs_of_types(db, user_id, dataset_id, config_types) -> List[BucketConfig]:
+    # per summary type: dataset + user specific configs, else default configs of the type
+    configs = []
+    seen_ids = set()
+
+    for st in config_types:
+        # 1) try dataset + user specific configs for this summary_type
+        dataset_configs = (
+            db.query(BucketConfig)
+            .filter(BucketConfig.summary_type == st)
+            .filter(BucketConfig.dataset_id == dataset_id)
+            .filter(BucketConfig.user_id == user_id)
+            .all()
+        )
+
+        if dataset_configs:
+            for c in dataset_configs:
+                if c.id not in seen_ids:
+                    configs.append(c)
+                    seen_ids.add(c.id)
+            continue  # do NOT fallback to default for this summary_type
+
+        # 2) no dataset-specific -> fetch default configs for this summary_type
+        default_configs = (
+            db.query(BucketConfig)
+            .filter(BucketConfig.summary_type == st)
+            .filter(BucketConfig.is_default == True)
+            .all()
+        )
 
-async def get_multiple_bucket_summaries(db, config_ids, config_types, filters, user_id,dataset_id:str,show_empty_buckets:bool):
+        for c in default_configs:
+            if c.id not in seen_ids:
+                configs.append(c)
+                seen_ids.add(c.id)
+    return configs
+
+
+# blocking, async endpoints run it through run_in_db_pool
+def get_multiple_bucket_summaries(db, config_ids, config_types, filters, user_id,dataset_id:str,show_empty_buckets:bool):
     # priority: config_ids > config_types
     try:
         print("\n\n====** STARTING DATASET SUMMARY GENERATION ====\n")
@@ -586,45 +878,29 @@ async def get_multiple_bucket_summaries(db, config_ids, config_types, filters, u
         #         .all()
         #     )
         elif config_types:
-            configs = []
-            seen_ids = set()
-
-            for st in config_types:
-                # 1) try dataset + user specific configs for this summary_type
-                dataset_configs = (
-                    db.query(BucketConfig)
-                    .filter(BucketConfig.summary_type == st)
-                    .filter(BucketConfig.dataset_id == dataset_id)
-                    .filter(BucketConfig.user_id == user_id)
-                    .all()
-                )
-
-                if dataset_configs:
-                    for c in dataset_configs:
-                        if c.id not in seen_ids:
-                            configs.append(c)
-                            seen_ids.add(c.id)
-                    continue  # do NOT fallback to default for this summary_type
-
-                # 2) no dataset-specific -> fetch default configs for this summary_type
-                default_configs = (
-                    db.query(BucketConfig)
-                    .filter(BucketConfig.summary_type == st)
-                    .filter(BucketConfig.is_default == True)
-                    .all()
-                )
-
-                for c in default_configs:
-                    if c.id not in seen_ids:
-                        configs.append(c)
-                        seen_ids.add(c.id)
+            version = config_version()
+            key = ("types", str(user_id), str(dataset_id), tuple(config_types))
+            configs = get_cached_config(version, key)
+            if configs is None:
+                configs = snapshot_configs(_configs_of_types(db, user_id, dataset_id, config_types))
+                store_config(version, key, configs)
         else:
             raise HTTPException(status_code=400, detail="Provide config_ids or config_types")
 
-        summaries = []
-        for config in configs:
-            summaries.append(await get_bucket_summary(db, config, filters,dataset_uuid,show_empty_buckets))
-
+        # same dataset version, configs & filters give same summaries
+        data_version = get_dataset_version(db, dataset_uuid)
+        cache_key = None
+        if data_version is not None:
+            cache_key = summary_cache_key(dataset_uuid, data_version, configs, filters, show_empty_buckets)
+            cached = get_cached_summaries(cache_key)
+            if cached is not None:
+                print(f"⚡ Bucket summaries served from cache for dataset {dataset_uuid}")
+                return cached
+
+        # all configs from one scan of the dataset
+        summaries = get_bucket_summaries(db, configs, filters, dataset_uuid, show_empty_buckets)
+        if cache_key is not None:
+            store_summaries(cache_key, summaries, dataset_uuid, configs)
         return summaries
     except Exception as e:
         print(f"Error generating summary: {e}")
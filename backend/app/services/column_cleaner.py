@@ -0,0 +1,161 @@
+# services/column_cleaner.py
+# Vectorised clean-up of sheet columns as per SheetCleanup rules.
+# Every coercion runs column-wise (to_numeric / to_datetime with errors="coerce"), values which
+# can not be converted are set to null and counted as rejected.
+
+import numpy as np
+import pandas as pd
+
+# Excel stores dates as days since 1899-12-30 (1900 leap year bug included)
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+EXCEL_SERIAL_MIN = 1          # 1899-12-31
+EXCEL_SERIAL_MAX = 2958465    # 9999-12-31
+
+INT64_MIN = np.iinfo(np.int64).min
+INT64_MAX = np.iinfo(np.int64).max
+
+# strings int() accepts: optional sign, digits with single underscores between, surrounding spaces
+INT_STRING_PATTERN = r"\s*[+-]?\d+(?:_\d+)*\s*"
+
+
+def _is_number(v):
+    return isinstance(v, (int, float, np.number)) and not isinstance(v, (bool, np.bool_))
+
+
+def coerce_dates(series: pd.Series, formats=None) -> pd.Series:
+    """
+    Converts a column to datetime64, invalid values (like "Pending", "NA") become NaT.
+
+    Order of resolution:
+        1. values already datetime
+        2. numbers (not numeric strings) in Excel serial date range
+        3. strings matching explicit formats, in given order
+        4. ISO-8601 strings
+        5. any other string pandas can parse (per value, only for what is left)
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+
+    result = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    pending = series.notna()
+    if not pending.any():
+        return result
+
+    # 1. datetime / Timestamp objects
+    is_datetime = series.map(lambda v: isinstance(v, (pd.Timestamp, np.datetime64)) or hasattr(v, "isoformat"), na_action="ignore")
+    is_datetime = is_datetime.fillna(False).astype(bool) & pending
+    if is_datetime.any():
+        result.loc[is_datetime] = pd.to_datetime(series[is_datetime], errors="coerce")
+        pending &= ~is_datetime
+
+    # 2. Excel serial numbers, only cells holding a number, digit strings like "20240131" are parsed as text
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        is_number = pending
+    else:
+        is_number = series.map(_is_number, na_action="ignore").fillna(False).astype(bool) & pending
+    numeric = pd.to_numeric(series.where(is_number), errors="coerce")
+    is_serial = is_number & numeric.between(EXCEL_SERIAL_MIN, EXCEL_SERIAL_MAX)
+    if is_serial.any():
+        result.loc[is_serial] = EXCEL_EPOCH + pd.to_timedelta(numeric[is_serial], unit="D")
+    # numbers outside serial range are not dates
+    pending &= ~is_number
+
+    # 3-5. strings
+    if pending.any():
+        text = series[pending].astype(str).str.strip()
+        for fmt in list(formats or []) + ["ISO8601", "mixed"]:
+            if text.empty:
+                break
+            parsed = pd.to_datetime(text, format=fmt, errors="coerce")
+            matched = parsed.notna()
+            result.loc[matched[matched].index] = parsed[matched]
+            text = text[~matched]
+
+    return result
+
+
+def coerce_int(series: pd.Series) -> pd.Series:
+    """
+    Converts a column to nullable Int64 as int() converts each value: numbers are truncated, strings
+    must be integer literals ("12.5" or "1e3" are invalid), invalid values become NA.
+    """
+    if not pd.api.types.is_numeric_dtype(series):
+        is_str = series.map(lambda v: isinstance(v, str)).astype(bool)
+        if is_str.any():
+            text = series[is_str].astype(str)
+            literal = text.str.fullmatch(INT_STRING_PATTERN)
+            series = series.astype(object).copy()
+            series[is_str] = text.str.strip().str.replace("_", "", regex=False).where(literal)
+    numeric = pd.to_numeric(series, errors="coerce")
+    if pd.api.types.is_bool_dtype(numeric):
+        numeric = numeric.astype("int64")
+    numeric = numeric.astype("float64")
+    numeric = numeric.where(numeric.between(INT64_MIN, INT64_MAX))
+    return np.trunc(numeric).astype("Int64")
+
+
+def coerce_float(series: pd.Series) -> pd.Series:
+    """
+    Converts a column to float64, invalid / non-numeric values become NaN.
+    """
+    return pd.to_numeric(series, errors="coerce").astype("float64")
+
+
+def coerce_string(series: pd.Series) -> pd.Series:
+    """
+    Converts non-null values to str, nulls stay None for PostgreSQL insertion.
+    """
+    return series.astype(str).where(series.notna(), None).astype(object)
+
+
+def coerce_column(series: pd.Series, ctype: str, formats=None) -> pd.Series:
+    # rule types as saved in SheetCleanup.rules, "str" is accepted as alias of "string"
+    if ctype == "dt":
+        return coerce_dates(series, formats)
+    elif ctype == "int":
+        return coerce_int(series)
+    elif ctype == "float":
+        return coerce_float(series)
+    elif ctype in ("string", "str"):
+        return coerce_string(series)
+    return series
+
+
+def clean_sheet_columns(df: pd.DataFrame, clean_columns, cols_to_read=None, clean_formats=None) -> dict:
+    """
+    Applies SheetCleanup rules to DataFrame in-place.
+
+    Args:
+        df: Sheet DataFrame.
+        clean_columns: Rules as in mapping config, e.g. [{7: "dt"}, {8: "int"}], index is excel column index.
+        cols_to_read: Excel column indices read for sheet, used to locate column in df. None when all columns read.
+        clean_formats: Optional explicit date formats per excel column index, e.g. {7: ["%d/%m/%Y"]}.
+
+    Returns:
+        Dict {column_name: rejected_count}, rejected values were non-null before cleaning and null after.
+    """
+    rejected = {}
+    clean_formats = clean_formats or {}
+
+    for item in clean_columns or []:
+        for col_index, ctype in item.items():
+            col_index = int(col_index)
+            if cols_to_read:
+                if col_index not in cols_to_read:
+                    continue
+                clean_idx = cols_to_read.index(col_index)
+            else:
+                clean_idx = col_index
+
+            if clean_idx >= len(df.columns):
+                continue
+
+            col_name = df.columns[clean_idx]
+            before = df[col_name]
+            formats = clean_formats.get(col_index) or clean_formats.get(str(col_index))
+            after = coerce_column(before, ctype, formats)
+
+            rejected[str(col_name)] = int((before.notna() & after.isna()).sum())
+            df[col_name] = after
+
+    return rejected
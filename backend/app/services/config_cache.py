@@ -0,0 +1,137 @@
+# services/config_cache.py
+# Cache of resolved bucket configs.
+# Resolving the effective configs of a request (user -> dataset default -> global default, or configs
+# of requested summary types) takes several queries, for configs which rarely change. Resolved configs
+# are kept as detached snapshots per (user, dataset, file_type / summary types), under the bucket
+# configs version. Creating, updating or deleting a bucket config, changing a dataset's file type or
+# deleting a dataset bumps the version (bump_config_version), entries of older versions are never hit.
+# With SUMMARY_CACHE_REDIS_URL set the version is a redis counter, so every worker sees a bump of any
+# other. Without redis it is counted per process: a change made through another worker is only seen once
+# entries expire, so CONFIG_CACHE_TTL_SECONDS then defaults to a few seconds instead of minutes.
+# Least recently used entries are evicted beyond CONFIG_CACHE_MAX_ENTRIES. Cache errors never fail a
+# request, configs are then queried.
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from app.models.bucket_config import BucketConfig
+from app.services.summary_cache import SUMMARY_CACHE_REDIS_URL
+
+CONFIG_CACHE_ENABLED = os.getenv("CONFIG_CACHE_ENABLED", "1") != "0"
+CONFIG_CACHE_MAX_ENTRIES = int(os.getenv("CONFIG_CACHE_MAX_ENTRIES", "1024"))
+CONFIG_CACHE_TTL_SECONDS = int(os.getenv("CONFIG_CACHE_TTL_SECONDS", "300" if SUMMARY_CACHE_REDIS_URL else "5"))
+
+_REDIS_VERSION_KEY = "bucket_configs:version"
+
+_CONFIG_COLUMNS = [c.key for c in BucketConfig.__table__.columns]
+
+
+def snapshot_configs(configs):
+    """
+    Detached copies of bucket configs with all their columns, safe to keep beyond the session and to
+    share between threads.
+    """
+    return [SimpleNamespace(**{c: copy.deepcopy(getattr(cfg, c)) for c in _CONFIG_COLUMNS}) for cfg in configs]
+
+
+# ==========================================================
+#  Version
+# ==========================================================
+
+_local_version = 0
+_version_lock = threading.Lock()
+_redis_client = None
+
+
+def _get_redis():
+    global _redis_client
+    if _redis_client is None:
+        import redis
+
+        _redis_client = redis.Redis.from_url(SUMMARY_CACHE_REDIS_URL)
+    return _redis_client
+
+
+def config_version():
+    """Current bucket configs version, None when it can not be read (cache is then skipped)."""
+    if not SUMMARY_CACHE_REDIS_URL:
+        return _local_version
+    try:
+        return int(_get_redis().get(_REDIS_VERSION_KEY) or 0)
+    except Exception as e:
+        print(f"⚠️ Bucket config version read failed: {e}")
+        return None
+
+
+def bump_config_version():
+    """Marks resolved configs stale, call after the change is committed."""
+    global _local_version
+    with _version_lock:
+        _local_version += 1
+    if SUMMARY_CACHE_REDIS_URL:
+        try:
+            _get_redis().incr(_REDIS_VERSION_KEY)
+        except Exception as e:
+            print(f"⚠️ Bucket config version bump failed: {e}")
+    # drop entries of older versions early
+    _entries.clear()
+
+
+# ==========================================================
+#  Entries
+# ==========================================================
+
+class _Entries:
+    """LRU with TTL, values are deep copied in and out."""
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(entry[1])
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_entries = _Entries(CONFIG_CACHE_MAX_ENTRIES, CONFIG_CACHE_TTL_SECONDS)
+
+
+def get_cached(version, key):
+    """Value stored under key at version, None when missing."""
+    if not CONFIG_CACHE_ENABLED or version is None:
+        return None
+    return _entries.get((version,) + tuple(key))
+
+
+def store(version, key, value):
+    """
+    Stores value under key at version. Version must be read before the queries value comes from, a
+    change committed meanwhile then leaves the entry under the older version.
+    """
+    if not CONFIG_CACHE_ENABLED or version is None:
+        return
+    _entries.set((version,) + tuple(key), value)
@@ -0,0 +1,213 @@
+# services/dataset_cube.py
+# Aggregate cube of a dataset: summary metric sums (and row count) of loan records grouped by the
+# fields bucket configs group on. Bucket summaries re-bucket the cube's cells instead of scanning
+# loan_records, so their cost depends on cube size, not dataset size.
+# Fields are taken in order of fewest distinct values while their distinct combinations stay within
+# CUBE_MAX_CELLS. Configs on cube fields are answered from the cube when filters only use cube fields,
+# others scan loan_records. Cube is built after ingestion for the dataset's data_version, a cube of an
+# older version is not used.
+
+import os
+import time
+
+from sqlalchemy import BigInteger, Text, cast, func, insert, or_, select, literal, text
+from sqlalchemy.orm import Session
+
+from app.models.bucket_config import BucketConfig
+from app.models.dataset_cube import DatasetCube, DatasetCubeCell
+from app.models.models import Dataset, LoanRecord
+from app.services.summary_cache import get_dataset_version
+
+CUBE_ENABLED = os.getenv("CUBE_ENABLED", "1") != "0"
+CUBE_MAX_CELLS = int(os.getenv("CUBE_MAX_CELLS", "20000"))
+# grouping many fields sorts on disk with default work_mem, build hashes in memory instead
+CUBE_WORK_MEM = os.getenv("CUBE_WORK_MEM", "64MB")
+
+# loan_records columns summed per cell, same names in dataset_cube_cells
+CUBE_METRIC_COLUMNS = [
+    "principal_os_amt",
+    "disbursement_amount",
+    "post_npa_collection",
+    "post_woff_collection",
+    "m6_collection",
+    "m12_collection",
+    "total_collection",
+]
+
+_LOAN_COLUMNS = LoanRecord.__table__.c
+
+
+# ==========================================================
+#  Build
+# ==========================================================
+
+def cube_candidate_fields(db: Session, dataset_id):
+    """
+    (field, is_json) of bucket configs which may apply to dataset, its own and global ones.
+    """
+    rows = (
+        db.query(BucketConfig.target_field, BucketConfig.target_field_is_json)
+        .filter(or_(BucketConfig.dataset_id == dataset_id, BucketConfig.dataset_id.is_(None)))
+        .distinct()
+        .all()
+    )
+    fields = set()
+    for field, is_json in rows:
+        # unknown column, or JSON field named as a column (would share its key in dims)
+        if bool(is_json) == (field in _LOAN_COLUMNS):
+            continue
+        fields.add((field, bool(is_json)))
+    return sorted(fields)
+
+
+def _record_dim(field, is_json):
+    # JSON values are kept as JSON, filters & buckets read them as text the same way as additional_fields
+    return LoanRecord.additional_fields[field] if is_json else getattr(LoanRecord, field)
+
+
+def _records_subquery(dataset_id, fields, metrics=()):
+    # dims as plain columns, JSON paths are bound parameters and would not match between SELECT and GROUP BY
+    return (
+        select(
+            *[_record_dim(f, j).label(f"dim_{i}") for i, (f, j) in enumerate(fields)],
+            *[getattr(LoanRecord, c) for c in metrics],
+        )
+        .where(LoanRecord.dataset_id == dataset_id)
+        .subquery("records")
+    )
+
+
+def _group_counts(db: Session, records, n, grouping):
+    """{grouping() bitmask: groups} of GROUP BY grouping over n dims of records."""
+    dims = [records.c[f"dim_{i}"] for i in range(n)]
+    groups = (
+        select(func.grouping(*dims).label("mask"))
+        .select_from(records)
+        .group_by(grouping(*dims))
+        .subquery("groups")
+    )
+    return dict(db.execute(select(groups.c.mask, func.count()).group_by(groups.c.mask)).all())
+
+
+def _select_cube_fields(db: Session, dataset_id, candidates):
+    if not candidates:
+        return []
+    n = len(candidates)
+    full = (1 << n) - 1
+
+    # distinct values (NULL included) of every field, one grouping set per field
+    counts = _group_counts(db, _records_subquery(dataset_id, candidates), n, func.grouping_sets)
+    values = [counts.get(full ^ (1 << (n - 1 - i)), 0) for i in range(n)]
+    ordered = [c for v, c in sorted(zip(values, candidates)) if v <= CUBE_MAX_CELLS]
+    if not ordered:
+        return []
+
+    # cells taken by first k fields, fields are often correlated (e.g. city & state)
+    n = len(ordered)
+    counts = _group_counts(db, _records_subquery(dataset_id, ordered), n, func.rollup)
+    cells = [counts.get((1 << (n - k)) - 1, 0) for k in range(1, n + 1)]
+    taken = sum(1 for c in cells if c <= CUBE_MAX_CELLS)
+    return ordered[:taken]
+
+
+def build_dataset_cube(db: Session, dataset_id):
+    """
+    (Re)builds cube of dataset for its current data_version, in caller's transaction, caller commits.
+
+    Returns:
+        DatasetCube, None when dataset has no field fitting in cube.
+    """
+    start = time.perf_counter()
+    data_version = get_dataset_version(db, dataset_id)
+    db.query(DatasetCubeCell).filter(DatasetCubeCell.dataset_id == dataset_id).delete(synchronize_session=False)
+    db.query(DatasetCube).filter(DatasetCube.dataset_id == dataset_id).delete(synchronize_session=False)
+    if data_version is None:
+        return None
+
+    db.execute(text("SELECT set_config('work_mem', :work_mem, true)"), {"work_mem": CUBE_WORK_MEM})
+    fields = _select_cube_fields(db, dataset_id, cube_candidate_fields(db, dataset_id))
+    if not fields:
+        print(f"🧊 No cube for dataset {dataset_id}, none of its bucket fields fits in one")
+        return None
+
+    records = _records_subquery(dataset_id, fields, CUBE_METRIC_COLUMNS)
+    dims = [records.c[f"dim_{i}"] for i in range(len(fields))]
+    dims_json = func.jsonb_build_object(*[
+        arg for (f, _), dim in zip(fields, dims) for arg in (cast(literal(f), Text), dim)
+    ])
+    cells = (
+        select(
+            cast(literal(str(dataset_id)), DatasetCubeCell.dataset_id.type).label("dataset_id"),
+            dims_json.label("dims"),
+            func.count().label("row_count"),
+            *[func.sum(records.c[c]).label(c) for c in CUBE_METRIC_COLUMNS],
+        )
+        .select_from(records)
+        .group_by(*dims)
+    )
+    result = db.execute(
+        insert(DatasetCubeCell).from_select(["dataset_id", "dims", "row_count", *CUBE_METRIC_COLUMNS], cells)
+    )
+
+    cube = DatasetCube(
+        dataset_id=dataset_id,
+        data_version=data_version,
+        fields=[[f, j] for f, j in fields],
+        cell_count=result.rowcount,
+        build_seconds=round(time.perf_counter() - start, 3),
+    )
+    db.add(cube)
+    db.flush()
+    print(f"🧊 Built cube of dataset {dataset_id}: {cube.cell_count} cells on {[f for f, _ in fields]} in {cube.build_seconds}s")
+    return cube
+
+
+# ==========================================================
+#  Query
+# ==========================================================
+
+def get_current_cube(db: Session, dataset_id):
+    """Cube of dataset if built for its current data_version."""
+    if not CUBE_ENABLED:
+        return None
+    return (
+        db.query(DatasetCube)
+        .join(Dataset, Dataset.id == DatasetCube.dataset_id)
+        .filter(DatasetCube.dataset_id == dataset_id, DatasetCube.data_version == Dataset.data_version)
+        .first()
+    )
+
+
+def cube_answers(cube, configs, filters):
+    """
+    Per config, True when cube answers it: config buckets on a cube field and every enabled filter
+    is on a cube field.
+    """
+    fields = {(f, bool(j)) for f, j in cube.fields}
+    for criteria in filters or []:
+        if not criteria.enabled:
+            continue
+        # decided the same way as apply_filters does
+        is_json = not hasattr(LoanRecord, criteria.field)
+        if (criteria.field, is_json) not in fields:
+            return [False] * len(configs)
+    return [(c.target_field, bool(c.target_field_is_json)) in fields for c in configs]
+
+
+def cube_cells_subquery(cube):
+    """
+    Cells of cube shaped like loan records: cube fields as typed columns, JSON fields under
+    additional_fields, metric sums under their loan_records names, plus row_count.
+    """
+    dims = DatasetCubeCell.dims
+    columns = [dims.label("additional_fields")]
+    for field, is_json in cube.fields:
+        if not is_json:
+            columns.append(cast(dims[field].astext, _LOAN_COLUMNS[field].type).label(field))
+    columns.append(cast(DatasetCubeCell.row_count, BigInteger).label("row_count"))
+    columns += [getattr(DatasetCubeCell, c) for c in CUBE_METRIC_COLUMNS]
+    return (
+        select(*columns)
+        .where(DatasetCubeCell.dataset_id == cube.dataset_id)
+        .subquery("cube_cells")
+    )
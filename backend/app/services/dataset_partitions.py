@@ -0,0 +1,85 @@
+# services/dataset_partitions.py
+# loan_records is list partitioned by dataset_id, one partition per dataset (sql/feat_partition).
+# Partition is created in the same transaction as its dataset and dropped in the one deleting the dataset,
+# so deleting a dataset drops a table instead of deleting its rows one by one, and queries filtered
+# on dataset_id only touch that dataset's partition.
+# When loan_records is not partitioned (migration not applied yet) these functions do nothing.
+
+import os
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+LOAN_RECORDS_TABLE = "loan_records"
+PARTITION_DROP_LOCK_TIMEOUT = os.getenv("PARTITION_DROP_LOCK_TIMEOUT", "5s")
+
+
+def partition_name(dataset_id) -> str:
+    return f"{LOAN_RECORDS_TABLE}_{UUID(str(dataset_id)).hex}"
+
+
+def is_partitioned(db: Session) -> bool:
+    return db.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+        {"table": LOAN_RECORDS_TABLE},
+    ).first() is not None
+
+
+def create_dataset_partition(db: Session, dataset_id):
+    """
+    Creates loan_records partition of a dataset in the caller's transaction, caller commits.
+    Table is created standalone and attached, ATTACH PARTITION only takes SHARE UPDATE EXCLUSIVE lock
+    on loan_records, CREATE TABLE ... PARTITION OF would block readers of all datasets till commit.
+    """
+    if not is_partitioned(db):
+        return
+    name = partition_name(dataset_id)
+    if db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return
+
+    dataset_literal = str(UUID(str(dataset_id)))
+    db.execute(text(f'CREATE TABLE "{name}" (LIKE {LOAN_RECORDS_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    # matches the partition bound, ATTACH then skips validating rows
+    db.execute(text(f"""ALTER TABLE "{name}" ADD CONSTRAINT "{name}_bound" CHECK (dataset_id = '{dataset_literal}')"""))
+    db.execute(text(f"""ALTER TABLE {LOAN_RECORDS_TABLE} ATTACH PARTITION "{name}" FOR VALUES IN ('{dataset_literal}')"""))
+    db.execute(text(f'ALTER TABLE "{name}" DROP CONSTRAINT "{name}_bound"'))
+    print(f"🧱 Created partition {name}")
+
+
+def drop_dataset_partition(db: Session, dataset_id) -> bool:
+    """
+    Drops partition of a dataset in the caller's transaction, with the dataset's pool selections (their
+    records reference rows of the partition). Caller deletes the dataset row and commits, so selections,
+    partition and dataset are deleted together or not at all.
+    Dropping a partition locks loan_records till commit, the lock is waited for at most
+    PARTITION_DROP_LOCK_TIMEOUT so queries of other datasets do not queue behind a long running one,
+    the statement then fails and caller rolls back.
+
+    Returns:
+        False when loan_records is not partitioned or dataset has no partition, caller then deletes rows.
+    """
+    if not is_partitioned(db):
+        return False
+    name = partition_name(dataset_id)
+    if db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is None:
+        return False
+
+    pending = db.execute(
+        text("SELECT inhdetachpending FROM pg_inherits WHERE inhrelid = to_regclass(:name)"),
+        {"name": name},
+    ).scalar()
+    if pending:
+        # concurrent detach of an earlier delete was interrupted, FINALIZE can not run inside a transaction
+        with db.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f'ALTER TABLE {LOAN_RECORDS_TABLE} DETACH PARTITION "{name}" FINALIZE'))
+
+    db.execute(text("DELETE FROM pool_selections WHERE dataset_id = :id"), {"id": str(dataset_id)})
+    db.execute(text("SELECT set_config('lock_timeout', :timeout, true)"), {"timeout": PARTITION_DROP_LOCK_TIMEOUT})
+    if pending is False:
+        # partition is referenced by pool_selection_records foreign key, it is detached before the drop
+        db.execute(text(f'ALTER TABLE {LOAN_RECORDS_TABLE} DETACH PARTITION "{name}"'))
+    db.execute(text(f'DROP TABLE "{name}"'))
+
+    print(f"🗑️ Dropped partition {name}")
+    return True
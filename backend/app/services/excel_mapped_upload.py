@@ -1,15 +1,34 @@
 import pandas as pd
 import io
+import os
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from sqlalchemy import create_engine, text
+from psycopg2 import sql as pg_sql
+from sqlalchemy import create_engine, text, inspect, Integer, String
 from uuid import UUID
 from openpyxl import load_workbook
 import json
+import csv
+import itertools
+import re
+import numpy as np
+import orjson
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+from app.services.column_cleaner import clean_sheet_columns, coerce_dates, coerce_float, coerce_int, coerce_string
+from app.services.sheet_join import join_relation, prepare_right, join_prepared, combine_join_stats
+from app.services.ingest_pipeline import PIPELINE_CHUNK_ROWS, PIPELINE_QUEUE_CHUNKS, run_pipeline
+from app.services.parse_cache import PARSE_CACHE_ENABLED, file_sha256, sheet_cache_key, load_sheet, store_sheet
 
 # ============================================================
 # 1️⃣ FUNCTION: READ & MAP EXCEL FILE USING CONFIG
 # ============================================================
-def upload_to_postgres(data_id: UUID, df, db_engine, table_name, column_mapping=None, truncate_before_insert=False):
+def upload_to_postgres(data_id: UUID, df, db_engine, table_name, column_mapping=None, truncate_before_insert=False, replace_existing=False,
+                       upsert_key=None, delete_missing=True):
     """
     Upload a DataFrame to PostgreSQL with robust handling of mapped and extra columns.
 
@@ -20,9 +39,15 @@ def upload_to_postgres(data_id: UUID, df, db_engine, table_name, column_mapping=
         table_name: Target PostgreSQL table.
         column_mapping: Dict {df_col_name: db_col_name} for mapped columns.
         truncate_before_insert: Bool, whether to clear table before inserting.
+        replace_existing: Bool, delete rows of this dataset in same transaction as the load,
+            readers see old rows until new ones are committed.
+        upsert_key: Column name (e.g. agreement_no), merge into existing rows of this dataset by it
+            instead of appending, see upsert_dataframe_to_table.
+        delete_missing: With upsert_key, delete rows whose key is not in df.
 
     Returns:
-        Dict: {"status": True/False, "inserted": count, "total": total_records}
+        Dict: {"status": True/False, "inserted": count, "total": total_records},
+        with upsert_key also "changes" (inserted / updated / unchanged / dropped).
     """
     try:
         if df is None or df.empty:
@@ -64,45 +89,26 @@ def upload_to_postgres(data_id: UUID, df, db_engine, table_name, column_mapping=
         # else:
         #     df_to_upload = df.copy()
         # ===== Handle column mapping (supports 1→many) =====
-        if column_mapping:
-
-            # Start with an empty df that keeps the same index as original df
-            df_to_upload = df[[]].copy()  # empty, but same index
-
-            for src_col, target in column_mapping.items():
-                if src_col not in df.columns:
-                    continue
-
-                # 1 → many mapping (duplicate source column to multiple DB columns)
-                if isinstance(target, list):
-                    for db_col in target:
-                        df_to_upload[db_col] = df[src_col]
-                else:
-                    # Normal 1 → 1 mapping
-                    df_to_upload[target] = df[src_col]
-
-        else:
-            df_to_upload = df.copy()
+        df_to_upload = apply_column_mapping(df, column_mapping)
 
         # ===== Truncate table if requested =====
         if truncate_before_insert:
             with db_engine.begin() as conn:
                 conn.execute(text(f"TRUNCATE TABLE {table_name} RESTART IDENTITY CASCADE"))
 
-        # ===== Count records before insert =====
-        with db_engine.begin() as conn:
-            result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
-            total_before = result.scalar()
+        # ===== Delta upsert =====
+        if upsert_key:
+            changes = upsert_dataframe_to_table(
+                df_to_upload, db_engine, table_name, data_id, key_column=upsert_key, delete_missing=delete_missing
+            )
+            return {"status": True, "inserted": changes["inserted"] + changes["updated"],
+                    "total": len(df_to_upload), "changes": changes}
 
         # ===== Upload =====
-        df_to_upload.to_sql(table_name, con=db_engine, if_exists="append", index=False)
-
-        # ===== Count records after insert =====
-        with db_engine.begin() as conn:
-            result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
-            total_after = result.scalar()
-
-        inserted = total_after - total_before
+        # Streams rows through COPY FROM STDIN, inserted count is taken from COPY result
+        # rather than counting whole table before and after insert.
+        replace_filter = ("dataset_id", str(data_id)) if replace_existing else None
+        inserted = copy_dataframe_to_table(df_to_upload, db_engine, table_name, replace_filter=replace_filter)
         return {"status": True, "inserted": inserted, "total": len(df_to_upload)}
 
     except Exception as e:
@@ -111,6 +117,301 @@ def upload_to_postgres(data_id: UUID, df, db_engine, table_name, column_mapping=
         return {"status": False, "inserted": 0, "total": len(df) if df is not None else 0, "message": str(e)}
 
 
+def apply_column_mapping(df, column_mapping):
+    """
+    Selects & renames columns of df to database columns, {df_col_name: db_col_name or [db_col_names]}.
+    Mapped columns missing in df are skipped, df is returned as copy when there is no mapping.
+    """
+    if not column_mapping:
+        return df.copy()
+
+    # Start with an empty df that keeps the same index as original df
+    df_to_upload = df[[]].copy()  # empty, but same index
+
+    for src_col, target in column_mapping.items():
+        if src_col not in df.columns:
+            continue
+
+        # 1 → many mapping (duplicate source column to multiple DB columns)
+        if isinstance(target, list):
+            for db_col in target:
+                df_to_upload[db_col] = df[src_col]
+        else:
+            # Normal 1 → 1 mapping
+            df_to_upload[target] = df[src_col]
+    return df_to_upload
+
+
+# ============================================================
+# 1️⃣ HELPER: BULK LOAD DATAFRAME USING COPY
+# ============================================================
+COPY_NULL_MARKER = "\\N"
+COPY_SPOOL_MAX_BYTES = 64 * 1024 * 1024   # buffer is kept in memory till this size, spilled to disk after
+COPY_CHUNK_ROWS = 50000
+
+
+def copy_dataframe_to_table(df, db_engine, table_name, chunk_rows=COPY_CHUNK_ROWS, replace_filter=None):
+    """
+    Bulk loads a DataFrame into PostgreSQL table using COPY FROM STDIN.
+
+    Rows are written as CSV into a spooled buffer (memory first, disk once it grows beyond
+    COPY_SPOOL_MAX_BYTES) and streamed to the server in one COPY statement.
+
+    Args:
+        df: DataFrame, column names must match table column names.
+        db_engine: SQLAlchemy engine (psycopg2 driver).
+        table_name: Target PostgreSQL table.
+        chunk_rows: Rows serialised to the buffer per chunk.
+        replace_filter: Optional (column, value), matching rows are deleted before COPY in the
+            same transaction, so old rows are swapped for new ones atomically.
+
+    Returns:
+        int: Number of rows copied, as reported by COPY.
+    """
+    if df is None or df.empty:
+        return 0
+
+    df = _coerce_for_copy(df, db_engine, table_name)
+
+    with _csv_buffer(df, chunk_rows) as buffer:
+        raw_conn = db_engine.raw_connection()
+        try:
+            cursor = raw_conn.cursor()
+            if replace_filter:
+                filter_col, filter_value = replace_filter
+                if filter_col == "dataset_id":
+                    # one merge per dataset at a time, same lock as delta merge
+                    cursor.execute("SELECT id FROM datasets WHERE id = %s FOR UPDATE", (filter_value,))
+                delete_sql = pg_sql.SQL("DELETE FROM {} WHERE {} = %s").format(
+                    pg_sql.Identifier(table_name), pg_sql.Identifier(filter_col)
+                )
+                cursor.execute(delete_sql, (filter_value,))
+                print(f"🔁 Replacing {cursor.rowcount} existing rows of {table_name}")
+            inserted = _copy_from_buffer(cursor, buffer, table_name, df.columns)
+            cursor.close()
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+
+    return inserted
+
+
+def _csv_buffer(df, chunk_rows=COPY_CHUNK_ROWS):
+    """
+    Writes df as CSV into a spooled buffer, memory first and disk once it grows beyond COPY_SPOOL_MAX_BYTES.
+    Serialised before a connection is taken, so no transaction is open while this runs.
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=COPY_SPOOL_MAX_BYTES, mode="w+", newline="", encoding="utf-8")
+    for start in range(0, len(df), chunk_rows):
+        df.iloc[start:start + chunk_rows].to_csv(
+            buffer, header=False, index=False, na_rep=COPY_NULL_MARKER
+        )
+    buffer.seek(0)
+    return buffer
+
+
+def _copy_from_buffer(cursor, buffer, table_name, columns):
+    """Streams buffer with COPY in cursor's transaction, returns rows copied."""
+    copy_sql = pg_sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL {})").format(
+        pg_sql.Identifier(table_name),
+        pg_sql.SQL(", ").join(pg_sql.Identifier(str(c)) for c in columns),
+        pg_sql.Literal(COPY_NULL_MARKER),
+    )
+    cursor.copy_expert(copy_sql.as_string(cursor), buffer)
+    return cursor.rowcount
+
+
+# ============================================================
+# 1️⃣ HELPER: DELTA UPSERT OF A DATASET BY KEY COLUMN
+# ============================================================
+# New file of a dataset is COPY'd into a temporary stage table and merged with rows of the dataset
+# by key (agreement_no): new keys are inserted, existing keys are updated only when a loaded column
+# changed, keys missing from the file are dropped. Unchanged rows are not written at all.
+# loan_records has no unique key per dataset (relations with on_duplicate "allow" repeat keys), so the
+# merge is UPDATE ... FROM + INSERT ... WHERE NOT EXISTS under a lock on the dataset row, rather than
+# INSERT ... ON CONFLICT which needs a unique index.
+
+DELTA_STAGE_TABLE = "loan_records_delta_stage"
+
+
+def upsert_dataframe_to_table(df, db_engine, table_name, dataset_id, key_column="agreement_no",
+                              delete_missing=True, chunk_rows=COPY_CHUNK_ROWS):
+    """
+    Merges df into rows of one dataset by key column, in a single transaction.
+
+    Args:
+        df: DataFrame, column names must match table column names, must have dataset_id & key column.
+        db_engine: SQLAlchemy engine (psycopg2 driver).
+        table_name: Target PostgreSQL table.
+        dataset_id: Dataset whose rows are merged.
+        key_column: Business key of a row within the dataset.
+        delete_missing: Delete rows whose key is not in df, else they are kept and only counted.
+
+    Returns:
+        Dict: {"staged", "inserted", "updated", "unchanged", "dropped", "total"}, total is
+        row count of dataset after the merge.
+    Raises:
+        ValueError when key is empty or repeated in df or in existing rows of dataset.
+    """
+    if df is None or df.empty:
+        raise ValueError("No data to upload")
+    if key_column not in df.columns or "dataset_id" not in df.columns:
+        raise ValueError(f"Delta upload needs {key_column} and dataset_id in column mapping.")
+
+    df = _coerce_for_copy(df, db_engine, table_name)
+
+    keys = df[key_column]
+    if keys.isna().any():
+        raise ValueError(f"{int(keys.isna().sum())} rows have empty {key_column}, delta upload matches rows by it.")
+    repeated = keys[keys.duplicated()].astype(str).unique()
+    if len(repeated):
+        raise ValueError(f"{len(repeated)} {key_column} values repeat in uploaded file, e.g. {list(repeated[:5])}.")
+
+    columns = [str(c) for c in df.columns]
+    compared = [c for c in columns if c not in ("dataset_id", key_column)]
+    table = pg_sql.Identifier(table_name)
+    stage = pg_sql.Identifier(DELTA_STAGE_TABLE)
+    key = pg_sql.Identifier(key_column)
+    column_list = pg_sql.SQL(", ").join(pg_sql.Identifier(c) for c in columns)
+
+    with _csv_buffer(df, chunk_rows) as buffer:
+        raw_conn = db_engine.raw_connection()
+        try:
+            cursor = raw_conn.cursor()
+
+            # one merge per dataset at a time, readers are not blocked
+            cursor.execute("SELECT id FROM datasets WHERE id = %s FOR UPDATE", (str(dataset_id),))
+
+            cursor.execute(pg_sql.SQL(
+                "SELECT {key} FROM {table} WHERE dataset_id = %s GROUP BY {key} HAVING count(*) > 1 LIMIT 5"
+            ).format(key=key, table=table), (str(dataset_id),))
+            existing_repeated = [row[0] for row in cursor.fetchall()]
+            if existing_repeated:
+                raise ValueError(
+                    f"Dataset has repeated {key_column} values, e.g. {existing_repeated}, "
+                    f"it can not be updated by {key_column}. Reprocess or upload as new dataset."
+                )
+
+            # stage has same column types as target, dropped at commit
+            cursor.execute(pg_sql.SQL(
+                "CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {cols} FROM {table} WITH NO DATA"
+            ).format(stage=stage, cols=column_list, table=table))
+            staged = _copy_from_buffer(cursor, buffer, DELTA_STAGE_TABLE, columns)
+            cursor.execute(pg_sql.SQL("ANALYZE {}").format(stage))
+
+            changed = pg_sql.SQL("({}) IS DISTINCT FROM ({})").format(
+                pg_sql.SQL(", ").join(pg_sql.SQL("t.{}").format(pg_sql.Identifier(c)) for c in compared),
+                pg_sql.SQL(", ").join(pg_sql.SQL("s.{}").format(pg_sql.Identifier(c)) for c in compared),
+            ) if compared else pg_sql.SQL("false")
+            assignments = [pg_sql.SQL("{} = s.{}").format(pg_sql.Identifier(c), pg_sql.Identifier(c)) for c in compared]
+            if "updated_at" not in columns:
+                assignments.append(pg_sql.SQL("updated_at = now()"))
+
+            updated = 0
+            if compared:
+                cursor.execute(pg_sql.SQL(
+                    "UPDATE {table} AS t SET {assignments} FROM {stage} AS s "
+                    "WHERE t.dataset_id = %s AND t.{key} = s.{key} AND {changed}"
+                ).format(
+                    table=table, assignments=pg_sql.SQL(", ").join(assignments),
+                    stage=stage, key=key, changed=changed,
+                ), (str(dataset_id),))
+                updated = cursor.rowcount
+
+            cursor.execute(pg_sql.SQL(
+                "INSERT INTO {table} ({cols}) SELECT {cols} FROM {stage} AS s "
+                "WHERE NOT EXISTS (SELECT 1 FROM {table} AS t WHERE t.dataset_id = %s AND t.{key} = s.{key})"
+            ).format(table=table, cols=column_list, stage=stage, key=key), (str(dataset_id),))
+            inserted = cursor.rowcount
+
+            missing_sql = pg_sql.SQL(
+                "FROM {table} AS t WHERE t.dataset_id = %s "
+                "AND NOT EXISTS (SELECT 1 FROM {stage} AS s WHERE s.{key} = t.{key})"
+            ).format(table=table, stage=stage, key=key)
+            if delete_missing:
+                cursor.execute(pg_sql.SQL("DELETE ") + missing_sql, (str(dataset_id),))
+                dropped = cursor.rowcount
+            else:
+                cursor.execute(pg_sql.SQL("SELECT count(*) ") + missing_sql, (str(dataset_id),))
+                dropped = cursor.fetchone()[0]
+
+            cursor.execute(pg_sql.SQL("SELECT count(*) FROM {} WHERE dataset_id = %s").format(table), (str(dataset_id),))
+            total = cursor.fetchone()[0]
+
+            cursor.close()
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+
+    changes = {
+        "staged": staged,
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": staged - inserted - updated,
+        "dropped": dropped,
+        "delete_missing": delete_missing,
+        "total": total,
+    }
+    print(f"🔀 Delta upsert of {table_name}: {changes}")
+    return changes
+
+
+# floats beyond this are not exact integers
+_EXACT_FLOAT_INT = 2 ** 53
+
+
+def _copy_column_types(db_engine, table_name):
+    """Integer & text columns of table, {"int": set, "text": set}."""
+    types = {"int": set(), "text": set()}
+    for col in inspect(db_engine).get_columns(table_name):
+        if isinstance(col["type"], Integer):
+            types["int"].add(col["name"])
+        elif isinstance(col["type"], String):
+            types["text"].add(col["name"])
+    return types
+
+
+def _coerce_for_copy(df, db_engine, table_name, column_types=None):
+    """
+    COPY parses text strictly, INSERT used to cast float to integer implicitly.
+    Integer table columns are converted here so 5.0 is written as 5.
+    Whole numbers going to text columns are written without .0 as well, whatever dtype the frame got:
+    pandas turns an integer column with gaps into float, so the cell read as 3019 from the sheet would
+    otherwise be written as 3019 or 3019.0 depending on the other rows read with it.
+    """
+    if column_types is None:
+        column_types = _copy_column_types(db_engine, table_name)
+    for col in df.columns:
+        if col in column_types["int"]:
+            if pd.api.types.is_float_dtype(df[col]):
+                df[col] = df[col].round().astype("Int64")
+            elif df[col].dtype == object:
+                df[col] = df[col].map(lambda v: int(v) if isinstance(v, float) and v.is_integer() else v)
+        elif col in column_types["text"]:
+            if pd.api.types.is_float_dtype(df[col]):
+                values = df[col]
+                whole = values.notna() & (values % 1 == 0) & (values.abs() < _EXACT_FLOAT_INT)
+                if whole.any():
+                    text_values = values.astype(object)
+                    text_values[whole] = values[whole].astype("int64").astype(str)
+                    df[col] = text_values
+            elif df[col].dtype == object:
+                df[col] = df[col].map(_whole_float_text)
+    return df
+
+
+def _whole_float_text(v):
+    if isinstance(v, float) and v.is_integer() and abs(v) < _EXACT_FLOAT_INT:
+        return str(int(v))
+    return v
+
+
 # ============================================================
 # 2️⃣ FUNCTION:
 # # =============UPLOAD DATAFRAME TO POSTGRES===============================================
@@ -209,12 +510,48 @@ def upload_to_postgres(data_id: UUID, df, db_engine, table_name, column_mapping=
 # ============================================================
 # 2️⃣ FUNCTION:
 # # =============UPLOAD DATAFRAME TO POSTGRES===============================================
-def fn_read_excel_map_base(excel_bytes, mapping_config):
+def sheet_alias_of(mapping_config, sheet_no):
+    return mapping_config["sheets"][sheet_no].get("alias", f"Sheet{sheet_no}")
+
+
+def resolve_relations(mapping_config, dfs):
+    """
+    Resolves join columns of relations from column indices to column names of parsed sheets.
+
+    Args:
+        dfs: {sheet_alias: df}, only columns of the frames are used.
+
+    Returns:
+        List of (rel, left_alias, right_alias, left_col_name, right_col_name)
+    """
+    resolved = []
+    for rel in mapping_config.get("relations", []):
+        left_alias = sheet_alias_of(mapping_config, rel["left"])
+        right_alias = sheet_alias_of(mapping_config, rel["right"])
+        # mod hvb @ 20/11/2025 read mapping from db, this is string
+        try:
+            left_col_id = int(rel["left_col"])
+        except ValueError:
+            raise ValueError(f"Invalid left col in join : {rel['left_col']}")
+
+        try:
+            right_col_id = int(rel["right_col"])
+        except ValueError:
+            raise ValueError(f"Invalid right col in join : {rel['right_col']}")
+
+        left_col_name = dfs[left_alias].columns[left_col_id]
+        right_col_name = dfs[right_alias].columns[right_col_id]
+        resolved.append((rel, left_alias, right_alias, left_col_name, right_col_name))
+    return resolved
+
+
+def fn_read_excel_map_base(excel_file, mapping_config, file_hash=None):
     """
     Reads and maps multiple Excel sheets using flexible mapping rules.
 
     Args:
-        excel_bytes: File content in bytes (from UploadFile.read()).
+        excel_file: Path of spooled upload file, or file content in bytes.
+        file_hash: SHA-256 of file if already known, used as parse cache key.
         mapping_config: Dict defining sheets, header, cols, and relations., where sheet numbers are 1-based mapping and not 0-based.
         {
             "sheets": {
@@ -254,196 +591,47 @@ def fn_read_excel_map_base(excel_bytes, mapping_config):
     start_time = datetime.now()
     print(f"📘 Starting Excel read at {start_time}")
 
-    excel_file = pd.ExcelFile(io.BytesIO(excel_bytes))
     dfs = {}
+    rejected_values = {}
 
 
-    suffix_sheet_num_to_extra = True
-    if mapping_config["sheets"]:
-        if len(mapping_config["sheets"]) == 1:
-            suffix_sheet_num_to_extra = False
-
-    # === STEP 1: Read each sheet as per mapping ===
-    for sheet_no, cfg in mapping_config["sheets"].items():
-        sheet_name = excel_file.sheet_names[sheet_no - 1]
-        print(f"➡️ Reading sheet {sheet_no}: {sheet_name}")
-
-        sheet_alias = cfg.get("alias", f"Sheet{sheet_no}")
-        print(f"➡️ Reading sheet alias {sheet_alias}")
-
-        # Define columns to read
-        usecols = None if cfg.get("cols_to_read", "all") == "all" else cfg["cols_to_read"]
-
-        rename_col_by_idx = False
-        header_row_idx = cfg.get("header_row", -1)
-        if header_row_idx < 0:
-            header_row_idx = None
-            rename_col_by_idx = True
-
-        # Read Excel
-        print(f"➡️ Pulling data from excel file {sheet_name} @ {datetime.now()}")
-        read_start_time = datetime.now()
-
-        # Replaced with better approach to read, reading only content
-        # df = pd.read_excel(
-        #     excel_file,
-        #     sheet_name=sheet_name,
-        #     #header=cfg.get("header_row", 0),
-        #     header=header_row_idx,
-        #     skiprows=cfg.get("skip_rows", 0),
-        #     usecols=usecols,
-        # )
-
-        df = read_excel_data_only(excel_bytes, sheet_name, header_row_idx, cfg.get("skip_rows", 0), usecols=usecols)
-
-        #shifting key_cols_read after setting cols_to_read
-        #hvb @ 23/11/2025
-        # key_column_indices = cfg.get("key_columns", [])  # define in your mapping config per sheet
-        # if key_column_indices:
-        #     key_cols = [df.columns[idx] for idx in key_column_indices]
-        #     df = df.dropna(subset=key_cols).reset_index(drop=True)
-
-        print(f"✅ Completed Reading sheet data {sheet_name} @ {datetime.now()}, Total time = {datetime.now() - read_start_time}")
-
-        # Clean column headers
-        if rename_col_by_idx:
-            # Rename columns to _col_{index}
-            # Creates indexing based on dataframe columns rather than actual columns
-            # df.columns = [f"_{sheet_alias}_col_{i}" for i in range(len(df.columns))]
-            if usecols is not None:
-                cols_to_read = usecols
-                excel_col_indices = cols_to_read
-                if isinstance(cols_to_read, str):
-                    if cols_to_read == "all":
-                        excel_col_indices = list(range(len(df.columns)))
-                    else:
-                        cols_to_read = [int(c.strip()) for c in cols_to_read.split(",") if c.strip().isdigit()]
-                        excel_col_indices = cols_to_read
-
-                df.columns = [f"_{sheet_alias}_col_{i}" for i in excel_col_indices]
-        else:
-            df.columns = [
-                str(c).strip().lower().replace(" ", "_").replace("unnamed:", "")
-                for c in df.columns
-            ]
+    # === STEP 1: Read & clean sheets, independent sheets are parsed in parallel worker processes ===
+    print(f"➡️ Pulling data from excel file @ {datetime.now()}")
+    read_start_time = datetime.now()
+    parsed_sheets = parse_mapped_sheets(excel_file, mapping_config["sheets"], file_hash)
+    print(f"✅ Completed Reading workbook @ {datetime.now()}, Total time = {datetime.now() - read_start_time}")
 
-        key_column_indices = cfg.get("key_columns", [])  # define in your mapping config per sheet
-        if key_column_indices:
-            if cols_to_read:
-                key_cols = [df.columns[cols_to_read.index(idx)] for idx in key_column_indices]
-            else:
-                key_cols = [df.columns[idx] for idx in key_column_indices]
-            df = df.dropna(subset=key_cols).reset_index(drop=True)
-
-        # Format datetime headers if defined
-        for col_index in cfg.get("datetime_headers", []):
-            if col_index < len(df.columns):
-                new_name = datetime.now().strftime("%Y%m%d_%H%M%S")
-                df.rename(columns={df.columns[col_index]: new_name}, inplace=True)
-
-        # Replace NaN / empty / None
-        df = df.replace({pd.NA: None, "NaN": None, "nan": None, "": None})
-
-        # Check for datetime column from config and replace them with null for non-parsed
-        clean_columns = cfg.get("clean_columns", [])
-        for item in clean_columns:
-            for col_index, ctype in item.items():
-                # Added hvb @ 23/11/2025 to get clean-up idx as we are only reading specified columns so count
-                # is reduced now!
-                if cols_to_read:
-                    clean_idx = cols_to_read.index(col_index)
-                else:
-                    clean_idx = col_index
-                # if col_index < len(df.columns):
-                #     if ctype == "dt":
-                #         clean_invalid_dates(df, [df.columns[col_index]])
-                #     elif ctype == "int":
-                #         clean_invalid_int(df,df.columns[col_index])
-                if clean_idx < len(df.columns):
-                    if ctype == "dt":
-                        clean_invalid_dates(df, [df.columns[clean_idx]])
-                    elif ctype == "int":
-                        clean_invalid_int(df,df.columns[clean_idx])
-                    elif ctype == "float":
-                        clean_invalid_float(df,df.columns[clean_idx])
-                    elif ctype == "string":
-                        clean_invalid_string(df, df.columns[clean_idx])
-
-        # --- Handle extras (if provided) ---
-        extras_config = cfg.get("extra", None)
-        if extras_config:
-            from openpyxl import load_workbook
-            wb = load_workbook(io.BytesIO(excel_bytes), read_only=True, data_only=True)
-            ws = wb[sheet_name]
-
-            # Collect all rows from sheet (for extra cols only)
-            raw_data = list(ws.iter_rows(values_only=True))
-            extra_data_list = []
-
-            for row_idx in range(len(df)):
-                extra_fields = {}
-                for item in extras_config:
-                    for col_idx_str, alias_name in item.items():
-                        col_idx = int(col_idx_str)
-                        # Add only if within bounds
-                        if col_idx < len(
-                                raw_data[row_idx + cfg.get("skip_rows", 0) + (cfg.get("header_row", 0) + 1)]):
-                            val = raw_data[row_idx + cfg.get("skip_rows", 0) + (cfg.get("header_row", 0) + 1)][
-                                col_idx]
-                            extra_fields[alias_name] = val
-                extra_data_list.append(extra_fields)
-
-            # Attach collected JSON as a new column
-            if suffix_sheet_num_to_extra:
-                df["extra_data_json_" + str(sheet_no)] = extra_data_list
-            else:
-                df["extra_data_json"] = extra_data_list
-
-        #dfs[cfg.get("alias", f"Sheet{sheet_no}")] = df
+    # keep config order, first sheet is used when there are no relations
+    for sheet_no in mapping_config["sheets"]:
+        sheet_alias, df, rejected = parsed_sheets[sheet_no]
+        if rejected:
+            rejected_values[sheet_alias] = rejected
+            print(f"🧹 Rejected values in sheet {sheet_alias}: {rejected}")
         dfs[sheet_alias] = df
 
 
     # === STEP 2: Join sheets using relations ===
     combined_df = None
-    for rel in mapping_config.get("relations", []):
-        left_alias = mapping_config["sheets"][rel["left"]].get("alias", f"Sheet{rel['left']}")
-        right_alias = mapping_config["sheets"][rel["right"]].get("alias", f"Sheet{rel['right']}")
-
+    join_stats = []
+    for rel, left_alias, right_alias, left_col_name, right_col_name in resolve_relations(mapping_config, dfs):
         left_df = dfs[left_alias]
         right_df = dfs[right_alias]
-        # mod hvb @ 20/11/2025 read mapping from db, this is string
-        try:
-            left_col_id = int(rel["left_col"])
-        except ValueError:
-            raise ValueError(f"Invalid left col in join : {rel['left_col']}")
-
-        try:
-            right_col_id = int(rel["right_col"])
-        except ValueError:
-            raise ValueError(f"Invalid right col in join : {rel['right_col']}")
-
-        # left_col_name = left_df.columns[rel["left_col"]]
-        # right_col_name = right_df.columns[rel["right_col"]]
-
-        left_col_name = left_df.columns[left_col_id]
-        right_col_name = right_df.columns[right_col_id]
-
         print(f"🔗 Joining {left_alias}.{left_col_name} -> {right_alias}.{right_col_name}")
 
-        if combined_df is None or combined_df is left_df:
-            combined_df = left_df.merge(
-                right_df,
-                how=rel.get("how", "left"),
-                left_on=left_col_name,
-                right_on=right_col_name
-            )
-        else:
-            combined_df = combined_df.merge(
-                right_df,
-                how=rel.get("how", "left"),
-                left_on=left_col_name,
-                right_on=right_col_name
-            )
+        # keys are normalised and right side checked for duplicate keys before merging
+        base_df = left_df if combined_df is None else combined_df
+        combined_df, stats = join_relation(
+            base_df,
+            right_df,
+            left_col_name,
+            right_col_name,
+            how=rel.get("how", "left"),
+            on_duplicate=rel.get("on_duplicate"),
+            label=f"{left_alias} -> {right_alias}",
+        )
+        join_stats.append(stats)
+        print(f"🔗 Joined {stats['relation']}: match rate {stats['match_rate']:.2%}, "
+              f"fan-out {stats['fan_out']}, rows {stats['left_rows']} -> {stats['output_rows']}")
 
     #Added hvb @ 23/11/2025 if combine_df is null, check size of dfs_sheet_wise and set first one as combined_df
     if combined_df is None:
@@ -454,29 +642,13 @@ def fn_read_excel_map_base(excel_bytes, mapping_config):
             first_df_value = dfs[first_df_key]
             combined_df = first_df_value
 
-    # --- Merge extra_data_json from multiple sheets into one column ---
-    extra_cols = [c for c in combined_df.columns if c.startswith("extra_data_json")]
-    if extra_cols:
-        def merge_extra_json(row):
-            merged = {}
-            for col in extra_cols:
-                val = row.get(col, {})
-                if isinstance(val, dict):
-                    merged.update(val)
-            return merged
-
-        # merge columns
-        if(len(extra_cols) > 1): #added hvb @ 24/11/2025 to merge if column count of extra is more than 1.
-            combined_df["extra_data_json"] = combined_df.apply(merge_extra_json, axis=1)
-
-        #convert data to jsonb format
-        combined_df["extra_data_json"] = combined_df["extra_data_json"].apply(
-            lambda v: json.dumps(v, ensure_ascii=False, default=str) if isinstance(v, dict) else v
-        )
-
-        # Optional: drop the original per-sheet extra_data_json columns
-        if suffix_sheet_num_to_extra: # Added hvb @ 24/11/2025 drop suffixed column which are now merged as one.
-            combined_df.drop(columns=extra_cols, inplace=True, errors="ignore")
+    # --- Merge extras of all sheets into one JSON column, mapped to additional_fields ---
+    extra_json, extra_columns = build_extra_json(combined_df)
+    if extra_json is not None:
+        combined_df = combined_df.drop(columns=extra_columns)
+        combined_df["extra_data_json"] = extra_json
+    combined_df.attrs["rejected_values"] = rejected_values
+    combined_df.attrs["join_stats"] = join_stats
     print(f"✅ Completed Excel read and join in {datetime.now() - start_time}")
     return combined_df
     # mod hvb @ 23/11/2025 removed exception handler let callee function handle it.
@@ -543,45 +715,813 @@ def fn_read_excel_map_base(excel_bytes, mapping_config):
 
 def read_excel_data_only(file_content, sheet_name, header=None, skiprows=0, usecols=None,max_empty_rows=20):
     # Load workbook in read-only mode, data_only=True ensures only cell values are read
-    wb = load_workbook(io.BytesIO(file_content), read_only=True, data_only=True)
-    ws = wb[sheet_name]
+    wb = load_workbook(workbook_source(file_content), read_only=True, data_only=True)
+    try:
+        df, _ = stream_sheet_rows(
+            wb[sheet_name],
+            header=header,
+            skiprows=skiprows,
+            usecols=parse_cols_to_read(usecols),
+            max_empty_rows=max_empty_rows,
+        )
+    finally:
+        wb.close()
+    return df
 
-    # Extract pure data (no styles)
-    data = []
+# ============================================================
+# 5️⃣ Single pass workbook reader, one archive open for all sheets
+# ============================================================
+
+def workbook_source(file_content):
+    """
+    Path is passed as is so the zip reader seeks inside the file on disk, bytes are wrapped in BytesIO.
+    """
+    if isinstance(file_content, (bytes, bytearray, memoryview)):
+        return io.BytesIO(file_content)
+    return file_content
+
+
+def parse_cols_to_read(cols_to_read):
+    """
+    Normalises cols_to_read from mapping config to list of zero-based column indices.
+    Accepts "all"/None (returns None), list of indices, or CSV string like "0,2,6".
+    """
+    if cols_to_read is None or cols_to_read == "all":
+        return None
+    if isinstance(cols_to_read, str):
+        return [int(c.strip()) for c in cols_to_read.split(",") if c.strip().isdigit()]
+    return [int(c) for c in cols_to_read]
+
+
+def parse_extra_columns(extras_config):
+    """
+    Converts extra config [{"3": "dated"}, {"5": "amt_in_debt"}] to [(3, "dated"), (5, "amt_in_debt")].
+    """
+    if not extras_config:
+        return None
+    extra_cols = []
+    for item in extras_config:
+        for col_idx_str, alias_name in item.items():
+            extra_cols.append((int(col_idx_str), alias_name))
+    return extra_cols
+
+
+def _cell(row, idx):
+    # read-only worksheets can return short rows when trailing cells are empty
+    return row[idx] if row is not None and idx < len(row) else None
+
+
+def _iter_data_rows(rows, header=None, skiprows=0, usecols=None, extra=None, max_empty_rows=20, header_out=None):
+    """
+    Yields (values, extra_values) of data rows, rules as in stream_sheet_rows.
+    Header row is appended to header_out list when found.
+    """
+    non_empty_idx = -1
+    skipped = 0
     empty_row_counter = 0
 
-    for row in ws.iter_rows(values_only=True):
+    for row in rows:
         if all(cell is None or str(cell).strip() == "" for cell in row):
             empty_row_counter += 1
             if empty_row_counter >= max_empty_rows:
                 break  # stop reading if continuous empty rows counter has reached beyond specified limit
             continue
-        else:
-            empty_row_counter = 0  # reset counter on first non-empty row
-            data.append(row)
+        empty_row_counter = 0  # reset counter on first non-empty row
+        non_empty_idx += 1
 
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
+        if header is not None and non_empty_idx <= header:
+            if non_empty_idx == header and header_out is not None:
+                header_out.append(row)
+            continue
+
+        values = row if usecols is None else tuple(_cell(row, i) for i in usecols)
+
+        # Remove rows which are fully empty for selected columns, before applying skip rows
+        if all(v is None for v in values):
+            continue
+        if skipped < skiprows:
+            skipped += 1
+            continue
+
+        yield values, (tuple(_cell(row, i) for i, _ in extra) if extra else None)
 
+
+def _sheet_columns(header_values, header, usecols, data):
     # Apply header logic manually
+    if usecols is not None:
+        if header is not None:
+            return [_cell(header_values, i) for i in usecols]
+        return list(usecols)
+    width = max([len(r) for r in data] + [len(header_values) if header_values else 0])
     if header is not None:
-        df.columns = df.iloc[header].tolist()
-        df = df.drop(index=range(0, header + 1))
+        return [_cell(header_values, i) for i in range(width)]
+    return list(range(width))
 
-    if usecols is not None:
-        cols_to_read = usecols
-        if isinstance(cols_to_read, str):
-            cols_to_read = [int(c.strip()) for c in cols_to_read.split(",") if c.strip().isdigit()]
-        df = df.iloc[:, cols_to_read]
 
-    # Remove any remaining fully empty rows (safety)
-    df = df.dropna(how='all').reset_index(drop=True)
+def _extras_frame(extras, extra):
+    # keep raw cell values, numeric inference would turn None into NaN inside JSON
+    return pd.DataFrame(extras, columns=[alias for _, alias in extra], dtype=object)
 
-    if skiprows:
-        df = df.iloc[skiprows:]
 
-    df.reset_index(drop=True, inplace=True)
-    return df
+def stream_sheet_rows(ws, header=None, skiprows=0, usecols=None, extra=None, max_empty_rows=20):
+    """
+    Streams rows of a read-only worksheet exactly once.
+
+    Follows same rules as earlier read_excel_data_only, blank rows are ignored, reading stops after
+    max_empty_rows continuous blank rows, header is counted on non-blank rows and skiprows is applied
+    after rows blank in the selected columns are removed.
+
+    Args:
+        ws: openpyxl read-only worksheet.
+        header: Zero-based header row index, None for header-less sheet.
+        skiprows: Rows to skip after header.
+        usecols: List of zero-based column indices, None for all columns.
+        extra: List of (column index, alias) pairs, read from the same row as mapped columns.
+        max_empty_rows: Continuous blank rows after which reading stops.
+
+    Returns:
+        Tuple (df, extras_df), extras_df has same index as df, None when no extras requested.
+    """
+    header_out = []
+    data = []
+    extras = []
+    for values, extra_values in _iter_data_rows(
+        ws.iter_rows(values_only=True), header, skiprows, usecols, extra, max_empty_rows, header_out
+    ):
+        data.append(values)
+        if extra:
+            extras.append(extra_values)
+
+    header_values = header_out[0] if header_out else None
+    df = pd.DataFrame(data, columns=_sheet_columns(header_values, header, usecols, data))
+    extras_df = _extras_frame(extras, extra) if extra else None
+    return df, extras_df
+
+
+def iter_sheet_chunks(ws, header=None, skiprows=0, usecols=None, extra=None, max_empty_rows=20, chunk_rows=50000):
+    """
+    Same as stream_sheet_rows, yields (df, extras_df) per chunk_rows data rows instead of one frame.
+
+    Columns are fixed by first chunk, with usecols None width is that of header and first chunk,
+    cells beyond it in later rows are dropped (they had no header name to be mapped by).
+    """
+    header_out = []
+    rows = _iter_data_rows(ws.iter_rows(values_only=True), header, skiprows, usecols, extra, max_empty_rows, header_out)
+    columns = None
+    while True:
+        batch = list(itertools.islice(rows, chunk_rows))
+        if not batch:
+            return
+        data = [values for values, _ in batch]
+        if columns is None:
+            columns = _sheet_columns(header_out[0] if header_out else None, header, usecols, data)
+        if usecols is None:
+            width = len(columns)
+            data = [values[:width] if len(values) > width else values for values in data]
+        extras_df = _extras_frame([extra_values for _, extra_values in batch], extra) if extra else None
+        yield pd.DataFrame(data, columns=columns), extras_df
+
+
+def read_workbook_sheets(file_content, sheet_specs, max_empty_rows=20):
+    """
+    Opens the workbook once and streams every requested sheet in a single pass.
+
+    Args:
+        file_content: Excel file path, or content in bytes.
+        sheet_specs: Dict {sheet_no: spec}, sheet_no is 1-based, spec keys are
+            header, skip_rows, usecols, extra (see stream_sheet_rows).
+        max_empty_rows: Continuous blank rows after which a sheet stops reading.
+
+    Returns:
+        Dict {sheet_no: (sheet_name, df, extras_df)}
+    """
+    wb = load_workbook(workbook_source(file_content), read_only=True, data_only=True)
+    try:
+        sheets_read = {}
+        for sheet_no, spec in sheet_specs.items():
+            sheet_name = wb.sheetnames[sheet_no - 1]
+            print(f"➡️ Reading sheet {sheet_no}: {sheet_name}")
+            df, extras_df = stream_sheet_rows(
+                wb[sheet_name],
+                header=spec.get("header"),
+                skiprows=spec.get("skip_rows", 0),
+                usecols=spec.get("usecols"),
+                extra=spec.get("extra"),
+                max_empty_rows=max_empty_rows,
+            )
+            sheets_read[sheet_no] = (sheet_name, df, extras_df)
+        return sheets_read
+    finally:
+        wb.close()
+
+# ============================================================
+# 6️⃣ Parallel sheet parsing, one worker process per sheet
+# ============================================================
+# Each worker opens the workbook itself and streams only its own sheet, so parsing & cleaning
+# of independent sheets (Pool, DPD, Collection...) runs on separate cores. Only the relation
+# join stays serial in fn_read_excel_map_base.
+# Memory is bounded by worker count (each holds one sheet, file is opened by path), workers are recycled
+# after SHEET_PARSE_TASKS_PER_WORKER sheets so large frames do not keep worker heap grown.
+SHEET_PARSE_WORKERS = int(os.getenv("SHEET_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+SHEET_PARSE_TASKS_PER_WORKER = int(os.getenv("SHEET_PARSE_TASKS_PER_WORKER", "8"))
+
+_sheet_pool = None
+_sheet_pool_lock = threading.Lock()
+
+
+def _get_sheet_pool():
+    global _sheet_pool
+    with _sheet_pool_lock:
+        if _sheet_pool is None:
+            # spawn, ingestion runs in threads of the api process and fork of a threaded process is unsafe
+            _sheet_pool = ProcessPoolExecutor(
+                max_workers=SHEET_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=SHEET_PARSE_TASKS_PER_WORKER,
+            )
+        return _sheet_pool
+
+
+def _reset_sheet_pool():
+    global _sheet_pool
+    with _sheet_pool_lock:
+        if _sheet_pool is not None:
+            _sheet_pool.shutdown(wait=False, cancel_futures=True)
+        _sheet_pool = None
+
+
+def build_sheet_spec(cfg):
+    """
+    Converts sheet mapping config to reader spec (see stream_sheet_rows).
+    """
+    header_row_idx = cfg.get("header_row", -1)
+    return {
+        "header": header_row_idx if header_row_idx >= 0 else None,
+        "skip_rows": cfg.get("skip_rows", 0),
+        "usecols": parse_cols_to_read(cfg.get("cols_to_read", "all")),
+        "extra": parse_extra_columns(cfg.get("extra", None)),
+    }
+
+
+def parse_mapped_sheet(excel_file, sheet_no, cfg):
+    """
+    Reads one sheet and applies its mapping config: column naming, key column filter,
+    datetime headers, cleanup rules and extras.
+
+    Runs inside worker process, so arguments & result must be picklable.
+
+    Returns:
+        Tuple (sheet_alias, df, rejected), rejected is {column_name: rejected_count}
+    """
+    spec = build_sheet_spec(cfg)
+    sheet_alias = cfg.get("alias", f"Sheet{sheet_no}")
+
+    if cfg.get("source_format") == "csv":
+        sheet_name = "csv"
+        df, extras_df = read_csv_source(
+            excel_file,
+            header=spec["header"],
+            skiprows=spec["skip_rows"],
+            usecols=spec["usecols"],
+            extra=spec["extra"],
+            dtype_hints=cfg.get("dtype_hints"),
+            sheet_alias=sheet_alias,
+            delimiter=cfg.get("delimiter") or ",",
+            encoding=cfg.get("encoding") or "utf-8",
+        )
+    else:
+        sheet_name, df, extras_df = read_workbook_sheets(excel_file, {sheet_no: spec})[sheet_no]
+    print(f"➡️ Mapping sheet {sheet_no}: {sheet_name}")
+
+    print(f"➡️ Mapping sheet alias {sheet_alias}")
+
+    df, rejected = map_sheet_frame(df, extras_df, sheet_no, cfg, spec)
+    return sheet_alias, df, rejected
+
+
+def map_sheet_frame(df, extras_df, sheet_no, cfg, spec=None):
+    """
+    Applies mapping config of a sheet to rows read from it, all rules are per row so this runs
+    on a whole sheet or on a chunk of it alike.
+
+    Returns:
+        Tuple (df, rejected), rejected is {column_name: rejected_count}
+    """
+    spec = spec or build_sheet_spec(cfg)
+    sheet_alias = cfg.get("alias", f"Sheet{sheet_no}")
+    cols_to_read = spec["usecols"]
+    rename_col_by_idx = spec["header"] is None
+
+    # Clean column headers
+    if rename_col_by_idx:
+        # Rename columns to _col_{index}
+        # Creates indexing based on dataframe columns rather than actual columns
+        # df.columns = [f"_{sheet_alias}_col_{i}" for i in range(len(df.columns))]
+        if cols_to_read is not None:
+            df.columns = [f"_{sheet_alias}_col_{i}" for i in cols_to_read]
+    else:
+        df.columns = [
+            str(c).strip().lower().replace(" ", "_").replace("unnamed:", "")
+            for c in df.columns
+        ]
+
+    key_column_indices = cfg.get("key_columns", [])  # define in your mapping config per sheet
+    if key_column_indices:
+        if cols_to_read:
+            key_cols = [df.columns[cols_to_read.index(idx)] for idx in key_column_indices]
+        else:
+            key_cols = [df.columns[idx] for idx in key_column_indices]
+        keep_rows = df[key_cols].notna().all(axis=1)
+        df = df[keep_rows].reset_index(drop=True)
+        if extras_df is not None:
+            extras_df = extras_df[keep_rows].reset_index(drop=True)
+
+    # Format datetime headers if defined
+    for col_index in cfg.get("datetime_headers", []):
+        if col_index < len(df.columns):
+            new_name = datetime.now().strftime("%Y%m%d_%H%M%S")
+            df.rename(columns={df.columns[col_index]: new_name}, inplace=True)
+
+    # Replace NaN / empty / None
+    df = df.replace({pd.NA: None, "NaN": None, "nan": None, "": None})
+
+    # Check for datetime column from config and replace them with null for non-parsed
+    # vectorised per column, count of values rejected per column is kept for reporting
+    rejected = clean_sheet_columns(df, cfg.get("clean_columns", []), cols_to_read, cfg.get("clean_formats"))
+
+    # --- Handle extras (if provided) ---
+    # extras were collected from the same rows as the mapped columns, so they stay aligned,
+    # kept as columns till all sheets are joined (see build_extra_json)
+    if extras_df is not None:
+        df = attach_extra_columns(df, extras_df, sheet_no)
+
+    return df, rejected
+
+
+def parse_mapped_sheets(excel_file, sheets_config, file_hash=None, in_workers=False):
+    """
+    Parses all sheets of a mapping config. Sheets found in parse cache (same file SHA-256 and same
+    sheet config) are loaded from Parquet, the rest are parsed, in parallel when more than one.
+    With in_workers a single sheet is parsed in worker process too, caller's process is kept free.
+
+    Returns:
+        Dict {sheet_no: (sheet_alias, df, rejected)}
+    """
+    parsed = {}
+    sheet_keys = {}
+    if PARSE_CACHE_ENABLED:
+        file_hash = file_hash or file_sha256(excel_file)
+        for sheet_no, cfg in sheets_config.items():
+            sheet_keys[sheet_no] = sheet_cache_key(sheet_no, cfg)
+            cached = load_sheet(file_hash, sheet_keys[sheet_no])
+            if cached is not None:
+                print(f"♻️ Sheet {sheet_no} ({cached[0]}) loaded from parse cache")
+                parsed[sheet_no] = cached
+
+    pending = {sheet_no: cfg for sheet_no, cfg in sheets_config.items() if sheet_no not in parsed}
+    if pending:
+        for sheet_no, result in _parse_sheets(excel_file, pending, in_workers).items():
+            if PARSE_CACHE_ENABLED:
+                store_sheet(file_hash, sheet_keys[sheet_no], result)
+            parsed[sheet_no] = result
+
+    return {sheet_no: parsed[sheet_no] for sheet_no in sheets_config}
+
+
+def _parse_sheets(excel_file, sheets_config, in_workers=False):
+    # in worker processes when there is more than one sheet
+    if (len(sheets_config) <= 1 and not in_workers) or SHEET_PARSE_WORKERS <= 1:
+        return {
+            sheet_no: parse_mapped_sheet(excel_file, sheet_no, cfg)
+            for sheet_no, cfg in sheets_config.items()
+        }
+
+    pool = _get_sheet_pool()
+    try:
+        futures = {
+            sheet_no: pool.submit(parse_mapped_sheet, excel_file, sheet_no, cfg)
+            for sheet_no, cfg in sheets_config.items()
+        }
+        return {sheet_no: future.result() for sheet_no, future in futures.items()}
+    except BrokenProcessPool:
+        # worker died (e.g. killed on memory), pool can not be reused, start a new one next time
+        print("⚠️ Sheet parse worker pool broken, parsing sheets serially")
+        _reset_sheet_pool()
+        return {
+            sheet_no: parse_mapped_sheet(excel_file, sheet_no, cfg)
+            for sheet_no, cfg in sheets_config.items()
+        }
+
+
+# ============================================================
+# 7️⃣ CSV source reader, for profiles with source_format "csv"
+# ============================================================
+# pyarrow reads CSV in parallel blocks on multiple threads, only selected columns are converted
+# (include_columns) and columns mapped to text database columns are read as string so values like
+# agreement numbers keep leading zeros. Output matches stream_sheet_rows so the same clean/join/COPY
+# stages follow.
+CSV_PEEK_LINES = 1000   # lines looked at to find column count
+
+
+def _peek_csv(file_content, header, delimiter, encoding):
+    """
+    Returns (header_values, width) from first lines of file, without reading whole file.
+    """
+    if isinstance(file_content, (bytes, bytearray, memoryview)):
+        text = io.TextIOWrapper(io.BytesIO(file_content), encoding=encoding, newline="")
+    else:
+        text = open(file_content, "r", encoding=encoding, newline="")
+    with text:
+        lines = list(itertools.islice(csv.reader(text, delimiter=delimiter), CSV_PEEK_LINES))
+
+    header_values = None
+    if header is not None:
+        if header >= len(lines):
+            return None, 0
+        header_values = tuple(v if v.strip() != "" else None for v in lines[header])
+        lines = lines[header + 1:]
+    width = max([len(r) for r in lines] + [len(header_values) if header_values else 0])
+    return header_values, width
+
+
+def _string_column_indices(dtype_hints, header_values, sheet_alias, width):
+    """
+    Resolves dtype_hints {df column name: "string"} to raw CSV column indices, names are as
+    parse_mapped_sheet gives them (_alias_col_idx for header-less, normalised header otherwise).
+    """
+    string_names = {name for name, hint in (dtype_hints or {}).items() if hint == "string"}
+    if not string_names:
+        return set()
+    if header_values is None:
+        prefix = f"_{sheet_alias}_col_"
+        return {
+            int(name[len(prefix):]) for name in string_names
+            if name.startswith(prefix) and name[len(prefix):].isdigit()
+        }
+    normalised = [
+        str(c).strip().lower().replace(" ", "_").replace("unnamed:", "") for c in header_values
+    ]
+    return {i for i, name in enumerate(normalised) if name in string_names and i < width}
+
+
+def read_csv_source(file_content, header=None, skiprows=0, usecols=None, extra=None,
+                    dtype_hints=None, sheet_alias=None, delimiter=",", encoding="utf-8"):
+    """
+    Reads a CSV source with same rules as stream_sheet_rows: header row, then rows blank in selected
+    columns are dropped and skiprows is applied after header.
+
+    Args:
+        file_content: CSV file path, or content in bytes.
+        dtype_hints: {df column name: "string"}, derived from profile database_config.
+        sheet_alias: Alias used in header-less column names.
+        delimiter, encoding: CSV dialect from sheet config.
+        (others as stream_sheet_rows)
+
+    Returns:
+        Tuple (df, extras_df), extras_df is None when no extras requested.
+    """
+    header_values, width = _peek_csv(file_content, header, delimiter, encoding)
+    if width == 0:
+        return pd.DataFrame(), (pd.DataFrame(columns=[alias for _, alias in extra], dtype=object) if extra else None)
+    names = [f"c{i}" for i in range(width)]
+
+    read_idx = list(range(width)) if usecols is None else [i for i in usecols if i < width]
+    extra_idx = [i for i, _ in extra or [] if i < width]
+    include = list(dict.fromkeys(read_idx + extra_idx))
+    string_idx = _string_column_indices(dtype_hints, header_values, sheet_alias, width)
+
+    table = pa_csv.read_csv(
+        workbook_source(file_content),
+        read_options=pa_csv.ReadOptions(
+            use_threads=True,
+            skip_rows=header + 1 if header is not None else 0,
+            column_names=names,
+            encoding=encoding,
+        ),
+        parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=[names[i] for i in include],
+            column_types={names[i]: pa.string() for i in string_idx if i in include},
+            null_values=["", "NaN", "nan"],
+            strings_can_be_null=True,
+        ),
+    )
+    raw = table.to_pandas()
+
+    # Columns absent in file (usecols beyond width) are read as empty, like short rows in Excel
+    selected_idx = list(range(width)) if usecols is None else list(usecols)
+    data = pd.DataFrame(
+        {i: raw[names[i]] if i < width else None for i in selected_idx}, index=raw.index
+    )
+
+    # Remove rows which are fully empty for selected columns, before applying skip rows
+    keep = data.notna().any(axis=1)
+    data = data[keep].iloc[skiprows:].reset_index(drop=True)
+
+    # pyarrow types a column over all rows, integer column with blanks only in dropped rows came as float
+    for col in data.columns:
+        values = data[col]
+        if values.dtype == "float64" and values.notna().all() and (values % 1 == 0).all():
+            data[col] = values.astype("int64")
+
+    if header is not None:
+        data.columns = [_cell(header_values, i) for i in selected_idx]
+    else:
+        data.columns = selected_idx
+
+    extras_df = None
+    if extra:
+        extras_df = pd.DataFrame(
+            {alias: raw[names[i]] if i < width else None for i, alias in extra}, index=raw.index
+        )
+        extras_df = extras_df[keep].iloc[skiprows:].reset_index(drop=True).astype(object)
+        extras_df = extras_df.where(extras_df.notna(), None)
+
+    return data, extras_df
+
+
+# ============================================================
+# 8️⃣ Extras (additional_fields) built column-wise
+# ============================================================
+# Extra columns of a sheet travel through the join as plain columns __extra_<sheet_no>__<alias>, with
+# a marker column __extra_<sheet_no>__ which is null where the sheet had no matching row. After the
+# join they are merged key by key (sheet joined later wins for rows it matched, as dict.update did)
+# with vectorised selects, rows are then encoded with orjson. Values are encoded as
+# json.dumps(default=str) did, except NaN which becomes null (jsonb rejects NaN).
+
+EXTRA_COLUMN_PREFIX = "__extra_"
+_EXTRA_MARKER = re.compile(r"^__extra_(\d+)__$")
+_MISSING = object()   # key not in row, sheet had no matching row
+
+
+def _extra_marker(sheet_no):
+    return f"{EXTRA_COLUMN_PREFIX}{sheet_no}__"
+
+
+def attach_extra_columns(df, extras_df, sheet_no):
+    """
+    Adds extras of a sheet to df as marker & value columns, extras_df rows are aligned with df.
+    """
+    # repeated alias kept last value, as row dict did
+    extras_df = extras_df.loc[:, ~extras_df.columns.duplicated(keep="last")]
+    marker = _extra_marker(sheet_no)
+    columns = {marker: np.ones(len(df), dtype=bool)}
+    for alias in extras_df.columns:
+        columns[f"{marker}{alias}"] = extras_df[alias].to_numpy(dtype=object)
+    return pd.concat([df, pd.DataFrame(columns, index=df.index)], axis=1)
+
+
+def _dump_json(obj) -> str:
+    try:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_PASSTHROUGH_DATETIME).decode("utf-8")
+    except orjson.JSONEncodeError:
+        # e.g. integers beyond 64 bit
+        return json.dumps(obj, ensure_ascii=False, default=str)
+
+
+def build_extra_json(df):
+    """
+    Merges extra columns of all sheets into one JSON text column.
+
+    Returns:
+        Tuple (Series of JSON text, internal extra columns to drop), (None, []) when df has no extras.
+    """
+    markers = [c for c in df.columns if isinstance(c, str) and _EXTRA_MARKER.match(c)]
+    if not markers:
+        return None, []
+
+    # key -> [(rows sheet matched, values)] in join order
+    sources = {}
+    internal_columns = list(markers)
+    for marker in markers:
+        present = df[marker].notna().to_numpy()
+        for col in df.columns:
+            if isinstance(col, str) and col.startswith(marker) and col != marker:
+                sources.setdefault(col[len(marker):], []).append((present, df[col].to_numpy(dtype=object)))
+                internal_columns.append(col)
+
+    keys = list(sources)
+    columns = []
+    all_present = True
+    for key in keys:
+        values = np.full(len(df), _MISSING, dtype=object)
+        present = np.zeros(len(df), dtype=bool)
+        for sheet_present, sheet_values in sources[key]:
+            values = np.where(sheet_present, sheet_values, values)
+            present |= sheet_present
+        all_present = all_present and present.all()
+        columns.append(values)
+
+    if not keys:
+        rows = ["{}"] * len(df)
+    elif all_present:
+        rows = [_dump_json(dict(zip(keys, row))) for row in zip(*columns)]
+    else:
+        rows = [_dump_json({k: v for k, v in zip(keys, row) if v is not _MISSING}) for row in zip(*columns)]
+    return pd.Series(rows, index=df.index, dtype=object), internal_columns
+
+
+# ============================================================
+# 9️⃣ Chunked pipeline: read -> clean -> map -> COPY
+# ============================================================
+# Base sheet (left side of relations) is streamed in chunks of PIPELINE_CHUNK_ROWS rows, each chunk is
+# cleaned, joined to the lookup sheets, mapped and COPYed while the next ones are being read, with
+# bounded queues in between (services/ingest_pipeline.py). Lookup sheets (right side of relations) are
+# parsed whole in worker processes meanwhile (up front without workers), first chunk waits for them as
+# every chunk joins to all of them. All chunks are copied in one transaction, so a failed or cancelled
+# upload leaves no rows behind.
+# Used for Excel sources whose relations are left / inner joins, right / outer joins need the whole base
+# sheet. Streamed base sheet is not stored in parse cache, lookup sheets are.
+
+def pipeline_base_sheet(mapping_config):
+    """Sheet streamed in chunks, left side of first relation, or first sheet without relations."""
+    relations = mapping_config.get("relations") or []
+    return relations[0]["left"] if relations else next(iter(mapping_config["sheets"]))
+
+
+def pipeline_supported(mapping_config) -> bool:
+    """
+    True when upload can run through stream_mapped_upload with the same result as fn_read_excel_map_base.
+    """
+    sheets = mapping_config.get("sheets") or {}
+    if not sheets:
+        return False
+    if any(cfg.get("source_format") == "csv" for cfg in sheets.values()):
+        return False
+    base_sheet = pipeline_base_sheet(mapping_config)
+    for rel in mapping_config.get("relations") or []:
+        if rel.get("how", "left") not in ("left", "inner") or rel["right"] == base_sheet:
+            return False
+    return True
+
+
+def _read_base_chunks(excel_file, sheet_no, spec, chunk_rows):
+    wb = load_workbook(workbook_source(excel_file), read_only=True, data_only=True)
+    try:
+        sheet_name = wb.sheetnames[sheet_no - 1]
+        print(f"➡️ Streaming sheet {sheet_no}: {sheet_name}")
+        yield from iter_sheet_chunks(
+            wb[sheet_name],
+            header=spec["header"],
+            skiprows=spec["skip_rows"],
+            usecols=spec["usecols"],
+            extra=spec["extra"],
+            chunk_rows=chunk_rows,
+        )
+    finally:
+        wb.close()
+
+
+def stream_mapped_upload(excel_file, mapping_config, column_mapping, data_id, db_engine, table_name,
+                         replace_existing=False, file_hash=None, on_chunk=None,
+                         chunk_rows=PIPELINE_CHUNK_ROWS, queue_chunks=PIPELINE_QUEUE_CHUNKS):
+    """
+    Reads, maps and loads an upload chunk by chunk, see pipeline_supported for when it applies.
+
+    Args:
+        excel_file: Path of retained upload, or file content in bytes.
+        mapping_config, column_mapping: As for fn_read_excel_map_base & upload_to_postgres.
+        data_id: Dataset id, mapped from data_id column.
+        replace_existing: Delete rows of dataset in the same transaction as the load.
+        on_chunk: Optional callback(rows_copied) after each chunk, runs in calling thread, may raise to stop.
+
+    Returns:
+        Dict {"inserted", "total", "rejected_values", "join_stats", "pipeline_metrics"}
+    Raises:
+        ValueError when file has no data rows, or error of any stage.
+    """
+    start_time = datetime.now()
+    base_sheet = pipeline_base_sheet(mapping_config)
+    base_cfg = mapping_config["sheets"][base_sheet]
+    base_alias = sheet_alias_of(mapping_config, base_sheet)
+    base_spec = build_sheet_spec(base_cfg)
+
+    # === Lookup sheets, parsed whole (parse cache / worker processes) while base sheet streams ===
+    lookup_config = {no: cfg for no, cfg in mapping_config["sheets"].items() if no != base_sheet}
+    state = {"relations": None, "lookup_seconds": None, "columns": None, "conn": None, "cursor": None, "inserted": 0}
+
+    def parse_lookups(in_workers):
+        lookups = parse_mapped_sheets(excel_file, lookup_config, file_hash, in_workers)
+        state["lookup_seconds"] = round((datetime.now() - start_time).total_seconds(), 3)
+        print(f"✅ Lookup sheets read in {state['lookup_seconds']}s")
+        return lookups
+
+    lookup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline-lookup")
+    if SHEET_PARSE_WORKERS > 1:
+        lookup_future = lookup_executor.submit(parse_lookups, True)
+    else:
+        # no worker processes, parsing in a thread here would only compete with reading base sheet
+        lookup_future = Future()
+        lookup_future.set_result(parse_lookups(False))
+
+    column_types = _copy_column_types(db_engine, table_name)
+    base_rejected = {}
+    join_totals = []
+
+    # === clean: mapping config of base sheet, per chunk ===
+    def clean(chunk):
+        df, extras_df = chunk
+        df, rejected = map_sheet_frame(df, extras_df, base_sheet, base_cfg, base_spec)
+        for col, count in rejected.items():
+            base_rejected[col] = base_rejected.get(col, 0) + count
+        return df
+
+    # === map: join lookups, extras JSON, column mapping, CSV for COPY ===
+    def map_chunk(df):
+        if state["relations"] is None:
+            lookups = lookup_future.result()
+            dfs = {alias: sheet_df for alias, sheet_df, _ in lookups.values()}
+            # right sides are keyed once, join columns are resolved from first chunk
+            state["relations"] = [
+                (left_col, prepare_right(
+                    dfs[right_alias], right_col, how=rel.get("how", "left"),
+                    on_duplicate=rel.get("on_duplicate"), label=f"{left_alias} -> {right_alias}",
+                ))
+                for rel, left_alias, right_alias, left_col, right_col
+                in resolve_relations(mapping_config, {**dfs, base_alias: df})
+            ]
+            join_totals.extend([None] * len(state["relations"]))
+        for idx, (left_col, prepared) in enumerate(state["relations"]):
+            df, stats = join_prepared(df, left_col, prepared)
+            join_totals[idx] = combine_join_stats(join_totals[idx], stats)
+
+        extra_json, extra_columns = build_extra_json(df)
+        if extra_json is not None:
+            df = df.drop(columns=extra_columns)
+            df["extra_data_json"] = extra_json
+        df["data_id"] = str(data_id)
+
+        df_to_upload = apply_column_mapping(df, column_mapping)
+        if state["columns"] is None:
+            state["columns"] = list(df_to_upload.columns)
+        df_to_upload = _coerce_for_copy(df_to_upload.reindex(columns=state["columns"]), db_engine, table_name, column_types)
+        return len(df_to_upload), _csv_buffer(df_to_upload)
+
+    # === copy: one transaction for all chunks ===
+    def copy_chunk(chunk):
+        rows, buffer = chunk
+        with buffer:
+            if state["conn"] is None:
+                state["conn"] = db_engine.raw_connection()
+                state["cursor"] = state["conn"].cursor()
+                if replace_existing:
+                    # one merge per dataset at a time, same lock as delta merge
+                    state["cursor"].execute("SELECT id FROM datasets WHERE id = %s FOR UPDATE", (str(data_id),))
+                    delete_sql = pg_sql.SQL("DELETE FROM {} WHERE dataset_id = %s").format(pg_sql.Identifier(table_name))
+                    state["cursor"].execute(delete_sql, (str(data_id),))
+                    print(f"🔁 Replacing {state['cursor'].rowcount} existing rows of {table_name}")
+            if rows:
+                state["inserted"] += _copy_from_buffer(state["cursor"], buffer, table_name, state["columns"])
+        if on_chunk is not None:
+            on_chunk(state["inserted"])
+
+    try:
+        metrics = run_pipeline(
+            ("read", _read_base_chunks(excel_file, base_sheet, base_spec, chunk_rows)),
+            [("clean", clean), ("map", map_chunk)],
+            ("copy", copy_chunk),
+            queue_chunks=queue_chunks,
+        )
+        if not state["inserted"]:
+            raise ValueError("No data to upload")
+        state["conn"].commit()
+    except BaseException:
+        if state["conn"] is not None:
+            state["conn"].rollback()
+        raise
+    finally:
+        if state["conn"] is not None:
+            state["conn"].close()
+        lookup_executor.shutdown(wait=False)
+
+    metrics["chunk_rows"] = chunk_rows
+    metrics["lookup_seconds"] = state["lookup_seconds"]
+    for stage in metrics["stages"]:
+        print(f"📊 Pipeline stage {stage['stage']}: {stage['rows_out']} rows in {stage['chunks']} chunks, "
+              f"busy {stage['busy_seconds']}s, waited {stage['wait_input_seconds']}s in / "
+              f"{stage['wait_output_seconds']}s out, {stage['rows_per_second']} rows/s")
+
+    lookups = lookup_future.result()
+    rejected_values = {}
+    for sheet_no in mapping_config["sheets"]:
+        if sheet_no == base_sheet:
+            rejected = base_rejected
+            alias = base_alias
+        else:
+            alias, _, rejected = lookups[sheet_no]
+        if rejected:
+            rejected_values[alias] = rejected
+            print(f"🧹 Rejected values in sheet {alias}: {rejected}")
+
+    print(f"✅ Completed pipelined read & load in {datetime.now() - start_time}")
+    return {
+        "inserted": state["inserted"],
+        "total": state["inserted"],
+        "rejected_values": rejected_values,
+        "join_stats": join_totals,
+        "pipeline_metrics": metrics,
+    }
+
 
 def safe_serialize(val):
     if val is None or pd.isna(val):
@@ -607,18 +1547,7 @@ def clean_invalid_dates(df, datetime_columns):
     """
     for col in datetime_columns:
         if col in df.columns:
-            def safe_parse_date(val):
-                if pd.isna(val) or val is None:
-                    return None
-                if isinstance(val, (datetime, pd.Timestamp)):
-                    return val
-                try:
-                    # Try parsing common date formats
-                    return pd.to_datetime(val, errors='raise')
-                except Exception:
-                    return None  # Invalid date string (like "Pending", "NA", etc.)
-
-            df[col] = df[col].apply(safe_parse_date)
+            df[col] = coerce_dates(df[col])
     return df
 
 def clean_invalid_string(df,column):
@@ -629,17 +1558,7 @@ def clean_invalid_string(df,column):
             - Replaces invalid / NaN values with None
             - Ensures safe values for PostgreSQL insertion
             """
-    def safe_str(val):
-        try:
-            # Handle NaN, NaT, None etc.
-            if pd.isna(val):
-                return None
-            # Try converting to integer (works for numeric strings like "123")
-            return str(val)
-        except (ValueError, TypeError):
-            return None
-
-    df[column] = df[column].apply(safe_str)
+    df[column] = coerce_string(df[column])
     return df
 
 def clean_invalid_float(df,column):
@@ -650,17 +1569,7 @@ def clean_invalid_float(df,column):
         - Replaces invalid / non-numeric / NaN values with None
         - Ensures safe values for PostgreSQL insertion
         """
-    def safe_float(val):
-        try:
-            # Handle NaN, NaT, None etc.
-            if pd.isna(val):
-                return None
-            # Try converting to integer (works for numeric strings like "123")
-            return float(val)
-        except (ValueError, TypeError):
-            return None
-
-    df[column] = df[column].apply(safe_float)
+    df[column] = coerce_float(df[column])
     return df
 
 def clean_invalid_int(df, column):
@@ -671,16 +1580,5 @@ def clean_invalid_int(df, column):
     - Replaces invalid / non-numeric / NaN values with None
     - Ensures safe values for PostgreSQL insertion
     """
-    def safe_int(val):
-        try:
-            # Handle NaN, NaT, None etc.
-            if pd.isna(val):
-                return None
-            # Try converting to integer (works for numeric strings like "123")
-            return int(val)
-        except (ValueError, TypeError):
-            return None
-
-    df[column] = df[column].apply(safe_int)
+    df[column] = coerce_int(df[column])
     return df
-
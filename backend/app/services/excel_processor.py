@@ -1,25 +1,271 @@
-import pandas as pd
-import io
+# services/excel_processor.py
+# Bounded preview of uploaded workbook for mapping profile authoring.
+# Only first rows of every sheet are read, from a single archive open. openpyxl's read-only workbook
+# is not used here: it parses the whole shared strings table up front and scans a sheet fully to
+# find its size when the file has no <dimension>, both scale with file size. Sheet XML is streamed
+# with openpyxl's row parser and shared strings are parsed lazily, only as far as preview rows refer.
 
+import codecs
+import csv
+import datetime
+import zipfile
+from xml.etree.ElementTree import iterparse
 
-def read_excel_skip_blank_headers(excel_bytes, sheet_name, preview_rows=5):
-    # Step 1: Create ExcelFile for efficient access
-    excel_file = pd.ExcelFile(io.BytesIO(excel_bytes))
+from openpyxl.cell.text import Text
+from openpyxl.reader.excel import ExcelReader
+from openpyxl.utils.exceptions import InvalidFileException
+from openpyxl.styles.stylesheet import apply_stylesheet
+from openpyxl.worksheet._reader import WorkSheetParser
+from openpyxl.xml.constants import SHARED_STRINGS, SHEET_MAIN_NS
 
-    # Step 2: Read first few rows only to detect header row
-    preview = pd.read_excel(excel_file, sheet_name=sheet_name, nrows=preview_rows, header=None)
+PREVIEW_ROWS = 20
+PREVIEW_MAX_ROWS = 200
+PREVIEW_SAMPLE_VALUES = 5
 
-    header_row = None
-    for i, row in preview.iterrows():
-        # If this row has at least 1 non-empty cell, treat it as header
-        if row.notna().sum() > 0:
-            header_row = i
+# share of widest row a row must fill to be taken as header
+HEADER_MIN_FILL = 0.5
+
+_SHARED_STRING_TAG = "{%s}si" % SHEET_MAIN_NS
+
+
+class PreviewError(ValueError):
+    """Raised when file can not be previewed, api layer returns 400."""
+
+
+# ==========================================================
+#  Workbook streaming
+# ==========================================================
+
+class _LazySharedStrings:
+    """
+    Shared strings table parsed on demand up to highest index asked for. Strings are stored in
+    order of first use, so first rows of a sheet mostly refer to the start of the table.
+    """
+
+    def __init__(self, archive, path):
+        self._strings = []
+        self._source = self._parse(archive, path) if path else iter(())
+
+    @staticmethod
+    def _parse(archive, path):
+        with archive.open(path) as src:
+            for _, node in iterparse(src):
+                if node.tag == _SHARED_STRING_TAG:
+                    text = Text.from_tree(node).content.replace("x005F_", "")
+                    node.clear()
+                    yield text
+
+    def __getitem__(self, idx):
+        while len(self._strings) <= idx:
+            try:
+                self._strings.append(next(self._source))
+            except StopIteration:
+                raise IndexError(idx)
+        return self._strings[idx]
+
+
+def _row_values(cells):
+    values = {}
+    for cell in cells:
+        values[cell["column"] - 1] = cell["value"]
+    width = max(values) + 1 if values else 0
+    return tuple(values.get(i) for i in range(width))
+
+
+def stream_workbook_rows(file_content, max_rows):
+    """
+    Yields (sheet_no, sheet_name, rows) for every sheet, rows is a list of up to max_rows value tuples.
+    Blank rows are not counted, as in stream_sheet_rows of mapped upload.
+
+    Raises:
+        PreviewError when file is not an xlsx workbook.
+    """
+    try:
+        reader = ExcelReader(file_content, read_only=True, data_only=True)
+        reader.read_manifest()
+        reader.read_workbook()
+        apply_stylesheet(reader.archive, reader.wb)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, ValueError) as e:
+        raise PreviewError(f"Could not open workbook, only xlsx files can be previewed: {e}")
+
+    wb = reader.wb
+    try:
+        strings_part = reader.package.find(SHARED_STRINGS)
+        shared_strings = _LazySharedStrings(reader.archive, strings_part.PartName[1:] if strings_part else None)
+
+        for sheet_no, (sheet, rel) in enumerate(reader.parser.find_sheets(), start=1):
+            if rel.target not in reader.valid_files or "chartsheet" in rel.Type:
+                yield sheet_no, sheet.name, []
+                continue
+
+            rows = []
+            with reader.archive.open(rel.target) as src:
+                parser = WorkSheetParser(
+                    src, shared_strings, data_only=True, epoch=wb.epoch,
+                    date_formats=wb._date_formats, timedelta_formats=wb._timedelta_formats,
+                )
+                for _, cells in parser.parse():
+                    values = _row_values(cells)
+                    if all(v is None or str(v).strip() == "" for v in values):
+                        continue
+                    rows.append(values)
+                    if len(rows) >= max_rows:
+                        break   # rest of sheet is never decompressed
+            yield sheet_no, sheet.name, rows
+    finally:
+        reader.archive.close()
+
+
+def stream_csv_rows(file_content, max_rows, delimiter=",", encoding="utf-8"):
+    """
+    Reads first max_rows non-blank rows of a CSV file object, file is read only as far as needed.
+    """
+    text = codecs.getreader(encoding)(file_content, errors="replace")
+    rows = []
+    for row in csv.reader(text, delimiter=delimiter):
+        values = tuple(v if v.strip() != "" else None for v in row)
+        if all(v is None for v in values):
+            continue
+        rows.append(values)
+        if len(rows) >= max_rows:
             break
+    return rows
+
+
+# ==========================================================
+#  Header & type detection
+# ==========================================================
+
+def _value_type(value):
+    if isinstance(value, bool):
+        return "string"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "int" if value.is_integer() else "float"
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return "dt"
+    text = str(value).strip()
+    for cast, name in ((int, "int"), (float, "float")):
+        try:
+            cast(text.replace(",", ""))
+            return name
+        except ValueError:
+            pass
+    for fmt in ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d %H:%M:%S", "%d-%b-%Y", "%d-%b-%y"):
+        try:
+            datetime.datetime.strptime(text, fmt)
+            return "dt"
+        except ValueError:
+            pass
+    return "string"
+
+
+def _filled(row):
+    return sum(1 for v in row if v is not None and str(v).strip() != "")
+
+
+def _is_text_row(row):
+    # CSV cells are all str, numbers & dates written as text do not count as text
+    return all(_value_type(v) == "string" for v in row if v is not None and str(v).strip() != "")
+
+
+def detect_header_row(rows):
+    """
+    Returns index (among non-blank rows) of header row, -1 when sheet looks header-less.
+    Header is first row filling most of the sheet width with text only, title rows above it are skipped.
+    """
+    if not rows:
+        return -1
+    widest = max(_filled(r) for r in rows)
+    for idx, row in enumerate(rows):
+        if _filled(row) < widest * HEADER_MIN_FILL:
+            continue
+        if _is_text_row(row):
+            # a text only row followed by text only rows is data of a text sheet, not a header
+            following = rows[idx + 1:idx + 4]
+            if following and all(_is_text_row(r) for r in following):
+                return -1
+            return idx
+        return -1
+    return -1
+
+
+def infer_column_type(values):
+    """
+    Suggested cleanup type of a column (dt / int / float / string) from sample values, None when empty.
+    """
+    types = {_value_type(v) for v in values if v is not None and str(v).strip() != ""}
+    if not types:
+        return None
+    if types == {"int", "float"}:
+        return "float"
+    return types.pop() if len(types) == 1 else "string"
+
+
+def _json_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    return value
+
+
+def build_sheet_preview(sheet_no, sheet_name, rows, preview_rows):
+    header_row = detect_header_row(rows)
+    header = rows[header_row] if header_row >= 0 else ()
+    data = rows[header_row + 1:] if header_row >= 0 else rows
+    width = max([len(r) for r in rows] or [0])
+
+    columns = []
+    for i in range(width):
+        values = [r[i] if i < len(r) else None for r in data]
+        name = header[i] if i < len(header) else None
+        samples = list(dict.fromkeys(_json_value(v) for v in values if v is not None))
+        columns.append({
+            "index": i,
+            "name": str(name).strip() if name is not None else None,
+            "inferred_type": infer_column_type(values),
+            "samples": samples[:PREVIEW_SAMPLE_VALUES],
+        })
+
+    return {
+        "sheet_no": sheet_no,
+        "sheet_name": sheet_name,
+        "header_row": header_row,
+        "columns": columns,
+        "rows": [[_json_value(v) for v in r] for r in rows[:preview_rows]],
+    }
+
+
+def preview_file(file_content, file_name, preview_rows=PREVIEW_ROWS, delimiter=",", encoding="utf-8"):
+    """
+    Bounded preview of an xlsx or csv file for profile authoring.
+
+    Args:
+        file_content: Seekable binary file object.
+        file_name: Name of upload, extension decides how it is read.
+        preview_rows: Non-blank rows read per sheet, header detection uses the same rows.
 
-    # Default to first row if all are blank
-    header_row = header_row if header_row is not None else 0
+    Returns:
+        Dict {"file_name", "source_format", "sheets": [...]}, each sheet has header_row (index among
+        non-blank rows as in mapping profile, -1 for header-less), columns with inferred type and sample
+        values, and the rows read.
+    """
+    preview_rows = max(1, min(int(preview_rows), PREVIEW_MAX_ROWS))
+    extension = (file_name or "").rsplit(".", 1)[-1].lower()
 
-    # Step 3: Re-read the sheet using that header row
-    df = pd.read_excel(excel_file, sheet_name=sheet_name, header=header_row)
+    if extension == "csv":
+        rows = stream_csv_rows(file_content, preview_rows, delimiter=delimiter, encoding=encoding)
+        sheets = [build_sheet_preview(1, file_name, rows, preview_rows)]
+        source_format = "csv"
+    elif extension in ("xlsx", "xlsm"):
+        sheets = [
+            build_sheet_preview(sheet_no, sheet_name, rows, preview_rows)
+            for sheet_no, sheet_name, rows in stream_workbook_rows(file_content, preview_rows)
+        ]
+        source_format = "excel"
+    else:
+        raise PreviewError("Unsupported file format for preview. Please upload a xlsx or csv file.")
 
-    return df
+    return {"file_name": file_name, "source_format": source_format, "sheets": sheets}
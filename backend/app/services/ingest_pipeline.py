@@ -0,0 +1,193 @@
+# services/ingest_pipeline.py
+# Chunked producer / consumer pipeline for ingestion.
+# Source and every stage run in their own thread, connected by bounded queues: a stage which can not
+# keep up blocks the ones before it (backpressure), so at most queue size chunks wait between two
+# stages and memory does not grow with file size. Sink runs in the calling thread. Time each stage
+# spends working, waiting for input and blocked on a full queue is measured for throughput metrics.
+
+import os
+import queue
+import threading
+import time
+
+PIPELINE_ENABLED = os.getenv("PIPELINE_ENABLED", "1") != "0"
+PIPELINE_CHUNK_ROWS = int(os.getenv("PIPELINE_CHUNK_ROWS", "50000"))
+PIPELINE_QUEUE_CHUNKS = int(os.getenv("PIPELINE_QUEUE_CHUNKS", "2"))
+
+# how often blocked threads look for abort of the pipeline
+_POLL_SECONDS = 0.2
+
+_END = object()
+
+
+class PipelineAborted(Exception):
+    """Raised inside stage threads once another stage failed, never leaves run_pipeline."""
+
+
+def chunk_rows(item) -> int:
+    """Rows in a chunk, chunks are frames or tuples with the frame (or row count) first."""
+    if isinstance(item, tuple):
+        item = item[0]
+    if isinstance(item, int):
+        return item
+    return len(item) if item is not None else 0
+
+
+class StageMetrics:
+    def __init__(self, name):
+        self.name = name
+        self.chunks = 0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.busy_seconds = 0.0
+        self.wait_input_seconds = 0.0
+        self.wait_output_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "stage": self.name,
+            "chunks": self.chunks,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "busy_seconds": round(self.busy_seconds, 3),
+            # waiting on previous stage, and blocked on full queue to next one (backpressure)
+            "wait_input_seconds": round(self.wait_input_seconds, 3),
+            "wait_output_seconds": round(self.wait_output_seconds, 3),
+            "rows_per_second": round(self.rows_out / self.busy_seconds, 1) if self.busy_seconds else None,
+        }
+
+
+def _put(q, item, abort, metrics):
+    start = time.perf_counter()
+    while True:
+        if abort.is_set():
+            raise PipelineAborted()
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            break
+        except queue.Full:
+            continue
+    metrics.wait_output_seconds += time.perf_counter() - start
+
+
+def _get(q, abort, metrics):
+    start = time.perf_counter()
+    while True:
+        if abort.is_set():
+            raise PipelineAborted()
+        try:
+            item = q.get(timeout=_POLL_SECONDS)
+            break
+        except queue.Empty:
+            continue
+    metrics.wait_input_seconds += time.perf_counter() - start
+    return item
+
+
+def run_pipeline(source, stages, sink, queue_chunks=PIPELINE_QUEUE_CHUNKS):
+    """
+    Runs chunks from source through stages into sink.
+
+    Args:
+        source: (name, iterable of chunks), iterated in its own thread.
+        stages: List of (name, fn), fn(chunk) returns chunk for next stage, each in its own thread.
+        sink: (name, fn), fn(chunk) is called in calling thread, e.g. to write to database.
+        queue_chunks: Chunks held between two stages at most.
+
+    Returns:
+        Dict {"elapsed_seconds", "queue_chunks", "stages": [metrics per stage in order]}
+    Raises:
+        First exception raised by source, a stage or sink, other threads are stopped first.
+    """
+    abort = threading.Event()
+    errors = []
+    queues = [queue.Queue(maxsize=max(1, queue_chunks)) for _ in range(len(stages) + 1)]
+    source_name, chunks = source
+    metrics = [StageMetrics(source_name)] + [StageMetrics(name) for name, _ in stages]
+    sink_name, sink_fn = sink
+    sink_metrics = StageMetrics(sink_name)
+
+    def produce():
+        m = metrics[0]
+        iterator = iter(chunks)
+        try:
+            while True:
+                start = time.perf_counter()
+                item = next(iterator, _END)
+                m.busy_seconds += time.perf_counter() - start
+                if item is _END:
+                    break
+                m.chunks += 1
+                m.rows_out += chunk_rows(item)
+                _put(queues[0], item, abort, m)
+            _put(queues[0], _END, abort, m)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            abort.set()
+        finally:
+            # generator sources release their file here when stopped early
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    def work(idx, fn):
+        m = metrics[idx + 1]
+        try:
+            while True:
+                item = _get(queues[idx], abort, m)
+                if item is _END:
+                    break
+                start = time.perf_counter()
+                m.rows_in += chunk_rows(item)
+                out = fn(item)
+                m.busy_seconds += time.perf_counter() - start
+                m.chunks += 1
+                m.rows_out += chunk_rows(out)
+                _put(queues[idx + 1], out, abort, m)
+            _put(queues[idx + 1], _END, abort, m)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            abort.set()
+
+    threads = [threading.Thread(target=produce, name=f"pipeline-{source_name}", daemon=True)]
+    threads += [
+        threading.Thread(target=work, args=(idx, fn), name=f"pipeline-{name}", daemon=True)
+        for idx, (name, fn) in enumerate(stages)
+    ]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    try:
+        while True:
+            item = _get(queues[-1], abort, sink_metrics)
+            if item is _END:
+                break
+            start = time.perf_counter()
+            sink_metrics.rows_in += chunk_rows(item)
+            sink_fn(item)
+            sink_metrics.busy_seconds += time.perf_counter() - start
+            sink_metrics.chunks += 1
+            sink_metrics.rows_out += chunk_rows(item)
+    except PipelineAborted:
+        pass
+    except BaseException as e:
+        errors.append(e)
+    finally:
+        if errors:
+            abort.set()
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+
+    return {
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "queue_chunks": queue_chunks,
+        "stages": [m.as_dict() for m in metrics + [sink_metrics]],
+    }
@@ -0,0 +1,460 @@
+# services/ingestion_jobs.py
+# Background ingestion of mapped uploads and reprocess, request only validates & queues, worker threads
+# do the parse -> load stages and record progress in ingestion_jobs table.
+
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.curd.crud_loan_records import create_loan_records
+from app.models import models
+from app.models.ingestion_job import IngestionJob
+from app.services.artifact_store import release_artifact
+from app.services.excel_mapped_upload import fn_read_excel_map_base, upload_to_postgres, pipeline_supported, stream_mapped_upload
+from app.services.ingest_pipeline import PIPELINE_ENABLED
+from app.services.mapping_config_builder import get_full_profile_config
+from app.services.summary_cache import bump_dataset_version
+from app.services.dataset_cube import build_dataset_cube
+from app.services.upload_spool import track_peak_memory
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+
+_executor = ThreadPoolExecutor(max_workers=INGESTION_WORKERS, thread_name_prefix="ingestion")
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class IngestionCancelled(Exception):
+    """Raised between stages once cancellation is requested for the job."""
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+# ==========================================================
+#  Job creation / lookup / cancel (used by api layer)
+# ==========================================================
+
+def create_job(db: Session, dataset: models.Dataset, user_id, job_type: str = "upload_mapped") -> IngestionJob:
+    """
+    Queues a job of dataset.
+
+    Raises:
+        ValueError when dataset already has a queued or running job, two jobs writing one dataset at
+        once would leave rows of both.
+    """
+    active = (
+        db.query(IngestionJob.id)
+        .filter(IngestionJob.dataset_id == dataset.id, IngestionJob.status.notin_(FINISHED_STATUSES))
+        .first()
+    )
+    if active:
+        raise ValueError(f"Dataset already has ingestion job {active.id} in progress.")
+
+    job = IngestionJob(
+        dataset_id=dataset.id,
+        user_id=user_id,
+        job_type=job_type,
+        status="queued",
+        stage="queued",
+        rows_processed=0,
+        stage_timings={},
+    )
+    db.add(job)
+    dataset.status = "queued"
+    try:
+        db.commit()
+    except IntegrityError:
+        # job of same dataset submitted meanwhile, unique index on active jobs
+        db.rollback()
+        raise ValueError("Dataset already has an ingestion job in progress.")
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id) -> IngestionJob:
+    return db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+
+
+def get_jobs_for_dataset(db: Session, dataset_id):
+    return (
+        db.query(IngestionJob)
+        .filter(IngestionJob.dataset_id == dataset_id)
+        .order_by(IngestionJob.created_at.desc())
+        .all()
+    )
+
+
+def request_cancel(db: Session, job: IngestionJob) -> IngestionJob:
+    """
+    Flags the job for cancellation. Queued job is cancelled right away, running job stops
+    before its next stage, or next chunk when pipelined (rows are only committed by the final load stage).
+    """
+    if job.status in FINISHED_STATUSES:
+        return job
+
+    job.cancel_requested = True
+    db.commit()
+
+    # claim queued job so worker skips it
+    claimed = (
+        db.query(IngestionJob)
+        .filter(IngestionJob.id == job.id, IngestionJob.status == "queued")
+        .update({"status": "cancelled", "stage": "cancelled", "finished_at": _now()}, synchronize_session=False)
+    )
+    if claimed:
+        dataset = db.query(models.Dataset).filter(models.Dataset.id == job.dataset_id).first()
+        if dataset:
+            dataset.status = "cancelled"
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def submit_mapped_upload(db: Session, dataset: models.Dataset, user_id, file_path, mapping_config, column_mapping) -> IngestionJob:
+    """
+    Queues parse & load of a retained upload.
+    """
+    job = create_job(db, dataset, user_id, job_type="upload_mapped")
+    _executor.submit(run_mapped_upload_job, job.id, file_path, mapping_config, column_mapping)
+    print(f"📥 Queued ingestion job {job.id} for dataset {dataset.id}")
+    return job
+
+
+# ==========================================================
+#  Worker side
+# ==========================================================
+
+def _claim_job(db: Session, job_id) -> bool:
+    claimed = (
+        db.query(IngestionJob)
+        .filter(IngestionJob.id == job_id, IngestionJob.status == "queued")
+        .update({"status": "running", "started_at": _now()}, synchronize_session=False)
+    )
+    db.commit()
+    return claimed == 1
+
+
+@contextmanager
+def _stage(db: Session, job: IngestionJob, name: str):
+    """Checks cancellation, marks the stage on the job and records time spent in it."""
+    db.refresh(job)
+    if job.cancel_requested:
+        raise IngestionCancelled()
+
+    job.stage = name
+    db.commit()
+
+    stage_start = time.perf_counter()
+    yield
+    elapsed = round(time.perf_counter() - stage_start, 3)
+
+    # JSONB column is not mutation tracked, assign new dict
+    job.stage_timings = {**(job.stage_timings or {}), name: elapsed}
+    db.commit()
+    print(f"⏱️ Job {job.id} stage {name} completed in {elapsed}s")
+
+
+def _finish_job(db: Session, job: IngestionJob, dataset: models.Dataset, job_status: str, dataset_status: str, error: str = None):
+    job.status = job_status
+    job.stage = "done" if job_status == "completed" else job_status
+    job.finished_at = _now()
+    if error:
+        job.error = error
+    if dataset is not None:
+        dataset.status = dataset_status
+        # records may have changed, cached bucket summaries of dataset are not used any more
+        bump_dataset_version(db, dataset.id)
+        if error:
+            dataset.description = f"{dataset.description} (Error: {error[:100]}...)"
+    db.commit()
+
+
+def fail_unfinished_jobs(db: Session) -> int:
+    """
+    Fails jobs left queued or running by a restart or crashed worker and sets their datasets to error.
+    Jobs run on threads of the api process and none outlives it, call once at startup.
+    """
+    jobs = db.query(IngestionJob).filter(IngestionJob.status.notin_(FINISHED_STATUSES)).all()
+    for job in jobs:
+        dataset = db.query(models.Dataset).filter(models.Dataset.id == job.dataset_id).first()
+        _finish_job(db, job, dataset, "failed", "error", error="Interrupted by server restart")
+    if jobs:
+        print(f"⚠️ Failed {len(jobs)} ingestion jobs interrupted by restart")
+    return len(jobs)
+
+
+def _build_cube(db: Session, dataset: models.Dataset):
+    # bucket summaries are re-bucketed from the cube, job stays completed if building it fails
+    try:
+        build_dataset_cube(db, dataset.id)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Could not build cube of dataset {dataset.id}: {e}")
+
+
+def _run_job(job_id, work, cleanup=None):
+    """
+    Common job runner, work(db, job, dataset) runs the stages. Handles claim, status of job &
+    dataset, cancellation and errors. cleanup(db) runs last, also when job is skipped or fails.
+    """
+    db = SessionLocal()
+    job = None
+    dataset = None
+    try:
+        if not _claim_job(db, job_id):
+            print(f"Ingestion job {job_id} is no longer queued, skipping")
+            return
+
+        job = get_job(db, job_id)
+        dataset = db.query(models.Dataset).filter(models.Dataset.id == job.dataset_id).first()
+        dataset.status = "processing"
+        db.commit()
+
+        with track_peak_memory() as mem:
+            work(db, job, dataset)
+        job.peak_memory_bytes = mem.peak_bytes
+
+        _finish_job(db, job, dataset, "completed", "uploaded")
+        print(f'> Data successfully processed and uploaded count {job.rows_processed} / {job.total_rows}, memory {mem}')
+        _build_cube(db, dataset)
+
+    except IngestionCancelled:
+        db.rollback()
+        print(f"🛑 Ingestion job {job_id} cancelled")
+        _finish_job(db, job, dataset, "cancelled", "cancelled")
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Ingestion job {job_id} failed: {e}")
+        traceback.print_exc()
+        if job is not None:
+            try:
+                _finish_job(db, job, dataset, "failed", "error", error=str(e))
+            except Exception as status_error:
+                db.rollback()
+                print(f"Error updating job status: {status_error}")
+    finally:
+        if cleanup is not None:
+            try:
+                cleanup(db)
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️ Cleanup of ingestion job {job_id} failed: {e}")
+        db.close()
+
+
+def _pipelined_stages(file_path, mapping_config, column_mapping, replace_existing=False):
+    def work(db: Session, job: IngestionJob, dataset: models.Dataset):
+        def on_chunk(rows_copied):
+            db.refresh(job)
+            if job.cancel_requested:
+                raise IngestionCancelled()
+            job.rows_processed = rows_copied
+            db.commit()
+
+        # parse & load overlap, chunks flow through read -> clean -> map -> copy
+        with _stage(db, job, "streaming"):
+            result = stream_mapped_upload(
+                file_path,
+                mapping_config,
+                column_mapping,
+                dataset.id,
+                db_engine=db.bind,
+                table_name="loan_records",
+                replace_existing=replace_existing,
+                file_hash=dataset.file_sha256,
+                on_chunk=on_chunk,
+            )
+            job.total_rows = result["total"]
+            job.rows_processed = result["inserted"]
+            job.rejected_values = result["rejected_values"] or None
+            job.join_stats = result["join_stats"] or None
+            job.pipeline_metrics = result["pipeline_metrics"]
+            dataset.total_records = result["inserted"]
+    return work
+
+
+def _mapped_stages(file_path, mapping_config, column_mapping, replace_existing=False, upsert_key=None, delete_missing=True):
+    # delta upsert compares whole file with dataset, it is not chunked
+    if PIPELINE_ENABLED and upsert_key is None and pipeline_supported(mapping_config):
+        return _pipelined_stages(file_path, mapping_config, column_mapping, replace_existing)
+
+    def work(db: Session, job: IngestionJob, dataset: models.Dataset):
+        with _stage(db, job, "parsing"):
+            merged_df = fn_read_excel_map_base(file_path, mapping_config, file_hash=dataset.file_sha256)
+            if merged_df is None:
+                raise ValueError("Failed to read Excel file.")
+            job.total_rows = len(merged_df)
+            job.rejected_values = merged_df.attrs.get("rejected_values") or None
+            job.join_stats = merged_df.attrs.get("join_stats") or None
+
+        with _stage(db, job, "loading"):
+            upload_result = upload_to_postgres(
+                dataset.id,
+                merged_df,
+                db_engine=db.bind,
+                table_name="loan_records",
+                column_mapping=column_mapping,
+                truncate_before_insert=False,
+                replace_existing=replace_existing,
+                upsert_key=upsert_key,
+                delete_missing=delete_missing,
+            )
+            if not upload_result["status"]:
+                raise RuntimeError(upload_result.get("message") or "Failed to insert excel data into the database.")
+            job.rows_processed = upload_result["inserted"]
+            changes = upload_result.get("changes")
+            if changes:
+                job.change_summary = changes
+                dataset.total_records = changes["total"]
+            else:
+                dataset.total_records = upload_result["inserted"]
+    return work
+
+
+def run_mapped_upload_job(job_id, file_path, mapping_config, column_mapping):
+    _run_job(job_id, _mapped_stages(file_path, mapping_config, column_mapping))
+
+
+# ==========================================================
+#  Reprocess from retained artifact
+# ==========================================================
+
+def _profile_config(db: Session, mapping_profile_id):
+    config = get_full_profile_config(db, mapping_profile_id)
+    if not config or not config["mapping_config"] or not config["database_config"]:
+        raise ValueError(f"Mapping profile {mapping_profile_id} not found or has no column config.")
+    return config
+
+
+def read_raw_records(file_path):
+    """
+    Reads file the way legacy /upload does, first sheet of Excel or CSV, as list of row dicts.
+    """
+    if file_path.lower().endswith(".csv"):
+        # Try different encodings if utf-8 fails
+        try:
+            df = pd.read_csv(file_path, encoding='utf-8')
+        except UnicodeDecodeError:
+            try:
+                df = pd.read_csv(file_path, encoding='latin-1')
+            except:
+                df = pd.read_csv(file_path, encoding='cp1252')
+    else:
+        df = pd.read_excel(file_path)
+
+    # Replace NaN/NA values with None for JSON serialization
+    df = df.replace({pd.NA: None, pd.NaT: None, np.nan: None})
+    return df.to_dict('records')
+
+
+def _legacy_stages(file_path):
+    def work(db: Session, job: IngestionJob, dataset: models.Dataset):
+        with _stage(db, job, "parsing"):
+            records = read_raw_records(file_path)
+            job.total_rows = len(records)
+
+        with _stage(db, job, "loading"):
+            created_records = create_loan_records(db, records, dataset.id, replace_existing=True)
+            if records and not created_records:
+                raise RuntimeError("Failed to create loan records.")
+            job.rows_processed = len(created_records)
+            dataset.total_records = len(created_records)
+    return work
+
+
+def submit_reprocess(db: Session, dataset: models.Dataset, user_id) -> IngestionJob:
+    """
+    Queues reprocess of dataset from its retained upload. Datasets loaded with a mapping profile
+    re-run the mapped pipeline (parse cache is hit for unchanged profile), others the legacy path.
+    New rows replace old ones in one transaction.
+
+    Raises:
+        ValueError when dataset has no retained upload or its mapping profile is gone.
+    """
+    if not dataset.artifact_path or not os.path.exists(dataset.artifact_path):
+        raise ValueError("Original upload is not retained for this dataset, please upload the file again.")
+
+    if dataset.mapping_profile_id is not None:
+        config = _profile_config(db, dataset.mapping_profile_id)
+        work = _mapped_stages(dataset.artifact_path, config["mapping_config"], config["database_config"], replace_existing=True)
+    else:
+        work = _legacy_stages(dataset.artifact_path)
+
+    job = create_job(db, dataset, user_id, job_type="reprocess")
+    _executor.submit(_run_job, job.id, work)
+    print(f"📥 Queued reprocess job {job.id} for dataset {dataset.id}")
+    return job
+
+
+# ==========================================================
+#  Delta upload into existing dataset
+# ==========================================================
+
+DELTA_UPSERT_KEY = "agreement_no"
+
+
+def _mapped_targets(column_mapping):
+    targets = set()
+    for target in column_mapping.values():
+        targets.update(target if isinstance(target, list) else [target])
+    return targets
+
+
+def _delta_stages(file_path, file_hash, mapping_config, column_mapping, delete_missing):
+    load = _mapped_stages(file_path, mapping_config, column_mapping, upsert_key=DELTA_UPSERT_KEY, delete_missing=delete_missing)
+
+    def work(db: Session, job: IngestionJob, dataset: models.Dataset):
+        load(db, job, dataset)
+
+        # dataset now reflects the new file, reprocess runs from it
+        previous_artifact = dataset.artifact_path
+        dataset.artifact_path = file_path
+        dataset.file_sha256 = file_hash
+        db.commit()
+        if previous_artifact != file_path:
+            release_artifact(db, previous_artifact)
+    return work
+
+
+def _release_delta_upload(file_path):
+    def cleanup(db: Session):
+        # drops the upload's pin, file is kept when the job committed it to the dataset, otherwise
+        # (failed, cancelled or skipped job) dataset keeps its previous rows & artifact and it is removed
+        release_artifact(db, file_path, pinned=True)
+    return cleanup
+
+
+def submit_delta_upload(db: Session, dataset: models.Dataset, user_id, file_path, file_hash, delete_missing=True) -> IngestionJob:
+    """
+    Queues merge of a new file into an existing mapped dataset by agreement_no, with the dataset's
+    mapping profile. Only new & changed rows are written, change summary is stored on the job.
+
+    file_path is a pinned artifact (retain_upload), the job releases it once done.
+
+    Raises:
+        ValueError when dataset was not loaded with a mapping profile or the profile is gone.
+    """
+    if dataset.mapping_profile_id is None:
+        raise ValueError("Delta upload needs a dataset loaded with a mapping profile.")
+    config = _profile_config(db, dataset.mapping_profile_id)
+    if DELTA_UPSERT_KEY not in _mapped_targets(config["database_config"]):
+        raise ValueError(f"Mapping profile {dataset.mapping_profile_id} does not map {DELTA_UPSERT_KEY}.")
+
+    work = _delta_stages(file_path, file_hash, config["mapping_config"], config["database_config"], delete_missing)
+    job = create_job(db, dataset, user_id, job_type="upload_delta")
+    _executor.submit(_run_job, job.id, work, _release_delta_upload(file_path))
+    print(f"📥 Queued delta upload job {job.id} for dataset {dataset.id}")
+    return job
@@ -1,6 +1,7 @@
 import os
 import json
 import requests
+from starlette.concurrency import run_in_threadpool
 from typing import Dict, Any, Optional, List
 
 class LLMService:
@@ -78,7 +79,9 @@ class LLMService:
                     }
                 }
             
-            response = requests.post(
+            # blocking HTTP call, kept off the event loop
+            response = await run_in_threadpool(
+                requests.post,
                 f"{self.api_url}{self.model}",
                 headers=headers,
                 json=formatted_prompt
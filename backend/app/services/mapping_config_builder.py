@@ -1,6 +1,8 @@
 # services/mapping_config_builder.py
 
+from sqlalchemy import String, Text
 from sqlalchemy.orm import Session
+from app.models.models import LoanRecord
 from app.models.upload_profile import (
     MappingProfile, MappingSheet, SheetExtraColumn,
     SheetCleanup, SheetColumnMapping, SheetRelation
@@ -26,6 +28,7 @@ def get_mapping_config(db: Session, profile_id: int,attach_col_config:bool):
     ).all()
 
     sheets_dict = {}
+    source_format = profile.source_format or "excel"
 
     for sh in sheets:
         sheet_entry = {
@@ -36,6 +39,14 @@ def get_mapping_config(db: Session, profile_id: int,attach_col_config:bool):
             "key_columns": sh.key_columns or []
         }
 
+        # ---- csv source ----
+        if source_format == "csv":
+            sheet_entry["source_format"] = "csv"
+            if sh.delimiter:
+                sheet_entry["delimiter"] = sh.delimiter
+            if sh.encoding:
+                sheet_entry["encoding"] = sh.encoding
+
         # ---- extra ----
         extras = db.query(SheetExtraColumn).filter(
             SheetExtraColumn.sheet_id == sh.id
@@ -54,6 +65,12 @@ def get_mapping_config(db: Session, profile_id: int,attach_col_config:bool):
             sheet_entry["clean_columns"] = [
                 {rule["col"]: rule["type"]} for rule in cleanup_obj.rules
             ]
+            # optional explicit date formats -> {7: ["%d/%m/%Y"]}
+            clean_formats = {
+                rule["col"]: rule["formats"] for rule in cleanup_obj.rules if rule.get("formats")
+            }
+            if clean_formats:
+                sheet_entry["clean_formats"] = clean_formats
 
         sheets_dict[sh.sheet_index] = sheet_entry
 
@@ -69,6 +86,7 @@ def get_mapping_config(db: Session, profile_id: int,attach_col_config:bool):
             "left_col": r.left_col,
             "right_col": r.right_col,
             "how": r.how,
+            "on_duplicate": r.on_duplicate or "error",
         }
         for r in relations_raw
     ]
@@ -96,6 +114,7 @@ def get_mapping_config(db: Session, profile_id: int,attach_col_config:bool):
             "sheets": sheets_dict,
             "relations": relations_list
         }
+    result["source_format"] = source_format
 
     return result
 
@@ -139,6 +158,22 @@ def get_database_config(db: Session, profile_id: int):
     return db_config
 
 
+def get_dtype_hints(database_config: dict):
+    """
+    Source columns mapped only to text columns of loan_records are read as string,
+    e.g. {"_Pool_col_0": "string"}, so ids keep leading zeros. Others are left to type inference.
+    """
+    text_columns = {
+        col.name for col in LoanRecord.__table__.columns if isinstance(col.type, (String, Text))
+    }
+    hints = {}
+    for src, targets in database_config.items():
+        targets = targets if isinstance(targets, list) else [targets]
+        if targets and all(t in text_columns for t in targets):
+            hints[src] = "string"
+    return hints
+
+
 #
 def get_mapping_type(db: Session, profile_id: int):
     profile = db.query(MappingProfile).filter(
@@ -162,6 +197,12 @@ def get_full_profile_config(db: Session, profile_id: int):
 
     underlying_file_type = get_mapping_type(db, profile_id)
 
+    # csv reader takes dtype from config, excel cells are already typed
+    if mapping_config["source_format"] == "csv":
+        dtype_hints = get_dtype_hints(database_config)
+        for sheet_entry in mapping_config["sheets"].values():
+            sheet_entry["dtype_hints"] = dtype_hints
+
     return {
         "mapping_config": mapping_config,
         "database_config": database_config,
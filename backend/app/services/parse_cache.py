@@ -0,0 +1,225 @@
+# services/parse_cache.py
+# Content addressed cache of parsed sheets.
+# Parsed frame of every sheet is stored as Parquet under the SHA-256 of the uploaded file and a hash
+# of the sheet's mapping config, a repeat upload of same workbook with same profile version skips
+# Excel parsing. Cache is bounded by PARSE_CACHE_MAX_BYTES, least recently used entries are evicted.
+# Entries are unpickled on load, so cache dir must be private to the app's user: it is created 0700 and
+# cache is not used when the dir is owned by someone else or others can write to it.
+
+import hashlib
+import json
+import os
+import pickle
+import stat
+import threading
+
+import pandas as pd
+
+PARSE_CACHE_ENABLED = os.getenv("PARSE_CACHE_ENABLED", "1") != "0"
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR") or os.path.join(os.getcwd(), "uploads", "parse_cache")
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# bump when output of parse_mapped_sheet changes, old entries are then never hit and age out
+PARSE_CACHE_VERSION = 2
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+_evict_lock = threading.Lock()
+_cache_dir_private = None
+
+
+def _cache_dir_is_private() -> bool:
+    """
+    Creates cache dir (0700) on first use and checks nobody but this user can write into it, checked
+    once per process.
+    """
+    global _cache_dir_private
+    if _cache_dir_private is None:
+        try:
+            os.makedirs(PARSE_CACHE_DIR, mode=0o700, exist_ok=True)
+            st = os.stat(PARSE_CACHE_DIR)
+            _cache_dir_private = st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+        except OSError as e:
+            print(f"⚠️ Parse cache dir {PARSE_CACHE_DIR} unusable: {e}")
+            _cache_dir_private = False
+        else:
+            if not _cache_dir_private:
+                print(f"⚠️ Parse cache dir {PARSE_CACHE_DIR} is writable by other users, parse cache not used")
+    return _cache_dir_private
+
+
+# ==========================================================
+#  Keys
+# ==========================================================
+
+def file_sha256(file_content) -> str:
+    """
+    SHA-256 of file path or bytes, file is read in chunks.
+    """
+    digest = hashlib.sha256()
+    if isinstance(file_content, (bytes, bytearray, memoryview)):
+        digest.update(file_content)
+    else:
+        with open(file_content, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _canonical(obj):
+    # config dicts mix int & str keys (e.g. clean_formats), make them sortable for a stable hash
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    return obj
+
+
+def sheet_cache_key(sheet_no, cfg) -> str:
+    """
+    Hash of everything which decides parsed output of a sheet, any change in profile gives a new key.
+    """
+    payload = {
+        "version": PARSE_CACHE_VERSION,
+        "sheet_no": sheet_no,
+        "cfg": cfg,
+    }
+    text = json.dumps(_canonical(payload), sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _entry_paths(file_hash, sheet_key):
+    entry_dir = os.path.join(PARSE_CACHE_DIR, file_hash[:2], file_hash)
+    return entry_dir, os.path.join(entry_dir, f"{sheet_key}.parquet"), os.path.join(entry_dir, f"{sheet_key}.json")
+
+
+# ==========================================================
+#  Parquet encoding
+# ==========================================================
+# Parquet needs string column names and a single type per column. Columns are written by position,
+# original names are kept in the sidecar json. Object columns holding only strings are stored natively,
+# other object columns (mixed cells, datetime objects, extras dicts) are pickled per value so values
+# come back exactly as parsed. Cache files are only written by this process, in its private cache dir.
+
+def _is_str_column(series: pd.Series) -> bool:
+    values = series.dropna()
+    return values.map(type).eq(str).all()
+
+
+def _encode_frame(df: pd.DataFrame):
+    encoded = {}
+    pickled = []
+    for i in range(len(df.columns)):
+        series = df.iloc[:, i].reset_index(drop=True)
+        if series.dtype == object and not _is_str_column(series):
+            series = series.map(pickle.dumps)
+            pickled.append(i)
+        encoded[f"c{i}"] = series
+    return pd.DataFrame(encoded, index=pd.RangeIndex(len(df))), pickled
+
+
+def _decode_frame(encoded: pd.DataFrame, columns, pickled) -> pd.DataFrame:
+    for i in pickled:
+        encoded[f"c{i}"] = encoded[f"c{i}"].map(pickle.loads).astype(object)
+    encoded.columns = columns
+    return encoded
+
+
+# ==========================================================
+#  Load / store
+# ==========================================================
+
+def load_sheet(file_hash, sheet_key):
+    """
+    Returns cached (sheet_alias, df, rejected) or None on miss.
+    """
+    if not _cache_dir_is_private():
+        return None
+    _, parquet_path, meta_path = _entry_paths(file_hash, sheet_key)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        encoded = pd.read_parquet(parquet_path)
+        df = _decode_frame(encoded, meta["columns"], meta["pickled"])
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️ Parse cache entry {file_hash[:12]}/{sheet_key[:12]} unreadable, parsing again: {e}")
+        return None
+
+    # mark as recently used for LRU eviction
+    try:
+        os.utime(meta_path)
+    except OSError:
+        pass
+    return meta["alias"], df, meta["rejected"]
+
+
+def store_sheet(file_hash, sheet_key, parsed):
+    """
+    Stores (sheet_alias, df, rejected) for file & sheet key, failures are only logged.
+    """
+    if not _cache_dir_is_private():
+        return
+    sheet_alias, df, rejected = parsed
+    entry_dir, parquet_path, meta_path = _entry_paths(file_hash, sheet_key)
+    try:
+        os.makedirs(entry_dir, exist_ok=True)
+        encoded, pickled = _encode_frame(df)
+        meta = {"alias": sheet_alias, "columns": list(df.columns), "pickled": pickled, "rejected": rejected}
+
+        # write to temp names and rename, concurrent reader never sees half written entry
+        tmp_parquet = f"{parquet_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_meta = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        encoded.to_parquet(tmp_parquet, index=False)
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f, default=str)
+        os.replace(tmp_parquet, parquet_path)
+        os.replace(tmp_meta, meta_path)   # meta last, entry is visible only once complete
+    except Exception as e:
+        print(f"⚠️ Could not store parse cache entry for sheet {sheet_alias}: {e}")
+        return
+
+    evict_to_limit()
+
+
+def evict_to_limit(max_bytes: int = None):
+    """
+    Removes least recently used entries until cache size is within max_bytes.
+    """
+    max_bytes = PARSE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _evict_lock:
+        entries = []
+        total = 0
+        for root, _, files in os.walk(PARSE_CACHE_DIR):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                meta_path = os.path.join(root, name)
+                parquet_path = meta_path[:-len(".json")] + ".parquet"
+                try:
+                    size = os.path.getsize(meta_path) + os.path.getsize(parquet_path)
+                    last_used = os.path.getmtime(meta_path)
+                except OSError:
+                    continue
+                entries.append((last_used, size, meta_path, parquet_path))
+                total += size
+
+        if total <= max_bytes:
+            return
+
+        entries.sort()
+        for last_used, size, meta_path, parquet_path in entries:
+            if total <= max_bytes:
+                break
+            for path in (meta_path, parquet_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            try:
+                os.rmdir(os.path.dirname(meta_path))   # only succeeds once file folder is empty
+            except OSError:
+                pass
+        print(f"🧹 Parse cache evicted to {total} bytes")
@@ -0,0 +1,57 @@
+# services/record_columns.py
+# Columnar reads of loan records for summaries computed in Python.
+# Only the columns a summary needs are selected, each as a float array with NaN for NULL, and records
+# are bucketed & summed with numpy, instead of loading whole LoanRecord objects and looping over them.
+
+import numpy as np
+from sqlalchemy import Float, cast, func, select
+
+
+def fetch_record_columns(query, columns):
+    """
+    Columns of the records matched by query (an ORM query of LoanRecord, filters applied).
+
+    Args:
+        columns: {name: column or SQL expression}
+    Returns:
+        {name: float array}, NaN where value is NULL, arrays aligned record by record.
+    """
+    names = list(columns)
+    records = query.with_entities(*[cast(columns[n], Float).label(n) for n in names]).subquery("records")
+    # one array per column in a single row, building a Row object per record costs far more than the query
+    arrays = query.session.execute(select(*[func.array_agg(records.c[n]) for n in names])).one()
+    # None -> NaN on conversion to float, no records -> NULL aggregates
+    return {n: np.array(values or [], dtype=float) for n, values in zip(names, arrays)}
+
+
+def assign_buckets(values, bounds):
+    """
+    Index of the first bucket with lower <= value < upper per value, -1 when none (NaN included).
+
+    Args:
+        bounds: [(lower, upper)] in bucket order
+    """
+    idx = np.full(len(values), -1, dtype=np.intp)
+    if not bounds or not len(values):
+        return idx
+    lowers = np.array([b[0] for b in bounds], dtype=float)
+    uppers = np.array([b[1] for b in bounds], dtype=float)
+
+    if np.all(np.diff(lowers) >= 0) and np.all(uppers[:-1] <= lowers[1:]):
+        # sorted, non overlapping: only the last bucket starting at or below value can hold it
+        pos = np.searchsorted(lowers, values, side="right") - 1
+        candidate = np.clip(pos, 0, None)
+        hit = (pos >= 0) & (values < uppers[candidate])
+        idx[hit] = pos[hit]
+        return idx
+
+    # custom buckets may overlap or be unordered, later ones are assigned first so the first match wins
+    for i in range(len(bounds) - 1, -1, -1):
+        idx[(values >= lowers[i]) & (values < uppers[i])] = i
+    return idx
+
+
+def bucket_sums(idx, weights, n_buckets):
+    """Sum of weights per bucket index, records outside buckets (-1) left out."""
+    inside = idx >= 0
+    return np.bincount(idx[inside], weights=weights[inside], minlength=n_buckets)[:n_buckets]
@@ -0,0 +1,211 @@
+# services/sheet_join.py
+# Join stage for sheet relations of a mapping profile.
+# Keys of both sides are normalised to text ("3019CD0001", 3019.0 -> "3019") and joined as categoricals
+# sharing one category set. Duplicate keys on the right side are found before merging, as one duplicated
+# row multiplies every matching left row. Match rate and fan-out of each relation is reported.
+
+import datetime
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+JOIN_KEY = "__join_key"
+RIGHT_KEY = "__right_key"
+
+# what to do with duplicate keys on right side of a relation
+ON_DUPLICATE_OPTIONS = ("error", "first", "last", "allow")
+DEFAULT_ON_DUPLICATE = "error"
+
+# with on_duplicate "allow", merge is refused when it would grow left side beyond this factor
+JOIN_MAX_FAN_OUT = float(os.getenv("JOIN_MAX_FAN_OUT", "2.0"))
+
+DUPLICATE_SAMPLE_SIZE = 5
+
+_INTEGRAL_TEXT = re.compile(r"^-?\d+\.0+$")
+
+
+class RelationJoinError(ValueError):
+    """Raised when relation can not be joined safely, message is shown on the job."""
+
+
+def _normalise_value(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return None
+        if _INTEGRAL_TEXT.match(text):
+            return text.split(".")[0]
+        return text
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value))
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return None
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+    if isinstance(value, (pd.Timestamp, datetime.datetime, datetime.date)):
+        if pd.isna(value):
+            return None
+        return value.isoformat()
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return str(value).strip() or None
+
+
+def normalise_keys(series: pd.Series) -> pd.Series:
+    """
+    Converts join key column to comparable text, nulls stay null.
+    Whole numbers are written without decimals whatever their dtype, strings are stripped.
+    """
+    if pd.api.types.is_integer_dtype(series):
+        return series.astype("Int64").astype("string").astype(object).where(series.notna(), None)
+    return series.map(_normalise_value, na_action="ignore").astype(object).where(series.notna(), None)
+
+
+def _duplicate_sample(keys: pd.Series):
+    dup_keys = keys[keys.duplicated(keep=False)].dropna().unique()
+    return len(dup_keys), [str(k) for k in dup_keys[:DUPLICATE_SAMPLE_SIZE]]
+
+
+def prepare_right(right_df, right_col, how="left", on_duplicate=DEFAULT_ON_DUPLICATE, label=""):
+    """
+    Normalises keys of right side of a relation and applies on_duplicate, done once when the same
+    right side is joined to many chunks of left side.
+
+    Returns:
+        Dict with right frame, its keys and key counts, passed to join_prepared.
+    Raises:
+        RelationJoinError on invalid on_duplicate or duplicate right keys with on_duplicate "error".
+    """
+    on_duplicate = on_duplicate or DEFAULT_ON_DUPLICATE
+    if on_duplicate not in ON_DUPLICATE_OPTIONS:
+        raise RelationJoinError(f"Invalid on_duplicate '{on_duplicate}' for relation {label}.")
+
+    right_keys = normalise_keys(right_df[right_col])
+
+    # rows with empty key never match, keep them out of right side of left / inner joins
+    if how in ("left", "inner"):
+        has_key = right_keys.notna()
+        right_df = right_df[has_key]
+        right_keys = right_keys[has_key]
+
+    duplicate_count, duplicate_sample = _duplicate_sample(right_keys)
+    if duplicate_count:
+        if on_duplicate == "error":
+            raise RelationJoinError(
+                f"Relation {label}: {duplicate_count} keys repeat in {right_col} of right sheet, "
+                f"e.g. {duplicate_sample}. Each matching row would be multiplied, set on_duplicate of "
+                f"relation to first / last to keep one row per key, or allow to keep all."
+            )
+        if on_duplicate in ("first", "last"):
+            keep = ~right_keys.duplicated(keep=on_duplicate)
+            right_df = right_df[keep]
+            right_keys = right_keys[keep]
+
+    return {
+        "df": right_df,
+        "keys": right_keys,
+        "counts": right_keys.value_counts(),
+        "col": right_col,
+        "how": how,
+        "on_duplicate": on_duplicate,
+        "duplicate_count": duplicate_count,
+        "label": label,
+    }
+
+
+def join_relation(left_df, right_df, left_col, right_col, how="left", on_duplicate=DEFAULT_ON_DUPLICATE, label=""):
+    """
+    Joins right_df to left_df on normalised keys.
+
+    Args:
+        left_df, right_df: Frames to join, left_df is combined frame of earlier relations.
+        left_col, right_col: Key column names.
+        how: left / inner / right / outer, as in DataFrame.merge.
+        on_duplicate: error / first / last / allow, for duplicate keys on right side.
+        label: Relation name used in messages, e.g. "Pool -> DPD".
+
+    Returns:
+        Tuple (joined_df, stats), stats is dict with match_rate & fan_out.
+    Raises:
+        RelationJoinError on duplicate right keys (on_duplicate "error") or fan-out beyond JOIN_MAX_FAN_OUT.
+    """
+    right = prepare_right(right_df, right_col, how=how, on_duplicate=on_duplicate, label=label)
+    return join_prepared(left_df, left_col, right)
+
+
+def join_prepared(left_df, left_col, prepared):
+    """
+    Joins right side prepared by prepare_right to left_df, see join_relation.
+    """
+    how = prepared["how"]
+    on_duplicate = prepared["on_duplicate"]
+    label = prepared["label"]
+    right_df = prepared["df"]
+    right_col = prepared["col"]
+    right_keys = prepared["keys"]
+    left_keys = normalise_keys(left_df[left_col])
+
+    # rows each left row will match, checked before merging
+    matches_per_left = left_keys.map(prepared["counts"]).fillna(0)
+    matched_left_rows = int((matches_per_left > 0).sum())
+    expected_rows = int(matches_per_left.clip(lower=1).sum()) if how in ("left", "outer") else int(matches_per_left.sum())
+    if on_duplicate == "allow" and len(left_df) and expected_rows > len(left_df) * JOIN_MAX_FAN_OUT:
+        raise RelationJoinError(
+            f"Relation {label}: join would grow {len(left_df)} rows to {expected_rows}, "
+            f"more than {JOIN_MAX_FAN_OUT}x (JOIN_MAX_FAN_OUT)."
+        )
+
+    # categorical keys sharing same categories merge on integer codes
+    categories = pd.Index(pd.concat([left_keys, right_keys]).dropna().unique())
+    left = left_df.assign(**{JOIN_KEY: pd.Categorical(left_keys, categories=categories)})
+    right = right_df.assign(**{JOIN_KEY: pd.Categorical(right_keys, categories=categories)})
+
+    # same key name on both sides came back as a single column from merge, keep it that way
+    same_key_name = left_col == right_col
+    if same_key_name:
+        right = right.rename(columns={right_col: RIGHT_KEY})
+
+    joined = left.merge(
+        right,
+        how=how,
+        on=JOIN_KEY,
+        validate="many_to_one" if on_duplicate != "allow" and how in ("left", "inner") else None,
+    )
+    if same_key_name:
+        joined[left_col] = joined[left_col].where(joined[left_col].notna(), joined[RIGHT_KEY])
+        joined = joined.drop(columns=[RIGHT_KEY])
+    joined = joined.drop(columns=[JOIN_KEY])
+
+    stats = {
+        "relation": label,
+        "how": how,
+        "left_rows": int(len(left_df)),
+        "right_rows": int(len(right_df)),
+        "right_duplicate_keys": int(prepared["duplicate_count"]),
+        "on_duplicate": on_duplicate,
+        "matched_left_rows": matched_left_rows,
+        "match_rate": round(matched_left_rows / len(left_df), 4) if len(left_df) else 0.0,
+        "output_rows": int(len(joined)),
+        "fan_out": round(len(joined) / len(left_df), 4) if len(left_df) else 0.0,
+    }
+    return joined, stats
+
+
+def combine_join_stats(total, stats):
+    """
+    Adds stats of one chunk of left side to running total of a relation, total is None for first chunk.
+    """
+    if total is None:
+        return dict(stats)
+    total = dict(total)
+    for key in ("left_rows", "matched_left_rows", "output_rows"):
+        total[key] += stats[key]
+    total["match_rate"] = round(total["matched_left_rows"] / total["left_rows"], 4) if total["left_rows"] else 0.0
+    total["fan_out"] = round(total["output_rows"] / total["left_rows"], 4) if total["left_rows"] else 0.0
+    return total
@@ -0,0 +1,225 @@
+# services/summary_cache.py
+# Result cache of bucket summaries.
+# Key holds everything a summary depends on: dataset and its data_version, resolved configs with their
+# updated_at, hash of enabled filters and show_empty_buckets. Every change of loan records bumps
+# datasets.data_version (bump_dataset_version) and config edits change updated_at, so a stale result
+# is never hit, explicit invalidation only frees it early.
+# Results are kept in process, least recently used entries are evicted beyond SUMMARY_CACHE_MAX_ENTRIES
+# and entries expire after SUMMARY_CACHE_TTL_SECONDS. With SUMMARY_CACHE_REDIS_URL set, results are
+# shared by all workers through redis. Cache errors never fail a request, summary is then computed.
+
+import copy
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.orm import Session
+
+from app.models import models
+
+SUMMARY_CACHE_ENABLED = os.getenv("SUMMARY_CACHE_ENABLED", "1") != "0"
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "256"))
+SUMMARY_CACHE_TTL_SECONDS = int(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "900"))
+SUMMARY_CACHE_REDIS_URL = os.getenv("SUMMARY_CACHE_REDIS_URL")
+
+# bump when summary output changes, old entries are then never hit
+SUMMARY_CACHE_VERSION = 2
+
+_REDIS_PREFIX = "bucket_summary"
+
+
+# ==========================================================
+#  Keys
+# ==========================================================
+
+def _filter_dict(item):
+    return item.model_dump() if hasattr(item, "model_dump") else dict(item)
+
+
+def filters_hash(filters) -> str:
+    """
+    Hash of enabled filters. Filters are AND-ed, so their order does not change the key.
+    """
+    items = [_filter_dict(f) for f in (filters or [])]
+    canonical = sorted(
+        json.dumps(item, sort_keys=True, default=str)
+        for item in items if item.get("enabled", True)
+    )
+    return hashlib.sha256(json.dumps(canonical).encode("utf-8")).hexdigest()
+
+
+def summary_cache_key(dataset_id, data_version, configs, filters, show_empty_buckets) -> str:
+    payload = {
+        "version": SUMMARY_CACHE_VERSION,
+        "dataset_id": str(dataset_id),
+        "data_version": data_version,
+        # order matters, summaries are returned in config order
+        "configs": [[str(c.id), str(c.updated_at)] for c in configs],
+        "filters": filters_hash(filters),
+        "show_empty_buckets": bool(show_empty_buckets),
+    }
+    text = json.dumps(payload, sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ==========================================================
+#  Backends
+# ==========================================================
+
+class _MemoryBackend:
+    """LRU with TTL, entries are indexed by dataset & config for invalidation."""
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()   # key -> (expires_at, dataset_id, config_ids, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(entry[3])
+
+    def set(self, key, value, dataset_id, config_ids):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, dataset_id, set(config_ids), copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, dataset_id=None, config_id=None):
+        with self._lock:
+            stale = [
+                key for key, (_, ds, cfgs, _) in self._entries.items()
+                if (dataset_id is not None and ds == dataset_id) or (config_id is not None and config_id in cfgs)
+            ]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+
+class _RedisBackend:
+    """
+    Shared by all workers. Keys of a dataset / config are kept in redis sets for invalidation.
+    Values are pickled (Decimal & UUID fields), they are only written by this app.
+    """
+
+    def __init__(self, url, ttl_seconds):
+        import redis
+
+        self.ttl_seconds = ttl_seconds
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(f"{_REDIS_PREFIX}:{key}")
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, dataset_id, config_ids):
+        full_key = f"{_REDIS_PREFIX}:{key}"
+        index_keys = [f"{_REDIS_PREFIX}:ds:{dataset_id}"] + [f"{_REDIS_PREFIX}:cfg:{c}" for c in config_ids]
+        pipe = self._client.pipeline()
+        pipe.setex(full_key, self.ttl_seconds, pickle.dumps(value))
+        for index_key in index_keys:
+            pipe.sadd(index_key, full_key)
+            pipe.expire(index_key, self.ttl_seconds)
+        pipe.execute()
+
+    def invalidate(self, dataset_id=None, config_id=None):
+        index_key = f"{_REDIS_PREFIX}:ds:{dataset_id}" if dataset_id is not None else f"{_REDIS_PREFIX}:cfg:{config_id}"
+        keys = list(self._client.smembers(index_key))
+        self._client.delete(index_key, *keys)
+        return len(keys)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if SUMMARY_CACHE_REDIS_URL:
+                    _backend = _RedisBackend(SUMMARY_CACHE_REDIS_URL, SUMMARY_CACHE_TTL_SECONDS)
+                    print("🗄️ Bucket summary cache shared through redis")
+                else:
+                    _backend = _MemoryBackend(SUMMARY_CACHE_MAX_ENTRIES, SUMMARY_CACHE_TTL_SECONDS)
+    return _backend
+
+
+# ==========================================================
+#  Cache API
+# ==========================================================
+
+def get_cached_summaries(key):
+    if not SUMMARY_CACHE_ENABLED:
+        return None
+    try:
+        return _get_backend().get(key)
+    except Exception as e:
+        print(f"⚠️ Bucket summary cache read failed: {e}")
+        return None
+
+
+def store_summaries(key, summaries, dataset_id, configs):
+    if not SUMMARY_CACHE_ENABLED:
+        return
+    try:
+        _get_backend().set(key, summaries, str(dataset_id), [str(c.id) for c in configs])
+    except Exception as e:
+        print(f"⚠️ Bucket summary cache write failed: {e}")
+
+
+def invalidate_dataset(dataset_id):
+    """Drops cached summaries of a dataset."""
+    if not SUMMARY_CACHE_ENABLED:
+        return
+    try:
+        dropped = _get_backend().invalidate(dataset_id=str(dataset_id))
+        if dropped:
+            print(f"🧹 Dropped {dropped} cached bucket summaries of dataset {dataset_id}")
+    except Exception as e:
+        print(f"⚠️ Bucket summary cache invalidation failed: {e}")
+
+
+def invalidate_config(config_id):
+    """Drops cached summaries computed with a bucket config, of any dataset."""
+    if not SUMMARY_CACHE_ENABLED:
+        return
+    try:
+        dropped = _get_backend().invalidate(config_id=str(config_id))
+        if dropped:
+            print(f"🧹 Dropped {dropped} cached bucket summaries of config {config_id}")
+    except Exception as e:
+        print(f"⚠️ Bucket summary cache invalidation failed: {e}")
+
+
+# ==========================================================
+#  Dataset version
+# ==========================================================
+
+def get_dataset_version(db: Session, dataset_id):
+    """data_version of dataset, None when dataset does not exist."""
+    return db.query(models.Dataset.data_version).filter(models.Dataset.id == dataset_id).scalar()
+
+
+def bump_dataset_version(db: Session, dataset_id):
+    """
+    Marks loan records of dataset changed, call in the transaction which changes them, caller commits.
+    """
+    db.query(models.Dataset).filter(models.Dataset.id == dataset_id).update(
+        {models.Dataset.data_version: models.Dataset.data_version + 1},
+        synchronize_session=False,
+    )
+    invalidate_dataset(dataset_id)
@@ -0,0 +1,168 @@
+# services/summary_metrics.py
+# Metrics of bucket summaries.
+# Every bucket row has the standard metrics: count of records and sums of POS, disbursement and
+# collections, with POS_Per / POS_Rundown_Per derived from them. A bucket config adds metrics of its
+# own in bucket_configs.metrics, e.g.
+#   [{"name": "wavg_roi", "agg": "weighted_avg", "field": "roi_at_booking", "weight": "principal_os_amt"},
+#    {"name": "avg_bureau_score", "agg": "avg", "field": "bureau_score"},
+#    {"name": "emi_sum", "agg": "sum", "field": "emi_amount"},
+#    {"name": "median_dpd", "agg": "percentile", "field": "dpd", "p": 0.5}]
+# field is a loan_records column or a key of additional_fields ("is_json": true to force the latter).
+# Aggregations are registered in METRIC_KINDS. Metrics of all configs of a request are computed in the
+# same grouped query as their buckets. Additive metrics (sum, count) total as the sum of their buckets,
+# others are aggregated once more over all filtered records (empty grouping set of that query).
+
+import json
+from collections import namedtuple
+from decimal import Decimal
+
+from sqlalchemy import Float, case, cast, func
+
+from app.models.models import LoanRecord
+
+_LOAN_COLUMNS = LoanRecord.__table__.c
+
+# (bucket row key, loan_records column) of standard sums
+SUMMARY_SUMS = [
+    ("POS", "principal_os_amt"),
+    ("disbursement_amount", "disbursement_amount"),
+    ("Post_NPA_Coll", "post_npa_collection"),
+    ("Post_W_Off_Coll", "post_woff_collection"),
+    ("M6_Collection", "m6_collection"),
+    ("M12_Collection", "m12_collection"),
+    ("total_collection", "total_collection"),
+]
+
+STANDARD_KEYS = ["count"] + [label for label, _ in SUMMARY_SUMS]
+DERIVED_KEYS = ["POS_Per", "POS_Rundown_Per"]
+_RESERVED_KEYS = set(STANDARD_KEYS + DERIVED_KEYS + ["label"])
+
+
+# ==========================================================
+#  Registry
+# ==========================================================
+
+# inputs: spec keys naming fields read per record, optional ones may be left out
+# aggregate(spec, input columns): SQL aggregate over them
+MetricKind = namedtuple("MetricKind", ["inputs", "optional", "aggregate", "additive"])
+
+
+def _weighted_avg(spec, cols):
+    value, weight = cols
+    # records without value do not weigh
+    return func.sum(value * weight) / func.nullif(func.sum(case((value.isnot(None), weight))), 0)
+
+
+def _percentile(spec, cols):
+    # exact percentile, Postgres has no approximate one built in
+    return func.percentile_cont(spec["p"]).within_group(cols[0])
+
+
+METRIC_KINDS = {
+    "sum": MetricKind(("field",), (), lambda spec, cols: func.sum(cols[0]), True),
+    # records with a value of field, all records without field
+    "count": MetricKind(("field",), ("field",), lambda spec, cols: func.count(*cols), True),
+    "avg": MetricKind(("field",), (), lambda spec, cols: func.avg(cols[0]), False),
+    "weighted_avg": MetricKind(("field", "weight"), (), _weighted_avg, False),
+    "percentile": MetricKind(("field",), (), _percentile, False),
+}
+
+
+def register_metric(agg, inputs, aggregate, additive, optional=()):
+    """Adds an aggregation bucket configs can choose as "agg"."""
+    METRIC_KINDS[agg] = MetricKind(tuple(inputs), tuple(optional), aggregate, additive)
+
+
+# ==========================================================
+#  Config metrics
+# ==========================================================
+
+def _input_field(raw, key):
+    field = raw.get(key)
+    if not isinstance(field, str) or not field:
+        raise ValueError(f"Metric {raw.get('name')!r}: '{key}' must be a field name")
+    is_json = bool(raw.get("is_json")) or field not in _LOAN_COLUMNS
+    if not is_json:
+        try:
+            numeric = _LOAN_COLUMNS[field].type.python_type in (int, float, Decimal)
+        except NotImplementedError:
+            numeric = False
+        if not numeric:
+            raise ValueError(f"Metric {raw.get('name')!r}: field '{field}' is not numeric")
+    return [field, is_json]
+
+
+def parse_metrics(raw_metrics):
+    """
+    Validated metrics of a bucket config.
+
+    Returns:
+        List of {"name", "agg", input keys: [field, is_json], "p"?} in config order.
+    Raises:
+        ValueError with a message for the user.
+    """
+    if not raw_metrics:
+        return []
+    if not isinstance(raw_metrics, list):
+        raise ValueError("Metrics must be a list")
+
+    metrics = []
+    names = set()
+    for raw in raw_metrics:
+        if not isinstance(raw, dict):
+            raise ValueError("Every metric must be an object")
+        name = raw.get("name")
+        if not isinstance(name, str) or not name:
+            raise ValueError("Every metric needs a name")
+        if name in _RESERVED_KEYS or name in names:
+            raise ValueError(f"Metric name {name!r} is already used")
+        names.add(name)
+
+        agg = raw.get("agg")
+        kind = METRIC_KINDS.get(agg)
+        if kind is None:
+            raise ValueError(f"Metric {name!r}: unknown agg {agg!r}, expected one of {sorted(METRIC_KINDS)}")
+
+        metric = {"name": name, "agg": agg}
+        for key in kind.inputs:
+            if key in kind.optional and not raw.get(key):
+                continue
+            metric[key] = _input_field(raw, key)
+        if agg == "percentile":
+            p = raw.get("p")
+            if not isinstance(p, (int, float)) or isinstance(p, bool) or not 0 <= p <= 1:
+                raise ValueError(f"Metric {name!r}: 'p' must be a number between 0 and 1")
+            metric["p"] = float(p)
+        metrics.append(metric)
+    return metrics
+
+
+def config_metrics(config):
+    """Metrics a bucket config adds to the standard ones, stored ones are validated on save."""
+    return parse_metrics(getattr(config, "metrics", None))
+
+
+def metric_key(metric) -> str:
+    # metrics computing the same value share one column of the query, whatever their name
+    return json.dumps({k: v for k, v in metric.items() if k != "name"}, sort_keys=True)
+
+
+def metric_inputs(metric):
+    """(field, is_json) read per record, in order aggregate takes them."""
+    kind = METRIC_KINDS[metric["agg"]]
+    return [tuple(metric[key]) for key in kind.inputs if key in metric]
+
+
+def input_column(source, field, is_json):
+    """Numeric value of field of a loan records shaped source, JSON values are cast as bucket_column does."""
+    if is_json:
+        return cast(source.additional_fields[field].astext, Float)
+    return getattr(source, field)
+
+
+def metric_aggregate(metric, cols):
+    return METRIC_KINDS[metric["agg"]].aggregate(metric, cols)
+
+
+def metric_additive(metric) -> bool:
+    return METRIC_KINDS[metric["agg"]].additive
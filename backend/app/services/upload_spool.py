@@ -0,0 +1,144 @@
+# services/upload_spool.py
+# Uploads are streamed to a temporary file on disk in chunks instead of being read fully in memory,
+# parsers then open the file by path (openpyxl / pandas seek inside the file as needed).
+# Also has a small sampler to report peak memory (RSS) of the process while an upload is handled.
+
+import hashlib
+import os
+import resource
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from fastapi import UploadFile
+
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or tempfile.gettempdir()
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(500 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+MEMORY_SAMPLE_INTERVAL = 0.05   # seconds
+
+
+class UploadTooLarge(Exception):
+    """Raised when upload goes beyond UPLOAD_MAX_BYTES, api layer returns 413."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        super().__init__(f"File is larger than the allowed limit of {max_bytes // (1024 * 1024)} MB.")
+
+
+# ==========================================================
+#  Spool upload to disk
+# ==========================================================
+
+async def spool_upload(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES):
+    """
+    Copies upload to a temporary file in UPLOAD_SPOOL_DIR chunk by chunk.
+
+    Returns:
+        Tuple (path, size, sha256), caller owns the file and removes it with remove_spooled_file.
+    Raises:
+        UploadTooLarge when size goes beyond max_bytes, partial file is removed.
+    """
+    suffix = os.path.splitext(file.filename or "")[1]
+    spool = tempfile.NamedTemporaryFile(prefix="upload_", suffix=suffix, dir=UPLOAD_SPOOL_DIR, delete=False)
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        with spool:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                spool.write(chunk)
+                digest.update(chunk)
+    except BaseException:
+        remove_spooled_file(spool.name)
+        raise
+
+    print(f"📥 Spooled upload {file.filename} to {spool.name} ({size} bytes)")
+    return spool.name, size, digest.hexdigest()
+
+
+def remove_spooled_file(path):
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"⚠️ Could not remove spooled upload {path}: {e}")
+
+
+# ==========================================================
+#  Peak memory tracking
+# ==========================================================
+
+def current_rss_bytes() -> int:
+    """Resident memory of this process, from /proc on Linux, high-water mark elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in KB on Linux, bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if max_rss > 1 << 32 else max_rss * 1024
+
+
+class PeakMemory:
+    """
+    Samples process RSS in a background thread between start() and stop().
+    RSS is process wide, with concurrent uploads the figure includes their memory as well,
+    sheet parse worker processes are not included.
+    """
+
+    def __init__(self, interval: float = MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.baseline_bytes = current_rss_bytes()
+        self.peak_bytes = self.baseline_bytes
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._sampler = threading.Thread(target=self._sample, name="peak-memory", daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+        return self
+
+    @property
+    def delta_bytes(self) -> int:
+        """Peak above memory in use when tracking started."""
+        return max(0, self.peak_bytes - self.baseline_bytes)
+
+    def __str__(self):
+        return f"peak {self.peak_bytes / 1048576:.1f} MB (+{self.delta_bytes / 1048576:.1f} MB)"
+
+
+@contextmanager
+def track_peak_memory(interval: float = MEMORY_SAMPLE_INTERVAL):
+    """
+    Usage:
+        with track_peak_memory() as mem:
+            ...
+        print(mem.peak_bytes)
+    """
+    mem = PeakMemory(interval).start()
+    try:
+        yield mem
+    finally:
+        mem.stop()
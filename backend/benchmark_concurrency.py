@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+Concurrency benchmark: latency of cheap endpoints while heavy summaries run.
+
+Heavy clients keep requesting dataset & bucket summaries, probe clients meanwhile call cheap endpoints
+and their latencies (p50 / p95 / p99 / max) are reported, first on an idle server, then under load.
+With blocking work on the event loop, probes wait for whole summaries, with it on the db threadpool
+they stay close to idle latency.
+
+Usage (server running, e.g. SUMMARY_CACHE_ENABLED=0 uvicorn app.main:app --port 8000):
+    python benchmark_concurrency.py --dataset-id <uuid> --user-id <uuid> [--config-types pos_bucket,dpd_bucket]
+        [--heavy 4] [--seconds 20]
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.request
+
+from app.core.auth.dependencies import create_access_token
+
+
+def request(url, token, body=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, method="POST" if data is not None else "GET")
+    req.add_header("Authorization", f"Bearer {token}")
+    if data is not None:
+        req.add_header("Content-Type", "application/json")
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=300) as resp:
+        resp.read()
+        status = resp.status
+    return status, time.perf_counter() - start
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+def report(label, latencies):
+    if not latencies:
+        print(f"  {label:<28} no requests")
+        return
+    ms = [v * 1000 for v in latencies]
+    print(
+        f"  {label:<28} n={len(ms):<5} p50={statistics.median(ms):8.1f}ms  p95={percentile(ms, 95):8.1f}ms  "
+        f"p99={percentile(ms, 99):8.1f}ms  max={max(ms):8.1f}ms"
+    )
+
+
+def run_probes(probes, token, seconds, interval):
+    """Calls every probe each interval for seconds, returns {probe name: [latency]}."""
+    latencies = {name: [] for name, _ in probes}
+    errors = []
+    deadline = time.perf_counter() + seconds
+
+    def probe(name, url):
+        while time.perf_counter() < deadline:
+            try:
+                _, elapsed = request(url, token)
+                latencies[name].append(elapsed)
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+            time.sleep(interval)
+
+    threads = [threading.Thread(target=probe, args=p, daemon=True) for p in probes]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for err in errors[:5]:
+        print(f"  ⚠️ probe failed {err}")
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--dataset-id", required=True)
+    parser.add_argument("--user-id", required=True, help="token is issued for this user")
+    parser.add_argument("--heavy", type=int, default=4, help="concurrent heavy clients")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--idle-seconds", type=float, default=5)
+    parser.add_argument("--interval", type=float, default=0.05, help="pause between probe calls")
+    parser.add_argument("--config-types", default="", help="comma separated, bucket summaries of these types are heavy requests too")
+    args = parser.parse_args()
+
+    base = args.base_url.rstrip("/")
+    token = create_access_token({"sub": args.user_id})
+    probes = [
+        ("health (async, no db)", f"{base}/api/pool-selection/health"),
+        ("datasets list (sync, db)", f"{base}/api/datasets/"),
+    ]
+    heavy_calls = [(f"{base}/api/datasets/{args.dataset_id}/summary-v2", [])]
+    config_types = [t for t in args.config_types.split(",") if t]
+    if config_types:
+        heavy_calls.append((f"{base}/api/data-bucket/{args.dataset_id}/bucket-summary", {
+            "config_types": config_types,
+            "filters": [],
+            "show_empty_buckets": False,
+        }))
+
+    print(f"\n==== IDLE ({args.idle_seconds}s) ====")
+    idle = run_probes(probes, token, args.idle_seconds, args.interval)
+    for name, _ in probes:
+        report(name, idle[name])
+
+    stop = threading.Event()
+    heavy_latencies = {url: [] for url, _ in heavy_calls}
+    heavy_errors = []
+
+    def heavy(idx):
+        n = idx
+        while not stop.is_set():
+            url, body = heavy_calls[n % len(heavy_calls)]
+            n += 1
+            try:
+                _, elapsed = request(url, token, body)
+                heavy_latencies[url].append(elapsed)
+            except Exception as e:
+                heavy_errors.append(f"{url}: {e}")
+
+    workers = [threading.Thread(target=heavy, args=(i,), daemon=True) for i in range(args.heavy)]
+    for w in workers:
+        w.start()
+    # let heavy requests get going
+    time.sleep(1)
+
+    print(f"\n==== UNDER LOAD ({args.heavy} heavy clients, {args.seconds}s) ====")
+    loaded = run_probes(probes, token, args.seconds, args.interval)
+    stop.set()
+    for name, _ in probes:
+        report(name, loaded[name])
+    for url, _ in heavy_calls:
+        report(url.rsplit("/", 1)[-1] + " (heavy)", heavy_latencies[url])
+    for err in heavy_errors[:5]:
+        print(f"  ⚠️ heavy request failed {err}")
+    for w in workers:
+        w.join()
+
+
+if __name__ == "__main__":
+    main()
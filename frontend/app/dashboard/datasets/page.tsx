@@ -211,6 +211,14 @@ export default function DatasetSelectionPage() {
         return <Badge color="yellow">Validating</Badge>;
       case 'uploaded':
         return <Badge color="blue">Uploaded</Badge>;
+      case 'queued':
+        return <Badge color="gray">Queued</Badge>;
+      case 'processing':
+        return <Badge color="yellow">Processing</Badge>;
+      case 'cancelled':
+        return <Badge color="gray">Cancelled</Badge>;
+      case 'error':
+        return <Badge color="red">Upload Failed</Badge>;
       default:
         return <Badge color="gray">Unknown</Badge>;
     }
@@ -489,17 +489,37 @@ export default function RecordsPage() {
         throw new Error(`Error reprocessing dataset: ${response.statusText}`);
       }
       
-      const data = await response.json();
-      console.log('Reprocessing successful:', data);
-      
-      // Reload the page to fetch the new records
-      window.location.reload();
-      
+      // Reprocess runs as a background job, poll it till it finishes
+      let job = await response.json();
+      console.log('Reprocessing queued:', job);
+      notifications.show({
+        title: 'Reprocessing',
+        message: 'Dataset reprocess has been queued',
+        color: 'blue'
+      });
+
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 2000));
+        const jobResponse = await fetch(`http://localhost:8000/api/ingestion-jobs/${job.id}`, {
+          headers: {
+            'Authorization': `Bearer ${localStorage.getItem('auth_token')}`,
+          },
+        });
+        job = await jobResponse.json();
+      }
+
+      if (job.status !== 'completed') {
+        throw new Error(job.error || `Reprocess ${job.status}`);
+      }
+
       notifications.show({
         title: 'Success',
-        message: `Dataset reprocessed successfully with ${data.total_records} records`,
+        message: `Dataset reprocessed successfully with ${job.rows_processed} records`,
         color: 'green'
       });
+
+      // Reload the page to fetch the new records
+      window.location.reload();
     } catch (error) {
       console.error('Error reprocessing dataset:', error);
       notifications.show({
@@ -5,7 +5,8 @@ import {
   MappingProfileSummary,
   FullProfileResponse,
   ColumnInfo,
-  updateRespose
+  updateRespose,
+  FilePreview
 } from "../types/mappings";
 
 export const mappingService = {
@@ -53,5 +54,16 @@ export const mappingService = {
   removePermenant: async (id: number): Promise<void> => {
     const res = await apiClient.delete(`/upload-profile/${id}/permanent`);
     return res.data;
+  },
+
+  // first rows of every sheet with detected header row & column types
+  preview: async (file: File, rows = 20): Promise<FilePreview> => {
+    const formData = new FormData();
+    formData.append("file", file);
+    formData.append("rows", String(rows));
+    const res = await apiClient.post<FilePreview>("/upload-profile/preview", formData, {
+      headers: { "Content-Type": "multipart/form-data" },
+    });
+    return res.data;
   }
 };
@@ -44,6 +44,15 @@ export const datasetService = {
     });
     return response.data;
   },
+  // Mapped uploads run as background ingestion jobs
+  getIngestionJob: async (jobId: string) => {
+    const response = await apiClient.get(`/ingestion-jobs/${jobId}`);
+    return response.data;
+  },
+  cancelIngestionJob: async (jobId: string) => {
+    const response = await apiClient.post(`/ingestion-jobs/${jobId}/cancel`);
+    return response.data;
+  },
   reprocessDataset: async (id: string) => {
     const response = await apiClient.post(`/datasets/${id}/reprocess`);
     return response.data;
@@ -68,4 +68,25 @@ export type ColumnInfo = {
 export type updateRespose = {
   id:number,
   ok:boolean
-}
\ No newline at end of file
+}
+
+export type PreviewColumn = {
+  index: number,
+  name?: string | null,
+  inferred_type?: "dt" | "int" | "float" | "string" | null,
+  samples: unknown[]
+}
+
+export type SheetPreview = {
+  sheet_no: number,
+  sheet_name: string,
+  header_row: number, // among non-blank rows, -1 for header-less
+  columns: PreviewColumn[],
+  rows: unknown[][]
+}
+
+export type FilePreview = {
+  file_name: string,
+  source_format: "excel" | "csv",
+  sheets: SheetPreview[]
+}
@@ -0,0 +1,10 @@
+-- source file format of mapping profile, excel or csv
+alter table mapping_profiles
+add column source_format VARCHAR(10) NOT NULL DEFAULT 'excel';
+
+-- csv dialect per sheet entry, null means "," and utf-8
+alter table mapping_sheets
+add column delimiter TEXT NULL;
+
+alter table mapping_sheets
+add column encoding TEXT NULL;
@@ -0,0 +1,21 @@
+-- Background ingestion jobs for mapped uploads
+CREATE TABLE ingestion_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    dataset_id UUID NOT NULL REFERENCES datasets(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL,
+    job_type VARCHAR(50) NOT NULL DEFAULT 'upload_mapped',
+    status VARCHAR(50) NOT NULL DEFAULT 'queued',   -- queued, running, completed, failed, cancelled
+    stage VARCHAR(50) NOT NULL DEFAULT 'queued',    -- parsing, loading, done
+    rows_processed INT DEFAULT 0,
+    total_rows INT NULL,
+    stage_timings JSONB NULL,                       -- seconds spent per stage
+    error TEXT NULL,
+    cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ NULL,
+    finished_at TIMESTAMPTZ NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Jobs are looked up per dataset
+CREATE INDEX idx_ingestion_jobs_dataset_id ON ingestion_jobs(dataset_id);
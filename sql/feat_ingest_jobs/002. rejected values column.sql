@@ -0,0 +1,3 @@
+-- values nulled by sheet clean-up rules, per sheet and column
+alter table ingestion_jobs
+add column rejected_values JSONB NULL;
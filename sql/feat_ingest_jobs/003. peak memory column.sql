@@ -0,0 +1,3 @@
+-- peak resident memory of api process while job ran
+alter table ingestion_jobs
+add column peak_memory_bytes BIGINT NULL;
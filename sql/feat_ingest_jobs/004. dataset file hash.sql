@@ -0,0 +1,5 @@
+-- SHA-256 of uploaded file, used as key of parse cache
+alter table datasets
+add column file_sha256 VARCHAR(64) NULL;
+
+create index ix_datasets_file_sha256 on datasets (file_sha256);
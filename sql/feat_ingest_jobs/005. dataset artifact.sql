@@ -0,0 +1,6 @@
+-- retained original upload & mapping profile used, for reprocess
+alter table datasets
+add column artifact_path VARCHAR(500) NULL;
+
+alter table datasets
+add column mapping_profile_id INTEGER NULL;
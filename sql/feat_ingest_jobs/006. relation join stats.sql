@@ -0,0 +1,7 @@
+-- duplicate key handling of right sheet per relation: error / first / last / allow
+alter table sheet_relations
+add column on_duplicate TEXT NOT NULL DEFAULT 'error';
+
+-- match rate & fan-out per relation of the upload
+alter table ingestion_jobs
+add column join_stats JSONB NULL;
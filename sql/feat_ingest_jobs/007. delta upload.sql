@@ -0,0 +1,6 @@
+-- delta upload matches rows of a dataset by agreement number
+create index if not exists ix_loan_records_dataset_agreement on loan_records (dataset_id, agreement_no);
+
+-- inserted / updated / unchanged / dropped counts of delta upload
+alter table ingestion_jobs
+add column change_summary JSONB NULL;
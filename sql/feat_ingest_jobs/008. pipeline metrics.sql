@@ -0,0 +1,3 @@
+-- per stage throughput of pipelined load (read / clean / map / copy)
+alter table ingestion_jobs
+add column pipeline_metrics JSONB NULL;
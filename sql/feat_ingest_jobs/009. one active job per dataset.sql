@@ -0,0 +1,20 @@
+-- at most one queued or running ingestion job per dataset, submitting another one is refused (409),
+-- so a delta merge and a reprocess never write the same dataset at once
+
+begin;
+
+-- older unfinished jobs of a dataset are failed, only the newest one is kept
+update ingestion_jobs j
+set status = 'failed', stage = 'failed', error = 'Superseded by a newer job of the dataset', finished_at = now()
+where j.status in ('queued', 'running')
+  and exists (
+      select 1 from ingestion_jobs n
+      where n.dataset_id = j.dataset_id
+        and n.status in ('queued', 'running')
+        and n.created_at > j.created_at
+  );
+
+create unique index if not exists ux_ingestion_jobs_dataset_active
+    on ingestion_jobs (dataset_id) where status in ('queued', 'running');
+
+commit;
@@ -0,0 +1,54 @@
+-- loan_records list partitioned by dataset_id, one partition per dataset.
+-- New partitions are created by the app with the dataset (services/dataset_partitions.py),
+-- deleting a dataset drops its partition.
+-- Rows are copied to the new table, run in a maintenance window.
+
+begin;
+
+alter table loan_records rename to loan_records_unpartitioned;
+alter table loan_records_unpartitioned rename constraint loan_records_pkey to loan_records_unpartitioned_pkey;
+alter index ix_loan_records_dataset_agreement rename to ix_loan_records_unpartitioned_dataset_agreement;
+
+create table loan_records (
+    like loan_records_unpartitioned including defaults including constraints
+) partition by list (dataset_id);
+
+-- partition key has to be part of primary key
+alter table loan_records add constraint loan_records_pkey primary key (dataset_id, id);
+alter table loan_records add constraint loan_records_dataset_id_fkey
+    foreign key (dataset_id) references datasets(id) on delete cascade;
+create index ix_loan_records_dataset_agreement on loan_records (dataset_id, agreement_no);
+
+-- partition for every existing dataset, same naming as partition_name()
+do $$
+declare
+    ds record;
+begin
+    for ds in select id from datasets loop
+        execute format(
+            'create table %I partition of loan_records for values in (%L)',
+            'loan_records_' || replace(ds.id::text, '-', ''), ds.id
+        );
+    end loop;
+end $$;
+
+insert into loan_records select * from loan_records_unpartitioned;
+
+-- pool selection records reference loan records by (dataset_id, id)
+alter table pool_selection_records add column dataset_id UUID;
+
+update pool_selection_records psr
+set dataset_id = lr.dataset_id
+from loan_records_unpartitioned lr
+where lr.id = psr.loan_record_id;
+
+alter table pool_selection_records drop constraint pool_selection_records_loan_record_id_fkey;
+alter table pool_selection_records alter column dataset_id set not null;
+alter table pool_selection_records add constraint pool_selection_records_loan_record_fkey
+    foreign key (dataset_id, loan_record_id) references loan_records(dataset_id, id) on delete cascade;
+
+drop table loan_records_unpartitioned;
+
+analyze loan_records;
+
+commit;
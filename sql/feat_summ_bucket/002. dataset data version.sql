@@ -0,0 +1,3 @@
+-- Incremented whenever loan records of a dataset change, part of bucket summary cache key
+alter table datasets
+add column data_version INTEGER NOT NULL DEFAULT 1;
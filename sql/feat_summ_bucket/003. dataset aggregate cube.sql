@@ -0,0 +1,28 @@
+-- Per dataset aggregate of summary metrics, grouped by the dataset's bucketable fields.
+-- Bucket summaries are re-bucketed from it instead of scanning loan_records (services/dataset_cube.py).
+create table dataset_cubes (
+    dataset_id UUID PRIMARY KEY REFERENCES datasets(id) ON DELETE CASCADE,
+    data_version INTEGER NOT NULL,
+    -- [[field, is_json], ...] grouped on
+    fields JSONB NOT NULL,
+    cell_count INTEGER NOT NULL,
+    build_seconds DOUBLE PRECISION NULL,
+    built_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+create table dataset_cube_cells (
+    id BIGSERIAL PRIMARY KEY,
+    dataset_id UUID NOT NULL REFERENCES datasets(id) ON DELETE CASCADE,
+    -- {field: value} of the cell
+    dims JSONB NOT NULL,
+    row_count BIGINT NOT NULL,
+    principal_os_amt NUMERIC NULL,
+    disbursement_amount NUMERIC NULL,
+    post_npa_collection NUMERIC NULL,
+    post_woff_collection NUMERIC NULL,
+    m6_collection NUMERIC NULL,
+    m12_collection NUMERIC NULL,
+    total_collection NUMERIC NULL
+);
+
+create index ix_dataset_cube_cells_dataset_id on dataset_cube_cells (dataset_id);
@@ -0,0 +1,4 @@
+-- Metrics a bucket config adds to the standard ones of its summary, e.g.
+-- [{"name": "avg_bureau_score", "agg": "avg", "field": "bureau_score"}], NULL for none
+alter table bucket_configs
+add column metrics JSONB;